@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据画像性能基准 - 对比原逐列循环实现与向量化DataProfiler的耗时和结果一致性
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+from modules.data_profiler import DataProfiler
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+def legacy_profile(df, file_path):
+    """原ExcelAnalyzer._analyze_structure中的逐列循环实现（作为基准）"""
+    structure_analysis = {
+        "file_path": file_path,
+        "row_count": len(df),
+        "column_count": len(df.columns),
+        "columns": {}
+    }
+
+    for col in df.columns:
+        col_type = str(df[col].dtype)
+        structure_analysis["columns"][col] = {
+            "type": col_type,
+            "missing_values": df[col].isna().sum(),
+            "unique_values": df[col].nunique()
+        }
+
+        if df[col].dtype.kind in 'ifc':
+            structure_analysis["columns"][col].update({
+                "min": df[col].min() if not df[col].isna().all() else None,
+                "max": df[col].max() if not df[col].isna().all() else None,
+                "mean": df[col].mean() if not df[col].isna().all() else None,
+                "median": df[col].median() if not df[col].isna().all() else None
+            })
+
+        elif df[col].dtype == 'object' or df[col].dtype.name == 'category':
+            if not df[col].isna().all():
+                value_counts = df[col].value_counts(dropna=True)
+                if not value_counts.empty:
+                    structure_analysis["columns"][col]["most_common"] = {
+                        "value": value_counts.index[0],
+                        "count": int(value_counts.iloc[0])
+                    }
+
+    return structure_analysis
+
+def compare_results(legacy, vectorized):
+    """
+    检查向量化结果是否与原实现一致
+
+    原实现产生的每个键都必须存在且取值相同（浮点数允许舍入误差）；
+    向量化实现额外为字符串类型列给出的most_common不计为差异
+
+    Returns:
+        list: 差异描述列表
+    """
+    differences = []
+    for col, legacy_info in legacy["columns"].items():
+        new_info = vectorized["columns"].get(col, {})
+        for key, legacy_value in legacy_info.items():
+            new_value = new_info.get(key)
+            if legacy_value is None or new_value is None:
+                same = legacy_value is None and new_value is None
+            elif isinstance(legacy_value, (float, np.floating)):
+                same = bool(np.isclose(legacy_value, new_value, rtol=1e-9, equal_nan=True))
+            else:
+                same = legacy_value == new_value
+            if not same:
+                differences.append(f"{col}.{key}: 原实现={legacy_value!r}, 向量化={new_value!r}")
+    return differences
+
+def time_it(func, repeat):
+    """返回多次执行中的最短耗时（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='数据画像性能基准')
+    parser.add_argument('--file', default='sample_data/server_monitoring_data_2025_02_28.xlsx',
+                        help='要测试的数据文件（Excel、CSV或Parquet）')
+    parser.add_argument('--scale', type=int, default=1, help='将数据复制多少倍以放大数据量')
+    parser.add_argument('--repeat', type=int, default=3, help='每种实现重复执行的次数')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        logger.error(f"文件不存在: {args.file}")
+        return 1
+
+    if args.file.endswith('.parquet'):
+        df = pd.read_parquet(args.file)
+    elif args.file.endswith('.csv'):
+        df = pd.read_csv(args.file)
+    else:
+        df = pd.read_excel(args.file)
+    if args.scale > 1:
+        df = pd.concat([df] * args.scale, ignore_index=True)
+
+    print(f"数据: {args.file} ({len(df)} 行 x {len(df.columns)} 列)")
+
+    profiler = DataProfiler()
+    legacy = legacy_profile(df, args.file)
+    vectorized = profiler.profile(df, args.file)
+    differences = compare_results(legacy, vectorized)
+
+    legacy_time = time_it(lambda: legacy_profile(df, args.file), args.repeat)
+    vectorized_time = time_it(lambda: profiler.profile(df, args.file), args.repeat)
+
+    print(f"逐列循环实现:   {legacy_time * 1000:.1f} ms")
+    print(f"向量化实现:     {vectorized_time * 1000:.1f} ms")
+    print(f"加速比:         {legacy_time / vectorized_time:.2f}x")
+
+    if differences:
+        print(f"结果不一致 ({len(differences)} 处):")
+        for difference in differences:
+            print(f"  - {difference}")
+        return 1
+
+    print("结果一致")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,6 +15,8 @@ from datetime import datetime
 
 from modules.model_connector import ModelConnector
 from modules.excel_analyzer import ExcelAnalyzer
+from modules.input_readers import get_reader, supported_extensions
+from modules.batch_runner import BatchRunner, collect_batch_files
 
 # 配置日志
 logging.basicConfig(
@@ -51,12 +53,21 @@ def main():
     """主程序入口"""
     # 解析命令行参数
     parser = argparse.ArgumentParser(description='智能数据分析助手')
-    parser.add_argument('--file', help='要分析的Excel文件路径 (覆盖配置文件中的设置)')
+    parser.add_argument('--file', help='要分析的数据文件路径，支持Excel、CSV、Parquet、Feather、JSONL (覆盖配置文件中的设置)')
     parser.add_argument('--config', default='config.yaml', help='配置文件路径')
     parser.add_argument('--api-key', help='API密钥（覆盖配置文件中的设置）')
     parser.add_argument('--model', help='要使用的模型名称（覆盖配置文件中的设置）')
     parser.add_argument('--output', help='输出报告的文件路径（覆盖配置文件中的设置）')
     parser.add_argument('--no-charts', action='store_true', help='不生成图表HTML报告')
+    parser.add_argument('--force', action='store_true', help='忽略可复用的历史分析会话和模型响应缓存，强制重新分析')
+    parser.add_argument('--resume', metavar='SESSION',
+                        help='恢复中断或失败的分析会话（会话目录、目录名或运行ID），跳过已完成的阶段')
+    parser.add_argument('--batch', metavar='DIR_OR_GLOB',
+                        help='批量分析目录下的所有数据文件或通配符匹配的文件（如 "sample_data/*.xlsx"），共用一个模型连接器并发分析')
+    parser.add_argument('--workers', type=int, help='批量分析时同时分析的文件数（覆盖配置文件中的 analysis.batch.max_workers）')
+    parser.add_argument('--stream-output', choices=['auto', 'console', 'progress', 'file', 'none'],
+                        help='模型流式响应的输出方式（覆盖配置文件中的设置）')
+    parser.add_argument('--quiet', action='store_true', help='安静模式，不输出模型流式响应（等同于 --stream-output none）')
     args = parser.parse_args()
     
     # 确保目录存在
@@ -73,24 +84,25 @@ def main():
             print(f"错误: 无法加载配置文件: {args.config}")
             return 1
         
-        # 确定Excel文件路径
+        # 确定Excel文件路径（恢复会话时使用会话记录的源文件，批量分析时使用 --batch 匹配的文件）
         file_path = args.file or config.get('analysis', {}).get('excel_file')
-        if not file_path:
-            logger.error("未指定Excel文件路径")
-            print("错误: 未指定Excel文件路径，请在配置文件中设置或使用--file参数")
-            return 1
-        
-        # 检查文件是否存在
-        if not os.path.exists(file_path):
-            logger.error(f"文件不存在: {file_path}")
-            print(f"错误: 文件不存在: {file_path}")
-            return 1
-        
-        # 检查是否为Excel文件
-        if not file_path.endswith(('.xlsx', '.xls')):
-            logger.error(f"不是Excel文件: {file_path}")
-            print(f"错误: 不是Excel文件: {file_path}")
-            return 1
+        if not args.resume and not args.batch:
+            if not file_path:
+                logger.error("未指定Excel文件路径")
+                print("错误: 未指定Excel文件路径，请在配置文件中设置或使用--file参数")
+                return 1
+            
+            # 检查文件是否存在
+            if not os.path.exists(file_path):
+                logger.error(f"文件不存在: {file_path}")
+                print(f"错误: 文件不存在: {file_path}")
+                return 1
+            
+            # 检查是否有对应的输入读取器（Excel、CSV、Parquet、Feather、JSONL）
+            if get_reader(file_path) is None:
+                logger.error(f"不支持的文件格式: {file_path}")
+                print(f"错误: 不支持的文件格式: {file_path}，支持的格式: {', '.join(supported_extensions())}")
+                return 1
         
         # 获取模型配置
         model_config = config.get('models', {}).get('conversational', {})
@@ -130,10 +142,26 @@ def main():
             'max_tokens': model_config.get('parameters', {}).get('max_tokens', 4000),
             'retry_count': config.get('api', {}).get('max_retries', 3),
             'retry_delay': config.get('api', {}).get('retry_delay', 5),
+            'endpoints': model_config.get('endpoints', []),
+            'task_profiles': model_config.get('task_profiles', {}),
             'analysis': analysis_config,
-            'report': report_config
+            'report': report_config,
+            'api': dict(config.get('api', {}))
         }
         
+        # 流式响应输出方式
+        if args.quiet:
+            app_config['api']['stream_output'] = 'none'
+        elif args.stream_output:
+            app_config['api']['stream_output'] = args.stream_output
+        elif args.batch and app_config['api'].get('stream_output', 'auto') != 'file':
+            # 批量分析时多个文件的流式响应会在终端中交错，默认不输出
+            app_config['api']['stream_output'] = 'none'
+        
+        # 批量分析时不自动在浏览器中打开报告
+        if args.batch:
+            report_config['open_browser'] = False
+        
         # 初始化模型连接器
         logger.info(f"初始化模型连接器 (模型: {app_config['model']})")
         model = ModelConnector(app_config)
@@ -142,10 +170,36 @@ def main():
         logger.info("初始化Excel分析器")
         analyzer = ExcelAnalyzer(model, app_config)
         
-        # 分析Excel文件
-        logger.info(f"开始分析Excel文件: {file_path}")
-        print(f"正在分析Excel文件: {file_path}...")
-        markdown_report, html_report = analyzer.analyze_excel(file_path)
+        if args.batch:
+            # 批量分析：所有文件共用模型连接器和Excel分析器
+            files = collect_batch_files(args.batch)
+            if not files:
+                logger.error(f"没有找到可分析的数据文件: {args.batch}")
+                print(f"错误: 没有找到可分析的数据文件: {args.batch}，支持的格式: {', '.join(supported_extensions())}")
+                model.close()
+                return 1
+            
+            print(f"批量分析 {len(files)} 个文件...")
+            summary = BatchRunner(analyzer, app_config).run(files, max_workers=args.workers, force=args.force)
+            model.close()
+            
+            print(f"批量分析完成: {summary['file_count']} 个文件, 总耗时 {summary['wall_seconds']}秒, 状态 {summary['status_counts']}")
+            if summary.get('summary_file'):
+                print(f"批量汇总已保存到: {summary['summary_file']}")
+            return 0 if summary['status_counts'].get('failed', 0) == 0 else 1
+        
+        if args.resume:
+            # 恢复分析会话
+            logger.info(f"恢复分析会话: {args.resume}")
+            markdown_report, html_report = analyzer.resume_session(args.resume)
+        else:
+            # 分析Excel文件
+            logger.info(f"开始分析Excel文件: {file_path}")
+            print(f"正在分析Excel文件: {file_path}...")
+            markdown_report, html_report = analyzer.analyze_excel(file_path, force=args.force)
+        
+        # 关闭模型连接池并记录连接复用统计
+        model.close()
         
         # 确定Markdown输出路径
         if args.output:
@@ -158,7 +212,8 @@ def main():
             markdown_path = f"{output_base}.md"
             html_path = f"{output_base}.html"
         else:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            # 使用本次分析的运行ID命名，同时运行的多个分析不会互相覆盖报告
+            timestamp = analyzer.last_run_id or datetime.now().strftime('%Y%m%d_%H%M%S')
             default_output = report_config.get('default_output_file', 'excel_analysis_report')
             if default_output.endswith('.html') or default_output.endswith('.md'):
                 default_output = default_output.rsplit('.', 1)[0]  # 移除任何文件扩展名
@@ -9,8 +9,11 @@ import os
 import logging
 import json
 import time
+import queue
+import threading
 import numpy as np
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 from .analysis_units import (
     GeneralStatisticsUnit,
@@ -19,6 +22,9 @@ from .analysis_units import (
     TimeTrendAnalysisUnit,
     CorrelationAnalysisUnit
 )
+from .prompt_builder import PromptBuilder
+from .run_workspace import RunWorkspace, new_run_id
+from .session_checkpoint import SessionCheckpoint
 
 logger = logging.getLogger(__name__)
 
@@ -52,13 +58,11 @@ class AnalysisDispatcher:
         self.model = model
         self.config = config
         self.analysis_units = []
+        self.last_session_dir = None
+        self.prompt_builder = PromptBuilder(config)
         self.results_dir = os.path.join(os.getcwd(), 'analysis_results')
         os.makedirs(self.results_dir, exist_ok=True)
         
-        # 创建临时文本文件目录
-        self.temp_txts_dir = os.path.join(os.getcwd(), 'temp_txts')
-        os.makedirs(self.temp_txts_dir, exist_ok=True)
-        
         # 初始化所有分析单元
         self._initialize_analysis_units()
         
@@ -105,7 +109,64 @@ class AnalysisDispatcher:
         
         logger.info(f"成功初始化 {len(self.analysis_units)} 个分析单元")
     
-    def run_analysis(self, structure_analysis, column_names, file_path):
+    def session_dir_for(self, run_id):
+        """
+        获取运行ID对应的分析会话目录
+        
+        Args:
+            run_id (str): 运行ID
+        
+        Returns:
+            str: 分析会话目录路径
+        """
+        return os.path.join(self.results_dir, f"analysis_session_{run_id}")
+    
+    def run_multi_sheet_analysis(self, sheet_inputs, session_dir=None, run_id=None, use_cache=True):
+        """
+        在同一个分析会话中依次分析多个工作表，每个工作表使用会话目录下的独立子目录
+        
+        Args:
+            sheet_inputs (list): [(工作表名称, 数据结构分析结果, 列名列表, 数据文件路径), ...]
+            session_dir (str, optional): 分析会话目录，默认按运行ID新建
+            run_id (str, optional): 运行ID，默认生成新的运行ID
+            use_cache (bool): 调用模型时是否读取响应缓存
+            
+        Returns:
+            dict: 所有工作表所有分析单元的结果，键为"工作表名称 - 分析单元名称"
+        """
+        logger.info(f"开始在同一会话中分析 {len(sheet_inputs)} 个工作表...")
+        
+        run_id = run_id or new_run_id()
+        analysis_session_dir = session_dir or self.session_dir_for(run_id)
+        os.makedirs(os.path.join(analysis_session_dir, "pngs"), exist_ok=True)
+        
+        # 在检查点清单中记录各工作表的子目录，恢复会话时按此重新分析
+        sheet_dirs = []
+        for i, (sheet_name, _, _, _) in enumerate(sheet_inputs):
+            safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in str(sheet_name))
+            sheet_dirs.append(os.path.join(analysis_session_dir, f"sheet_{i+1}_{safe_name}"))
+        checkpoint = SessionCheckpoint(analysis_session_dir)
+        checkpoint.update_session(run_id=run_id, sheets=[
+            {"sheet_name": sheet_name, "dir": checkpoint.relative(sheet_dir)}
+            for (sheet_name, _, _, _), sheet_dir in zip(sheet_inputs, sheet_dirs)
+        ])
+        
+        results = {}
+        for i, (sheet_name, structure_analysis, column_names, file_path) in enumerate(sheet_inputs):
+            logger.info(f"分析工作表 {i+1}/{len(sheet_inputs)}: {sheet_name}")
+            sheet_dir = sheet_dirs[i]
+            sheet_results = self.run_analysis(
+                structure_analysis, column_names, file_path, session_dir=sheet_dir, run_id=run_id, use_cache=use_cache
+            )
+            for unit_name, unit_result in sheet_results.items():
+                results[f"{sheet_name} - {unit_name}"] = unit_result
+        
+        self.last_session_dir = analysis_session_dir
+        logger.info(f"多工作表分析完成，结果已保存到: {analysis_session_dir}")
+        
+        return results
+    
+    def run_analysis(self, structure_analysis, column_names, file_path, session_dir=None, run_id=None, use_cache=True):
         """
         运行所有分析单元
         
@@ -113,20 +174,26 @@ class AnalysisDispatcher:
             structure_analysis (dict): 数据结构分析结果
             column_names (list): 列名列表
             file_path (str): 数据文件路径
+            session_dir (str, optional): 结果保存目录（即本次分析的工作目录），默认按运行ID新建一个分析会话目录
+            run_id (str, optional): 运行ID，默认生成新的运行ID
+            use_cache (bool): 调用模型时是否读取响应缓存
             
         Returns:
             dict: 所有分析单元的结果
         """
         logger.info("开始运行分析调度器...")
         
-        # 创建结果目录
+        # 创建本次分析独立的工作目录（分析代码以其作为当前目录执行，同时运行的多个分析互不影响）
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        analysis_session_dir = os.path.join(self.results_dir, f"analysis_session_{timestamp}")
-        os.makedirs(analysis_session_dir, exist_ok=True)
+        run_id = run_id or new_run_id()
+        workspace = RunWorkspace(session_dir or self.session_dir_for(run_id), run_id, use_cache)
+        analysis_session_dir = workspace.root
+        self.last_session_dir = analysis_session_dir
+        logger.info(f"运行ID: {run_id}，工作目录: {analysis_session_dir}")
         
-        # 创建图表目录
-        pngs_dir = os.path.join(analysis_session_dir, "pngs")
-        os.makedirs(pngs_dir, exist_ok=True)
+        # 分析代码在工作目录中执行，数据文件使用绝对路径
+        file_path = os.path.abspath(file_path)
+        workspace.checkpoint.update_session(run_id=run_id, dataset_path=file_path)
         
         # 保存结构分析和列名信息
         with open(os.path.join(analysis_session_dir, "structure_analysis.json"), "w", encoding="utf-8") as f:
@@ -135,102 +202,489 @@ class AnalysisDispatcher:
         with open(os.path.join(analysis_session_dir, "column_names.json"), "w", encoding="utf-8") as f:
             json.dump(column_names, f, ensure_ascii=False, indent=2, cls=NumpyEncoder)
         
-        # 初始化结果字典和上下文字典
-        results = {}
-        data_context = {}
+        # 按依赖关系调度分析单元（没有依赖关系的单元可以并发执行），结果按单元顺序汇总
+        outcomes = self._schedule_units(structure_analysis, column_names, file_path, workspace)
         
-        # 记录成功执行的分析单元数量
+        results = {}
         successful_units = 0
+        for outcome in outcomes:
+            results[outcome["unit_name"]] = outcome["result"]
+            if outcome["result"]["status"] == "success":
+                successful_units += 1
+            if outcome["report_timestamp"]:
+                timestamp = outcome["report_timestamp"]
+        
+        # 保存所有结果到一个汇总文件
+        summary_file = os.path.join(analysis_session_dir, "analysis_summary.json")
+        with open(summary_file, "w", encoding="utf-8") as f:
+            json.dump({
+                "run_id": run_id,
+                "timestamp": timestamp,
+                "structure_analysis": structure_analysis,
+                "column_names": column_names,
+                "results": results
+            }, f, ensure_ascii=False, indent=2, cls=NumpyEncoder)
+        
+        # 检查是否有成功执行的分析单元
+        if successful_units == 0:
+            logger.error("所有分析单元执行失败，无法继续流程")
+            return results
+        
+        logger.info(f"分析调度器执行完成，结果已保存到: {analysis_session_dir}")
+        logger.info(f"成功执行的分析单元: {successful_units}/{len(self.analysis_units)}")
+        
+        return results
+    
+    def _context_key(self, unit):
+        """
+        获取分析单元结果在数据上下文中的键
+        
+        Args:
+            unit (BaseAnalysisUnit): 分析单元
         
-        # 依次执行每个分析单元
+        Returns:
+            str: 数据上下文键
+        """
+        return unit.unit_name.replace("单元", "").strip()
+    
+    def _unit_dependencies(self):
+        """
+        根据各分析单元声明的 context_keys 计算依赖关系（只依赖排在前面的单元）
+        
+        Returns:
+            list: 每个分析单元依赖的前序单元序号集合
+        """
+        dependencies = []
         for i, unit in enumerate(self.analysis_units):
-            unit_name = unit.unit_name
-            logger.info(f"执行分析单元 {i+1}/{len(self.analysis_units)}: {unit_name}")
-            
-            try:
-                # 生成分析代码
-                analysis_code = unit.generate_analysis_code(structure_analysis, column_names, file_path, data_context)
-                
-                if not analysis_code:
-                    logger.error(f"分析单元 {unit_name} 生成代码失败，跳过此单元")
-                    results[unit_name] = {
-                        "status": "failed",
-                        "error": "生成代码失败",
-                        "code": None,
-                        "results": None
-                    }
-                    continue
-                
-                # 执行分析代码
-                success, final_code, execution_result = unit.execute_code(analysis_code, file_path)
-                
-                if not success:
-                    logger.error(f"分析单元 {unit_name} 执行代码失败: {execution_result}")
-                    results[unit_name] = {
-                        "status": "failed",
-                        "error": execution_result,
-                        "code": final_code,
-                        "results": None
-                    }
-                    continue
-                
-                # 保存成功执行的代码
-                code_file = os.path.join(analysis_session_dir, f"{i+1}_{unit_name.replace(' ', '_')}_code.py")
-                with open(code_file, "w", encoding="utf-8") as f:
-                    f.write(final_code)
-                
-                # 保存执行结果
-                result_file = os.path.join(analysis_session_dir, f"{i+1}_{unit_name.replace(' ', '_')}_result.txt")
-                with open(result_file, "w", encoding="utf-8") as f:
-                    f.write(execution_result)
-                
-                # 保存分析结论到临时文本文件
-                temp_txt_file = os.path.join(self.temp_txts_dir, f"{i+1}_{unit_name.replace(' ', '_')}_conclusion.txt")
-                with open(temp_txt_file, "w", encoding="utf-8") as f:
-                    f.write(f"# {unit_name} 分析结论\n\n")
-                    f.write(execution_result)
-                logger.info(f"已将分析结论保存到临时文件: {temp_txt_file}")
+            context_keys = getattr(unit, 'context_keys', None)
+            if context_keys is None:
+                # 没有声明时依赖所有前序单元（与顺序执行一致）
+                dependencies.append(set(range(i)))
+            else:
+                dependencies.append({
+                    j for j in range(i)
+                    if self._context_key(self.analysis_units[j]) in context_keys
+                })
+        return dependencies
+    
+    def _schedule_units(self, structure_analysis, column_names, file_path, workspace):
+        """
+        按依赖关系执行所有分析单元
+        
+        依赖的单元全部结束后才开始执行，没有依赖关系的单元在线程池中并发执行（并发数由
+        analysis.max_parallel_units 配置，1表示按顺序执行）；启用 analysis.pipeline 时按阶段流水线执行
+        
+        Args:
+            structure_analysis (dict): 数据结构分析结果
+            column_names (list): 列名列表
+            file_path (str): 数据文件路径
+            workspace (RunWorkspace): 分析会话的工作目录
+        
+        Returns:
+            list: 按单元顺序排列的执行结果
+        """
+        pipeline_config = self.config.get('analysis', {}).get('pipeline', {}) or {}
+        if pipeline_config.get('enabled', False):
+            return self._run_pipeline(structure_analysis, column_names, file_path, workspace, pipeline_config)
+        
+        dependencies = self._unit_dependencies()
+        max_parallel = max(int(self.config.get('analysis', {}).get('max_parallel_units', 1) or 1), 1)
+        total = len(self.analysis_units)
+        outcomes = [None] * total
+        
+        def start(executor, i):
+            unit = self.analysis_units[i]
+            logger.info(f"执行分析单元 {i+1}/{total}: {unit.unit_name}")
+            # 只传入此单元依赖的、执行成功的前序单元结果（按单元顺序）
+            data_context = {
+                self._context_key(self.analysis_units[j]): outcomes[j]["context"]
+                for j in sorted(dependencies[i]) if outcomes[j]["context"] is not None
+            }
+            return executor.submit(
+                self._run_unit, i, unit, structure_analysis, column_names, file_path, data_context, workspace
+            )
+        
+        if max_parallel > 1:
+            logger.info(f"分析单元并发执行（最大并发数: {max_parallel}）")
+        
+        with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+            pending = list(range(total))
+            running = {}
+            while pending or running:
+                # 按单元顺序启动依赖已满足的单元
+                for i in list(pending):
+                    if len(running) >= max_parallel:
+                        break
+                    if all(outcomes[j] is not None for j in dependencies[i]):
+                        pending.remove(i)
+                        running[start(executor, i)] = i
                 
-                # 为每个分析单元生成独立的Markdown报告
-                # 构建提示词
-                unit_prompt = f"""请基于以下分析结果，生成一份详细的Markdown格式分析报告。
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    outcomes[running.pop(future)] = future.result()
+        
+        return outcomes
+    
+    def _run_pipeline(self, structure_analysis, column_names, file_path, workspace, pipeline_config):
+        """
+        按阶段流水线执行所有分析单元
+        
+        每个单元依次经过代码生成（调用模型）、代码执行（本地沙箱，失败时调用模型修复）和单元报告（调用模型）
+        三个阶段，每个阶段有独立的工作线程和有界队列：单元2的代码在本地执行时，单元3的代码可以同时生成，
+        单元1的报告可以同时编写。下一阶段的队列已满时上一阶段等待（背压），避免生成的代码堆积。
+        单元在其依赖的单元执行阶段结束后才进入代码生成阶段
+        
+        Args:
+            structure_analysis (dict): 数据结构分析结果
+            column_names (list): 列名列表
+            file_path (str): 数据文件路径
+            workspace (RunWorkspace): 分析会话的工作目录
+            pipeline_config (dict): 流水线配置（各阶段的工作线程数和队列长度）
+        
+        Returns:
+            list: 按单元顺序排列的执行结果
+        """
+        dependencies = self._unit_dependencies()
+        total = len(self.analysis_units)
+        queue_size = max(int(pipeline_config.get('queue_size', 2) or 0), 0)
+        stages = [
+            ("代码生成", max(int(pipeline_config.get('generate_workers', 2) or 1), 1),
+             lambda state: self._generate_stage(state, structure_analysis, column_names, file_path, workspace)),
+            ("代码执行", max(int(pipeline_config.get('execute_workers', 1) or 1), 1),
+             lambda state: self._execute_stage(state, file_path, workspace)),
+            ("单元报告", max(int(pipeline_config.get('report_workers', 2) or 1), 1),
+             lambda state: self._report_stage(state, workspace))
+        ]
+        logger.info("分析单元流水线执行（" + ", ".join(f"{name}线程数: {workers}" for name, workers, _ in stages) + f", 队列长度: {queue_size}）")
+        
+        states = [None] * total
+        # 单元的执行阶段结束（或在此之前失败）后，依赖它的单元才能开始生成代码
+        resolved = [threading.Event() for _ in range(total)]
+        stage_queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        
+        def worker(stage_index):
+            name, _, run_stage = stages[stage_index]
+            in_queue = stage_queues[stage_index]
+            while True:
+                state = in_queue.get()
+                if state is None:
+                    break
+                i = state["index"]
+                logger.info(f"[流水线] 分析单元 {state['unit'].unit_name} 进入{name}阶段")
+                try:
+                    proceed = run_stage(state)
+                except Exception as e:
+                    # 工作线程不能因异常退出，否则队列中的单元将无人处理
+                    self._stage_error(state, e)
+                    proceed = False
+                # 代码执行阶段结束或单元在此之前失败时，解除后续单元的等待
+                if stage_index >= 1 or not proceed:
+                    resolved[i].set()
+                if proceed and stage_index + 1 < len(stages):
+                    stage_queues[stage_index + 1].put(state)
+        
+        threads = []
+        for stage_index, (name, workers, _) in enumerate(stages):
+            stage_threads = [
+                threading.Thread(target=worker, args=(stage_index,), name=f"pipeline-{stage_index}-{n}", daemon=True)
+                for n in range(workers)
+            ]
+            for thread in stage_threads:
+                thread.start()
+            threads.append(stage_threads)
+        
+        # 按单元顺序送入代码生成阶段（队列已满时等待）
+        for i, unit in enumerate(self.analysis_units):
+            for j in dependencies[i]:
+                resolved[j].wait()
+            logger.info(f"执行分析单元 {i+1}/{total}: {unit.unit_name}")
+            data_context = {
+                self._context_key(self.analysis_units[j]): states[j]["outcome"]["context"]
+                for j in sorted(dependencies[i]) if states[j]["outcome"]["context"] is not None
+            }
+            states[i] = self._new_unit_state(i, unit, data_context)
+            stage_queues[0].put(states[i])
+        
+        # 逐个阶段结束工作线程（上一阶段的线程全部结束后，下一阶段不会再收到新的单元）
+        for stage_index, stage_threads in enumerate(threads):
+            for _ in stage_threads:
+                stage_queues[stage_index].put(None)
+            for thread in stage_threads:
+                thread.join()
+        
+        return [state["outcome"] for state in states]
+    
+    def _run_unit(self, i, unit, structure_analysis, column_names, file_path, data_context, workspace):
+        """
+        执行单个分析单元（生成代码、执行和修复代码、生成单元报告）
+        
+        Args:
+            i (int): 分析单元序号（从0开始，用于结果文件命名）
+            unit (BaseAnalysisUnit): 分析单元
+            structure_analysis (dict): 数据结构分析结果
+            column_names (list): 列名列表
+            file_path (str): 数据文件路径
+            data_context (dict): 此单元依赖的前序分析单元的结果
+            workspace (RunWorkspace): 分析会话的工作目录
+        
+        Returns:
+            dict: 执行结果（unit_name、result、context（供后续单元使用的结果）、report_timestamp）
+        """
+        state = self._new_unit_state(i, unit, data_context)
+        if (self._generate_stage(state, structure_analysis, column_names, file_path, workspace)
+                and self._execute_stage(state, file_path, workspace)):
+            self._report_stage(state, workspace)
+        return state["outcome"]
+    
+    def _new_unit_state(self, i, unit, data_context):
+        """
+        创建分析单元在各阶段之间传递的状态
+        
+        Args:
+            i (int): 分析单元序号
+            unit (BaseAnalysisUnit): 分析单元
+            data_context (dict): 此单元依赖的前序分析单元的结果
+        
+        Returns:
+            dict: 单元状态
+        """
+        return {
+            "index": i,
+            "unit": unit,
+            "data_context": data_context,
+            "analysis_code": None,
+            "code_cache_key": None,
+            "final_code": None,
+            "execution_result": None,
+            "txt_results": None,
+            "outcome": {"unit_name": unit.unit_name, "result": None, "context": None, "report_timestamp": None}
+        }
+    
+    def _stage_error(self, state, error):
+        """
+        记录分析单元在某个阶段中发生的异常
+        
+        Args:
+            state (dict): 单元状态
+            error (Exception): 异常
+        """
+        unit_name = state["unit"].unit_name
+        logger.error(f"分析单元 {unit_name} 执行过程中出错: {str(error)}")
+        state["outcome"]["result"] = {
+            "status": "error",
+            "error": str(error),
+            "code": None,
+            "results": None
+        }
+    
+    def _generate_stage(self, state, structure_analysis, column_names, file_path, workspace):
+        """
+        代码生成阶段（调用模型），检查点中已有生成的代码时直接使用
+        
+        Args:
+            state (dict): 单元状态
+            structure_analysis (dict): 数据结构分析结果
+            column_names (list): 列名列表
+            file_path (str): 数据文件路径
+            workspace (RunWorkspace): 分析会话的工作目录
+        
+        Returns:
+            bool: 是否继续执行后续阶段
+        """
+        i = state["index"]
+        unit = state["unit"]
+        unit_name = unit.unit_name
+        checkpoint = workspace.checkpoint
+        try:
+            record = checkpoint.completed("code", unit_name)
+            if record:
+                with open(checkpoint.resolve(record["files"]["code"]), "r", encoding="utf-8") as f:
+                    state["analysis_code"] = f.read()
+                logger.info(f"分析单元 {unit_name} 的代码已生成（检查点），跳过代码生成")
+                return True
+            
+            analysis_code = unit.generate_analysis_code(
+                structure_analysis, column_names, file_path, state["data_context"], use_cache=workspace.use_cache
+            )
+            # 生成代码的响应缓存键（代码执行失败时使缓存的响应失效）
+            state["code_cache_key"] = self.model.last_cache_key()
+            
+            if not analysis_code:
+                logger.error(f"分析单元 {unit_name} 生成代码失败，跳过此单元")
+                state["outcome"]["result"] = {
+                    "status": "failed",
+                    "error": "生成代码失败",
+                    "code": None,
+                    "results": None
+                }
+                return False
+            
+            # 保存生成的代码并记录检查点
+            generated_file = workspace.path(f"{i+1}_{unit_name.replace(' ', '_')}_generated_code.py")
+            with open(generated_file, "w", encoding="utf-8") as f:
+                f.write(analysis_code)
+            checkpoint.complete("code", unit_name, files={"code": generated_file})
+            
+            state["analysis_code"] = analysis_code
+            return True
+        
+        except Exception as e:
+            self._stage_error(state, e)
+            return False
+    
+    def _execute_stage(self, state, file_path, workspace):
+        """
+        代码执行阶段（在沙箱中执行代码，失败时调用模型修复），并保存执行结果；
+        检查点中已有执行结果时直接使用
+        
+        Args:
+            state (dict): 单元状态
+            file_path (str): 数据文件路径
+            workspace (RunWorkspace): 分析会话的工作目录
+        
+        Returns:
+            bool: 是否继续执行后续阶段
+        """
+        i = state["index"]
+        unit = state["unit"]
+        unit_name = unit.unit_name
+        analysis_session_dir = workspace.root
+        checkpoint = workspace.checkpoint
+        try:
+            record = checkpoint.completed("result", unit_name)
+            if record:
+                contents = {}
+                for name, relative_path in record["files"].items():
+                    with open(checkpoint.resolve(relative_path), "r", encoding="utf-8") as f:
+                        contents[name] = f.read()
+                state["final_code"] = contents["code"]
+                state["execution_result"] = contents["result"]
+                state["txt_results"] = contents.get("txt")
+                state["outcome"]["context"] = state["txt_results"] if state["txt_results"] else state["execution_result"]
+                logger.info(f"分析单元 {unit_name} 的代码已执行（检查点），跳过代码执行")
+                return True
+            
+            success, final_code, execution_result = unit.execute_code(state["analysis_code"], file_path, workspace)
+            
+            # 生成的代码需要修复或无法执行时，删除缓存的代码生成响应，重新分析时重新生成代码
+            if not success or final_code != state["analysis_code"]:
+                self.model.invalidate_cached_response(state["code_cache_key"])
+            
+            if not success:
+                logger.error(f"分析单元 {unit_name} 执行代码失败: {execution_result}")
+                state["outcome"]["result"] = {
+                    "status": "failed",
+                    "error": execution_result,
+                    "code": final_code,
+                    "results": None
+                }
+                return False
+            
+            # 保存成功执行的代码
+            code_file = os.path.join(analysis_session_dir, f"{i+1}_{unit_name.replace(' ', '_')}_code.py")
+            with open(code_file, "w", encoding="utf-8") as f:
+                f.write(final_code)
+            
+            # 保存执行结果
+            result_file = os.path.join(analysis_session_dir, f"{i+1}_{unit_name.replace(' ', '_')}_result.txt")
+            with open(result_file, "w", encoding="utf-8") as f:
+                f.write(execution_result)
+            
+            # 保存分析结论到临时文本文件
+            temp_txt_file = workspace.path("temp_txts", f"{i+1}_{unit_name.replace(' ', '_')}_conclusion.txt")
+            with open(temp_txt_file, "w", encoding="utf-8") as f:
+                f.write(f"# {unit_name} 分析结论\n\n")
+                f.write(execution_result)
+            logger.info(f"已将分析结论保存到临时文件: {temp_txt_file}")
+            
+            # 读取文本结果（如果有）
+            txt_results = None
+            txt_copy_file = None
+            expected_txt_files = [
+                "analysis_results.txt",
+                "group_comparison_results.txt",
+                "category_distribution_results.txt",
+                "time_trend_results.txt",
+                "correlation_results.txt"
+            ]
+            
+            if i < len(expected_txt_files):
+                txt_file = expected_txt_files[i]
+                txt_file_path = workspace.path("pngs", txt_file)
+                if os.path.exists(txt_file_path):
+                    try:
+                        with open(txt_file_path, "r", encoding="utf-8") as f:
+                            txt_results = f.read()
+                        
+                        # 将文本结果复制到会话目录
+                        txt_copy_file = os.path.join(analysis_session_dir, txt_file)
+                        with open(txt_copy_file, "w", encoding="utf-8") as f:
+                            f.write(txt_results)
+                    except Exception as e:
+                        logger.warning(f"无法加载文本结果文件 {txt_file}: {str(e)}")
+            
+            checkpoint.complete("result", unit_name, files={
+                "code": code_file,
+                "result": result_file,
+                "txt": txt_copy_file if txt_results else None
+            })
+            
+            state["final_code"] = final_code
+            state["execution_result"] = execution_result
+            state["txt_results"] = txt_results
+            
+            # 更新数据上下文，用于依赖此单元的后续分析单元（执行结束后即可使用，不需要等待单元报告）
+            state["outcome"]["context"] = txt_results if txt_results else execution_result
+            return True
+        
+        except Exception as e:
+            self._stage_error(state, e)
+            return False
+    
+    def _report_stage(self, state, workspace):
+        """
+        单元报告阶段（调用模型为分析单元生成独立的Markdown报告），检查点中已有单元报告时直接使用
+        
+        Args:
+            state (dict): 单元状态
+            workspace (RunWorkspace): 分析会话的工作目录
+        """
+        unit_name = state["unit"].unit_name
+        execution_result = state["execution_result"]
+        txt_results = state["txt_results"]
+        checkpoint = workspace.checkpoint
+        try:
+            record = checkpoint.completed("report", unit_name)
+            if record:
+                logger.info(f"分析单元 {unit_name} 的报告已生成（检查点），跳过单元报告")
+                state["outcome"]["result"] = {
+                    "status": "success",
+                    "error": None,
+                    "code": state["final_code"],
+                    "results": execution_result,
+                    "txt_results": txt_results,
+                    "report_file": checkpoint.resolve(record["files"]["report"])
+                }
+                state["outcome"]["report_timestamp"] = record.get("timestamp")
+                return
+            
+            # 为每个分析单元生成独立的Markdown报告
+            # 构建提示词
+            unit_prompt = f"""请基于以下分析结果，生成一份详细的Markdown格式分析报告。
 
 ## 分析单元
 {unit_name}
 
 ## 分析结论
-{execution_result}
+{self.prompt_builder.fit(execution_result, "execution_result")}
 """
-                
-                # 添加文本结果（如果有）
-                txt_results = None
-                expected_txt_files = [
-                    "analysis_results.txt",
-                    "group_comparison_results.txt",
-                    "category_distribution_results.txt",
-                    "time_trend_results.txt",
-                    "correlation_results.txt"
-                ]
-                
-                if i < len(expected_txt_files):
-                    txt_file = expected_txt_files[i]
-                    txt_file_path = os.path.join("pngs", txt_file)
-                    if os.path.exists(txt_file_path):
-                        try:
-                            with open(txt_file_path, "r", encoding="utf-8") as f:
-                                txt_results = f.read()
-                            
-                            # 将文本结果复制到会话目录
-                            with open(os.path.join(analysis_session_dir, txt_file), "w", encoding="utf-8") as f:
-                                f.write(txt_results)
-                                
-                            # 添加到提示词中
-                            unit_prompt += f"\n\n## 详细分析\n{txt_results}"
-                        except Exception as e:
-                            logger.warning(f"无法加载文本结果文件 {txt_file}: {str(e)}")
-                
-                # 添加报告要求
-                unit_prompt += """
+            
+            # 添加文本结果（如果有）
+            if txt_results:
+                unit_prompt += f"\n\n## 详细分析\n{self.prompt_builder.fit(txt_results, 'execution_result')}"
+            
+            # 添加报告要求
+            unit_prompt += """
 
 ## 报告要求
 请生成一份专业的Markdown格式分析报告，包含以下部分：
@@ -240,82 +694,56 @@ class AnalysisDispatcher:
 4. 总结
 
 请确保报告内容全面、准确，并且格式规范。"""
+            
+            # 使用大模型生成Markdown报告
+            logger.info(f"开始使用大模型为分析单元 {unit_name} 生成Markdown报告...")
+            self.prompt_builder.log_prompt(f"{unit_name}/单元报告", unit_prompt)
+            try:
+                # 调用enhanced_markdown_report_generator生成报告
+                unit_report_content = self.report_generator._generate_report_with_model(
+                    unit_prompt, task="unit_report", use_cache=workspace.use_cache
+                )
                 
-                # 使用大模型生成Markdown报告
-                logger.info(f"开始使用大模型为分析单元 {unit_name} 生成Markdown报告...")
-                try:
-                    # 调用enhanced_markdown_report_generator生成报告
-                    unit_report_content = self.report_generator._generate_report_with_model(unit_prompt)
-                    
-                    if not unit_report_content:
-                        logger.warning(f"大模型未能生成分析单元 {unit_name} 的报告，将使用默认格式")
-                        # 使用默认格式
-                        unit_report_content = f"# {unit_name} 分析报告\n\n"
-                        unit_report_content += f"## 分析结论\n\n{execution_result}\n\n"
-                        if txt_results:
-                            unit_report_content += f"## 详细分析\n\n{txt_results}\n\n"
-                except Exception as e:
-                    logger.error(f"使用大模型生成分析单元 {unit_name} 的报告时出错: {str(e)}")
+                if not unit_report_content:
+                    logger.warning(f"大模型未能生成分析单元 {unit_name} 的报告，将使用默认格式")
                     # 使用默认格式
                     unit_report_content = f"# {unit_name} 分析报告\n\n"
                     unit_report_content += f"## 分析结论\n\n{execution_result}\n\n"
                     if txt_results:
                         unit_report_content += f"## 详细分析\n\n{txt_results}\n\n"
-                
-                # 保存单元报告到文件
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                unit_type_name = unit_name.replace("单元", "").strip().replace(" ", "_").lower()
-                unit_report_file = os.path.join("reports", f"{unit_type_name}_{timestamp}.md")
-                os.makedirs(os.path.dirname(unit_report_file), exist_ok=True)
-                with open(unit_report_file, "w", encoding="utf-8") as f:
-                    f.write(unit_report_content)
-                logger.info(f"已为分析单元 {unit_name} 生成独立的Markdown报告: {unit_report_file}")
-                
-                # 更新结果和上下文
-                results[unit_name] = {
-                    "status": "success",
-                    "error": None,
-                    "code": final_code,
-                    "results": execution_result,
-                    "txt_results": txt_results,
-                    "report_file": unit_report_file
-                }
-                
-                # 更新数据上下文，用于后续分析单元
-                unit_key = unit_name.replace("单元", "").strip()
-                data_context[unit_key] = txt_results if txt_results else execution_result
-                
-                logger.info(f"分析单元 {unit_name} 执行成功")
-                successful_units += 1
-                
             except Exception as e:
-                logger.error(f"分析单元 {unit_name} 执行过程中出错: {str(e)}")
-                results[unit_name] = {
-                    "status": "error",
-                    "error": str(e),
-                    "code": None,
-                    "results": None
-                }
-        
-        # 保存所有结果到一个汇总文件
-        summary_file = os.path.join(analysis_session_dir, "analysis_summary.json")
-        with open(summary_file, "w", encoding="utf-8") as f:
-            json.dump({
-                "timestamp": timestamp,
-                "structure_analysis": structure_analysis,
-                "column_names": column_names,
-                "results": results
-            }, f, ensure_ascii=False, indent=2, cls=NumpyEncoder)
-        
-        # 检查是否有成功执行的分析单元
-        if successful_units == 0:
-            logger.error("所有分析单元执行失败，无法继续流程")
-            return results
-        
-        logger.info(f"分析调度器执行完成，结果已保存到: {analysis_session_dir}")
-        logger.info(f"成功执行的分析单元: {successful_units}/{len(self.analysis_units)}")
+                logger.error(f"使用大模型生成分析单元 {unit_name} 的报告时出错: {str(e)}")
+                # 使用默认格式
+                unit_report_content = f"# {unit_name} 分析报告\n\n"
+                unit_report_content += f"## 分析结论\n\n{execution_result}\n\n"
+                if txt_results:
+                    unit_report_content += f"## 详细分析\n\n{txt_results}\n\n"
+            
+            # 保存单元报告到文件
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            unit_type_name = unit_name.replace("单元", "").strip().replace(" ", "_").lower()
+            unit_report_file = workspace.path("reports", f"{unit_type_name}_{timestamp}.md")
+            os.makedirs(os.path.dirname(unit_report_file), exist_ok=True)
+            with open(unit_report_file, "w", encoding="utf-8") as f:
+                f.write(unit_report_content)
+            logger.info(f"已为分析单元 {unit_name} 生成独立的Markdown报告: {unit_report_file}")
+            checkpoint.complete("report", unit_name, files={"report": unit_report_file}, timestamp=timestamp)
+            
+            # 更新结果
+            state["outcome"]["result"] = {
+                "status": "success",
+                "error": None,
+                "code": state["final_code"],
+                "results": execution_result,
+                "txt_results": txt_results,
+                "report_file": unit_report_file
+            }
+            state["outcome"]["report_timestamp"] = timestamp
+            
+            logger.info(f"分析单元 {unit_name} 执行成功")
         
-        return results
+        except Exception as e:
+            self._stage_error(state, e)
     
     def get_combined_results(self, results):
         """
@@ -9,10 +9,15 @@ import os
 import logging
 import time
 import re
+import sys
 import subprocess
 import json
 import numpy as np
 
+from ..dataset_cache import get_loading_hint
+from ..prompt_builder import PromptBuilder
+from ..stream_extractors import CodeBlockWatcher
+
 logger = logging.getLogger(__name__)
 
 # 自定义JSON编码器，处理NumPy类型
@@ -51,17 +56,23 @@ class BaseAnalysisUnit:
         self.model = model
         self.config = config
         self.unit_name = "基础分析单元"
+        # 此单元使用的前序单元结果（数据上下文键），调度器据此决定哪些单元可以并发执行；
+        # None 表示依赖所有前序单元（按顺序执行），空列表表示提示词只基于数据结构、不使用其他单元的结果，
+        # 可以与其他单元并发执行
+        self.context_keys = None
         self.max_attempts = 3
+        self.prompt_builder = PromptBuilder(config)
     
-    def generate_analysis_code(self, structure_analysis, column_names, csv_path, data_context=None):
+    def generate_analysis_code(self, structure_analysis, column_names, csv_path, data_context=None, use_cache=True):
         """
         生成数据分析代码
         
         Args:
             structure_analysis (dict): 数据结构分析结果
             column_names (list): 列名列表
-            csv_path (str): CSV文件路径
+            csv_path (str): 数据文件路径（CSV或Parquet数据集缓存）
             data_context (dict, optional): 之前分析单元的结果和上下文
+            use_cache (bool): 是否读取模型响应缓存
             
         Returns:
             str: 生成的Python代码，如果生成失败则返回None
@@ -71,18 +82,20 @@ class BaseAnalysisUnit:
         # 构建提示词
         prompt = self.get_prompt(structure_analysis, column_names, csv_path)
         
+        # 说明数据文件的格式和读取方式（数据集可能是Parquet缓存而不是CSV）
+        prompt += "\n" + get_loading_hint(csv_path)
+        self.prompt_builder.log_prompt(f"{self.unit_name}/生成代码", prompt)
+        
         try:
-            # 调用模型（使用流式API调用）
+            # 调用模型（使用流式API调用，第一个Python代码块结束后提前结束）
             logger.info(f"[{self.unit_name}] 尝试调用API生成代码（流式输出）...")
-            print(f"\n开始为 {self.unit_name} 生成分析代码...\n")
-            
-            response = ""
-            for chunk in self.model.call_model_stream(prompt):
-                if chunk:
-                    print(chunk, end='', flush=True)
-                    response += chunk
-            
-            print(f"\n\n{self.unit_name} 代码生成完成\n")
+            response = self.model.stream_text(
+                prompt,
+                label=f"为 {self.unit_name} 生成分析代码",
+                task="code_generation",
+                stop=CodeBlockWatcher("python"),
+                use_cache=use_cache
+            )
             
             if not response:
                 logger.error(f"[{self.unit_name}] 生成数据分析代码失败: 模型未返回有效响应")
@@ -92,6 +105,7 @@ class BaseAnalysisUnit:
             code = self._extract_python_code(response)
             if not code:
                 logger.error(f"[{self.unit_name}] 生成数据分析代码失败: 无法从响应中提取Python代码")
+                self.model.invalidate_cached_response(self.model.last_cache_key())
                 
                 # 保存完整响应以便调试
                 debug_file = f"debug/model_prompt_debug_{time.strftime('%Y%m%d%H%M%S')}.txt"
@@ -121,20 +135,22 @@ class BaseAnalysisUnit:
         Args:
             structure_analysis (dict): 数据结构分析结果
             column_names (list): 列名列表
-            csv_path (str): CSV文件路径
+            csv_path (str): 数据文件路径（CSV或Parquet数据集缓存）
             
         Returns:
             str: 提示词
         """
         raise NotImplementedError("子类必须实现get_prompt方法")
     
-    def fix_analysis_code(self, code, error_message):
+    def fix_analysis_code(self, code, error_message, attempt=1, file_path=None):
         """
         修复数据分析代码
         
         Args:
             code (str): 原始代码
             error_message (str): 错误信息
+            attempt (int): 第几轮修复（从1开始），配置了升级的修复任务从第二轮起使用默认模型
+            file_path (str, optional): 数据文件路径，提供时在提示词中说明数据文件的格式和读取方式
         
         Returns:
             str: 修复后的代码，如果修复失败则返回None
@@ -153,24 +169,27 @@ class BaseAnalysisUnit:
 
 执行时出现的错误:
 ```
-{error_message}
+{self.prompt_builder.fit(error_message, "error_message")}
 ```
 
 请提供修复后的完整代码，确保它能够正确执行并处理上述错误。
 请确保代码是高质量的、可执行的，并且能够处理各种边缘情况。
 """
+            if file_path:
+                # 与生成代码时相同的读取说明，避免修复时改回 pd.read_csv 读取Parquet缓存
+                prompt += "\n" + get_loading_hint(file_path)
+            self.prompt_builder.log_prompt(f"{self.unit_name}/修复代码", prompt)
             
-            # 调用模型（使用流式API调用）
+            # 调用模型（使用流式API调用，第一个Python代码块结束后提前结束；
+            # 修复是在上一次响应失败后的重试，不读取响应缓存）
             logger.info(f"[{self.unit_name}] 尝试调用API修复代码（流式输出）...")
-            print(f"\n开始修复 {self.unit_name} 的代码...\n")
-            
-            response = ""
-            for chunk in self.model.call_model_stream(prompt):
-                if chunk:
-                    print(chunk, end='', flush=True)
-                    response += chunk
-            
-            print(f"\n\n{self.unit_name} 代码修复完成\n")
+            response = self.model.stream_text(
+                prompt,
+                label=f"修复 {self.unit_name} 的代码",
+                task=self.model.escalation_task("code_fix", attempt),
+                stop=CodeBlockWatcher("python"),
+                use_cache=False
+            )
             
             if not response:
                 logger.error(f"[{self.unit_name}] 修复数据分析代码失败: 模型未返回有效响应")
@@ -180,6 +199,7 @@ class BaseAnalysisUnit:
             fixed_code = self._extract_python_code(response)
             if not fixed_code:
                 logger.error(f"[{self.unit_name}] 修复数据分析代码失败: 无法从响应中提取Python代码")
+                self.model.invalidate_cached_response(self.model.last_cache_key())
                 
                 # 保存完整响应以便调试
                 debug_file = f"debug/model_response_debug_{time.strftime('%Y%m%d%H%M%S')}.txt"
@@ -222,14 +242,14 @@ class BaseAnalysisUnit:
 {', '.join(column_names)}
 
 要求:
-1. 代码应该读取CSV文件并进行数据分析
+1. 代码应该读取数据文件并进行数据分析
 2. 代码应该将分析结果以纯文本格式保存到文件中，不要使用JSON格式
 3. 代码应该简洁精炼，不超过2000行
 4. 代码应该使用pandas和numpy库进行数据分析
 5. 代码应该包含必要的注释，解释主要分析步骤
 6. 代码应该处理可能的错误和异常情况
 
-请生成一个可执行的Python脚本，包含必要的导入语句和异常处理。代码应该假设CSV文件路径作为命令行参数传入，并将分析结果保存到文本文件中。
+请生成一个可执行的Python脚本，包含必要的导入语句和异常处理。代码应该假设数据文件路径作为命令行参数传入，并将分析结果保存到文本文件中。
 """
         return prompt
     
@@ -296,13 +316,14 @@ class BaseAnalysisUnit:
         logger.warning(f"[{self.unit_name}] 无法从响应中提取Python代码")
         return None
     
-    def execute_code(self, code, file_path):
+    def execute_code(self, code, file_path, workspace=None):
         """
         执行代码并在出错时尝试修复，最多尝试三次
         
         Args:
             code (str): 要执行的Python代码
             file_path (str): 数据文件路径
+            workspace (RunWorkspace, optional): 分析会话的工作目录，默认使用当前目录
         
         Returns:
             tuple: (成功标志, 最终代码, 执行结果)
@@ -310,7 +331,7 @@ class BaseAnalysisUnit:
         logger.info(f"[{self.unit_name}] 开始执行并尝试修复代码...")
         
         # 保存原始代码
-        code_file = f"temp_py/{self.unit_name}_code_to_execute_{time.strftime('%Y%m%d%H%M%S')}.py"
+        code_file = self._temp_code_path("code_to_execute", workspace)
         os.makedirs(os.path.dirname(code_file), exist_ok=True)
         with open(code_file, 'w', encoding='utf-8') as f:
             f.write(code)
@@ -322,7 +343,7 @@ class BaseAnalysisUnit:
             logger.info(f"[{self.unit_name}] 执行代码尝试 {current_attempt}/{self.max_attempts}")
             
             # 执行代码
-            result, error = self._execute_code_in_sandbox(current_code, file_path)
+            result, error = self._execute_code_in_sandbox(current_code, file_path, workspace)
             
             # 如果执行成功，返回结果
             if result and not error:
@@ -336,7 +357,7 @@ class BaseAnalysisUnit:
             
             # 尝试修复代码
             logger.info(f"[{self.unit_name}] 代码执行失败，尝试修复（尝试 {current_attempt}/{self.max_attempts}）")
-            fixed_code = self.fix_analysis_code(current_code, error)
+            fixed_code = self.fix_analysis_code(current_code, error, current_attempt, file_path)
             
             # 如果修复失败，返回失败结果
             if not fixed_code:
@@ -350,13 +371,33 @@ class BaseAnalysisUnit:
         # 理论上不会执行到这里，但为了代码完整性，添加一个默认返回值
         return False, current_code, f"[{self.unit_name}] 达到最大尝试次数，终止修复流程"
     
-    def _execute_code_in_sandbox(self, code, file_path):
+    def _temp_code_path(self, kind, workspace=None):
+        """
+        获取临时代码文件路径（有工作目录时保存在工作目录的 temp_py 下）
+        
+        Args:
+            kind (str): 文件类型（如 "temp_code"、"code_to_execute"）
+            workspace (RunWorkspace, optional): 分析会话的工作目录
+        
+        Returns:
+            str: 临时代码文件路径
+        """
+        file_name = f"{self.unit_name}_{kind}_{time.strftime('%Y%m%d%H%M%S')}.py"
+        if workspace is not None:
+            return workspace.path("temp_py", file_name)
+        return os.path.join("temp_py", file_name)
+    
+    def _execute_code_in_sandbox(self, code, file_path, workspace=None):
         """
         在沙箱环境中执行Python代码
         
+        有工作目录时以工作目录作为当前目录执行，代码中的相对路径（如 "pngs/analysis_results.txt"）
+        都写到本次分析会话内，并通过环境变量传入运行ID和工作目录
+        
         Args:
             code (str): 要执行的Python代码
             file_path (str): 数据文件路径
+            workspace (RunWorkspace, optional): 分析会话的工作目录，默认使用当前目录
         
         Returns:
             tuple: (执行结果, 错误信息)
@@ -364,19 +405,20 @@ class BaseAnalysisUnit:
         logger.info(f"[{self.unit_name}] 在沙箱环境中执行代码...")
         
         # 创建临时文件
-        temp_file = f"temp_py/{self.unit_name}_temp_code_{time.strftime('%Y%m%d%H%M%S')}.py"
+        temp_file = self._temp_code_path("temp_code", workspace)
         os.makedirs(os.path.dirname(temp_file), exist_ok=True)
         with open(temp_file, 'w', encoding='utf-8') as f:
             f.write(code)
         
-        # 构建执行命令
-        cmd = f"python {temp_file} {file_path}"
+        # 构建执行命令（当前目录改变后，文件路径需要使用绝对路径）
+        cmd = [sys.executable, os.path.abspath(temp_file), os.path.abspath(file_path)]
         
         try:
             # 执行代码
             process = subprocess.Popen(
                 cmd, 
-                shell=True, 
+                cwd=workspace.root if workspace is not None else None,
+                env=workspace.env() if workspace is not None else None,
                 stdout=subprocess.PIPE, 
                 stderr=subprocess.PIPE,
                 text=True
@@ -6,8 +6,7 @@
 """
 
 import logging
-import json
-from .base_analysis_unit import BaseAnalysisUnit, NumpyEncoder
+from .base_analysis_unit import BaseAnalysisUnit
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +25,7 @@ class GeneralStatisticsUnit(BaseAnalysisUnit):
         """
         super().__init__(model, config)
         self.unit_name = "总体数据统计分析单元"
+        self.context_keys = []
     
     def get_prompt(self, structure_analysis, column_names, csv_path):
         """
@@ -34,22 +34,22 @@ class GeneralStatisticsUnit(BaseAnalysisUnit):
         Args:
             structure_analysis (dict): 数据结构分析结果
             column_names (list): 列名列表
-            csv_path (str): CSV文件路径
+            csv_path (str): 数据文件路径（CSV或Parquet数据集缓存）
             
         Returns:
             str: 提示词
         """
         return f"""
-分析CSV文件中的数据，并生成总体数据统计分析。
+分析数据文件中的数据，并生成总体数据统计分析。
 
-CSV文件路径: {csv_path}
+数据文件路径: {csv_path}
 列名: {', '.join(column_names)}
 
 数据结构分析:
-{json.dumps(structure_analysis, ensure_ascii=False, indent=2, cls=NumpyEncoder)}
+{self.prompt_builder.schema(structure_analysis)}
 
 请编写Python代码，完成以下任务:
-1. 读取CSV文件
+1. 读取数据文件（按下方数据文件说明中的方式读取）
 2. 进行基本的描述性统计分析
 3. 分析数值列和分类列的分布
 4. 将分析结果保存为纯文本格式
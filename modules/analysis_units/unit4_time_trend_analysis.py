@@ -6,8 +6,7 @@
 """
 
 import logging
-from .base_analysis_unit import BaseAnalysisUnit, NumpyEncoder
-import json
+from .base_analysis_unit import BaseAnalysisUnit
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +25,7 @@ class TimeTrendAnalysisUnit(BaseAnalysisUnit):
         """
         super().__init__(model, config)
         self.unit_name = "时间趋势分析单元"
+        self.context_keys = []
     
     def _build_prompt(self, structure_analysis, column_names, data_context=None):
         """
@@ -39,29 +39,28 @@ class TimeTrendAnalysisUnit(BaseAnalysisUnit):
         Returns:
             str: 构建的提示词
         """
-        # 将结构分析转换为字符串表示
-        structure_str = str(structure_analysis)
-        
-        # 如果有前一个单元的上下文，则包含在提示中
+        # 如果有前一个单元的上下文，则包含在提示中（按data_context预算截断）
         context_str = ""
         if data_context:
             context_parts = []
             if "general_statistics" in data_context:
-                context_parts.append(f"总体统计分析结果: {data_context['general_statistics']}")
+                context_parts.append(self.prompt_builder.context(
+                    {"总体统计分析结果": data_context['general_statistics']}
+                ))
             
             if context_parts:
                 context_str = "\n前一个分析单元的结果:\n" + "\n".join(context_parts) + "\n\n请基于上述分析结果，进行更深入的时间趋势分析。"
         
         prompt = f"""
-分析CSV文件中的数据，并生成时间趋势分析。
+分析数据文件中的数据，并生成时间趋势分析。
 
 列名: {', '.join(column_names)}
 
 数据结构分析:
-{json.dumps(structure_analysis, ensure_ascii=False, indent=2, cls=NumpyEncoder)}
+{self.prompt_builder.schema(structure_analysis)}
 
 请编写Python代码，完成以下任务:
-1. 读取CSV文件
+1. 读取数据文件（按下方数据文件说明中的方式读取）
 2. 识别时间列并将其转换为适当的日期时间格式
 3. 分析时间序列数据的趋势和模式
 4. 将分析结果保存为纯文本格式
@@ -91,7 +90,7 @@ class TimeTrendAnalysisUnit(BaseAnalysisUnit):
         Args:
             structure_analysis (dict): 数据结构分析结果
             column_names (list): 列名列表
-            csv_file_path (str): CSV文件路径
+            csv_file_path (str): 数据文件路径（CSV或Parquet数据集缓存）
             data_context (dict, optional): 之前分析单元的结果和上下文
             
         Returns:
@@ -99,5 +98,5 @@ class TimeTrendAnalysisUnit(BaseAnalysisUnit):
         """
         # 添加文件路径到提示词中
         prompt = self._build_prompt(structure_analysis, column_names, data_context)
-        prompt = prompt.replace("请编写Python代码", f"CSV文件路径: {csv_file_path}\n\n请编写Python代码")
+        prompt = prompt.replace("请编写Python代码", f"数据文件路径: {csv_file_path}\n\n请编写Python代码")
         return prompt
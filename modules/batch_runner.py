@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量分析模块 - 在一个进程中分析一个目录（或通配符匹配）的所有数据文件
+
+所有文件共用同一个模型连接器（连接池、端点池、限流器、响应缓存）和同一个Excel分析器，
+只需要启动一次解释器、导入一次模块；文件在线程池中并发分析（并发数由 analysis.batch.max_workers
+或 --workers 配置），每个文件使用独立的分析会话目录。
+全部完成后写入批量汇总文件，记录每个文件的状态、耗时、运行ID和报告路径
+"""
+
+import os
+import glob
+import json
+import time
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .input_readers import get_reader
+from .run_workspace import new_run_id
+from .session_checkpoint import SessionCheckpoint
+
+logger = logging.getLogger(__name__)
+
+
+def collect_batch_files(source):
+    """
+    收集要批量分析的数据文件
+
+    Args:
+        source (str): 目录（分析目录下所有支持格式的文件，不递归）或通配符（如 "sample_data/*.xlsx"）
+
+    Returns:
+        list: 按文件名排序的数据文件路径列表（跳过不支持的格式和Excel临时文件）
+    """
+    if os.path.isdir(source):
+        candidates = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        candidates = glob.glob(source, recursive=True)
+
+    files = [
+        path for path in candidates
+        if os.path.isfile(path)
+        and not os.path.basename(path).startswith('~$')
+        and get_reader(path) is not None
+    ]
+    return sorted(files)
+
+
+class BatchRunner:
+    """
+    批量分析类
+    """
+
+    def __init__(self, analyzer, config):
+        """
+        初始化批量分析
+
+        Args:
+            analyzer (ExcelAnalyzer): 共用的Excel分析器
+            config (dict): 配置信息（读取 analysis.batch）
+        """
+        batch_config = config.get('analysis', {}).get('batch', {}) or {}
+        self.analyzer = analyzer
+        # 同时分析的文件数
+        self.max_workers = batch_config.get('max_workers', 2)
+        # 批量汇总文件目录
+        self.summary_dir = batch_config.get('summary_dir', 'reports')
+
+    def run(self, files, max_workers=None, force=False):
+        """
+        并发分析所有文件并写入批量汇总
+
+        Args:
+            files (list): 数据文件路径列表
+            max_workers (int, optional): 同时分析的文件数，默认使用 analysis.batch.max_workers
+            force (bool): 是否忽略可复用的历史会话，强制重新分析
+
+        Returns:
+            dict: 批量汇总（batch_id、耗时、各文件的结果）
+        """
+        workers = max(int(max_workers or self.max_workers or 1), 1)
+        batch_id = new_run_id()
+        logger.info(f"开始批量分析 {len(files)} 个文件（批次: {batch_id}，并发数: {workers}）")
+
+        started_at = datetime.now().isoformat(timespec='seconds')
+        start = time.perf_counter()
+        entries = [None] * len(files)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+            futures = {
+                executor.submit(self._analyze_file, file_path, force): index
+                for index, file_path in enumerate(files)
+            }
+            for future in as_completed(futures):
+                entry = future.result()
+                entries[futures[future]] = entry
+                logger.info(f"批量分析: {entry['file']} {entry['status']}（{entry['seconds']}秒）")
+                print(f"[{entry['status']}] {entry['file']}（{entry['seconds']}秒）")
+
+        wall_seconds = round(time.perf_counter() - start, 2)
+        status_counts = {}
+        for entry in entries:
+            status_counts[entry["status"]] = status_counts.get(entry["status"], 0) + 1
+
+        summary = {
+            "batch_id": batch_id,
+            "started_at": started_at,
+            "workers": workers,
+            "file_count": len(files),
+            "wall_seconds": wall_seconds,
+            "total_file_seconds": round(sum(entry["seconds"] for entry in entries), 2),
+            "status_counts": status_counts,
+            "files": entries
+        }
+        summary["summary_file"] = self.write_summary(summary)
+        logger.info(
+            f"批量分析完成: {len(files)} 个文件, 总耗时 {wall_seconds}秒 "
+            f"(各文件耗时合计 {summary['total_file_seconds']}秒), 状态 {status_counts}"
+        )
+        return summary
+
+    def _analyze_file(self, file_path, force):
+        """
+        分析单个文件（工作线程中执行，异常不会中断其他文件）
+
+        Args:
+            file_path (str): 数据文件路径
+            force (bool): 是否忽略可复用的历史会话
+
+        Returns:
+            dict: 文件的分析结果（file、status、seconds、run_id、session_dir、报告路径、失败的分析单元、错误信息）
+        """
+        run_id = new_run_id()
+        session_dir = self.analyzer.dispatcher.session_dir_for(run_id)
+        entry = {
+            "file": file_path,
+            "status": "failed",
+            "seconds": 0.0,
+            "run_id": run_id,
+            "session_dir": None,
+            "markdown_file": None,
+            "html_file": None,
+            "failed_units": [],
+            "error": None
+        }
+
+        start = time.perf_counter()
+        error = None
+        try:
+            markdown_report, html_report = self.analyzer.analyze_excel(file_path, force=force, run_id=run_id)
+        except Exception as e:
+            logger.error(f"批量分析文件 {file_path} 时出错: {str(e)}")
+            markdown_report, html_report = None, None
+            error = f"分析文件时出错: {str(e)}"
+        entry["seconds"] = round(time.perf_counter() - start, 2)
+
+        reused = self.analyzer.reused_sessions.pop(run_id, None)
+        if reused:
+            # 文件未变化，复用了历史会话
+            entry["status"] = "reused"
+            entry["run_id"] = None
+            entry["session_dir"] = reused["session_dir"]
+            entry["markdown_file"] = reused.get("markdown_file")
+            entry["html_file"] = html_report
+            return entry
+
+        if not SessionCheckpoint.exists(session_dir):
+            # 没有复用历史会话也没有新建分析会话：分析在开始之前失败，返回的内容是错误信息
+            entry["error"] = error or markdown_report or "分析未生成任何结果"
+            return entry
+
+        checkpoint = SessionCheckpoint(session_dir)
+        manifest = checkpoint.load()
+        session_info = manifest.get("session", {})
+        stages = manifest.get("stages", {})
+        entry["session_dir"] = session_dir
+        entry["failed_units"] = session_info.get("failed_units", [])
+        for name, stage, file_key in (("markdown_file", "markdown_report", "markdown"), ("html_file", "html_report", "html")):
+            relative_path = (stages.get(stage) or {}).get("files", {}).get(file_key)
+            entry[name] = checkpoint.resolve(relative_path) if relative_path else None
+
+        # 会话未完成（status 仍为 running）表示分析在生成报告之前失败，返回的内容是错误信息
+        status = session_info.get("status")
+        if status == "complete":
+            entry["status"] = "success"
+        elif status == "partial":
+            entry["status"] = "partial"
+        else:
+            entry["error"] = error or markdown_report
+        return entry
+
+    def write_summary(self, summary):
+        """
+        写入批量汇总文件
+
+        Args:
+            summary (dict): 批量汇总
+
+        Returns:
+            str: 汇总文件路径，写入失败时返回None
+        """
+        try:
+            os.makedirs(self.summary_dir, exist_ok=True)
+            summary_file = os.path.join(self.summary_dir, f"batch_summary_{summary['batch_id']}.json")
+            with open(summary_file, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            logger.info(f"批量汇总已保存到: {summary_file}")
+            return summary_file
+        except Exception as e:
+            logger.error(f"写入批量汇总失败: {str(e)}")
+            return None
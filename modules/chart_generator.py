@@ -15,6 +15,8 @@ import subprocess
 import traceback
 from pathlib import Path
 
+from .stream_extractors import CodeBlockWatcher
+
 logger = logging.getLogger(__name__)
 
 class ChartGenerator:
@@ -195,18 +197,8 @@ class ChartGenerator:
         logger.info("开始流式生成图表代码...")
         
         # 使用流式API调用模型
-        full_response = ""
-        print("\n开始生成图表代码...")
-        
         try:
-            for chunk in self.model.call_model_stream(prompt):
-                # 提取内容
-                content = chunk.get('content', '')
-                if content:
-                    print(content, end='', flush=True)
-                    full_response += content
-            
-            print("\n代码生成完成")
+            full_response = self.model.stream_text(prompt, label="生成图表代码", task="chart", stop=CodeBlockWatcher("python"))
             
             # 从响应中提取Python代码
             code = self._extract_python_code(full_response)
@@ -14,6 +14,7 @@ import subprocess
 from datetime import datetime
 
 from .analysis_dispatcher import AnalysisDispatcher
+from .stream_extractors import CodeBlockWatcher
 
 logger = logging.getLogger(__name__)
 
@@ -247,15 +248,7 @@ if __name__ == "__main__":
             
             # 调用模型（使用流式API调用）
             logger.info("尝试调用API修复代码（流式输出）...")
-            print("\n开始修复代码...\n")
-            
-            response = ""
-            for chunk in self.model.call_model_stream(prompt):
-                if chunk:
-                    print(chunk, end='', flush=True)
-                    response += chunk
-            
-            print("\n\n代码修复完成\n")
+            response = self.model.stream_text(prompt, label="修复代码", task="code_fix", stop=CodeBlockWatcher("python"))
             
             if not response:
                 logger.error("修复数据分析代码失败: 模型未返回有效响应")
@@ -11,6 +11,8 @@ import json
 import re
 import time
 
+from .stream_extractors import CodeBlockWatcher
+
 logger = logging.getLogger(__name__)
 
 class CodeGenerator:
@@ -71,10 +73,7 @@ class CodeGenerator:
 """
 
             # 调用模型（使用流式API调用）
-            response = ""
-            for chunk in self.model.call_model_stream(prompt):
-                if chunk:
-                    response += chunk
+            response = self.model.stream_text(prompt, label="生成数据分析代码", task="code_generation", stop=CodeBlockWatcher("python"))
             
             if not response:
                 logger.error("生成数据分析代码失败: 模型未返回有效响应")
@@ -348,7 +347,7 @@ if __name__ == "__main__":
 """
             
             # 调用模型
-            response = self.model.call_model(prompt)
+            response = self.model.call_model(prompt, task="code_fix")
             if not response:
                 logger.error("修复数据分析代码失败: 模型未返回有效响应")
                 return None
@@ -0,0 +1,421 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据画像模块 - 以按类型分块的向量化方式一次性计算所有列的统计信息
+支持精确模式和基于草图（HyperLogLog/KLL/Misra-Gries）的近似模式
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from .sketches import HyperLogLog, KLLSketch, MisraGries
+
+logger = logging.getLogger(__name__)
+
+
+def get_column_kind(dtype):
+    """
+    获取列的画像类别
+
+    Args:
+        dtype: 列的数据类型
+
+    Returns:
+        str: 'numeric'（数值）、'text'（字符串/分类）或 'other'（日期、布尔等）
+    """
+    if dtype.kind in 'ifc':  # 整数、浮点数或复数
+        return 'numeric'
+    if dtype == 'object' or dtype.name == 'category' or pd.api.types.is_string_dtype(dtype):
+        return 'text'
+    return 'other'
+
+
+class ColumnSketch:
+    """
+    单列的可合并摘要：计数、缺失值、求和、最值、二阶中心矩（标准差）为精确值，
+    唯一值数量、中位数、最常见值为近似值
+    """
+
+    def __init__(self, dtype, hll_precision=14, kll_k=200, heavy_hitters_k=64):
+        """
+        初始化单列摘要
+
+        Args:
+            dtype: 列的数据类型
+            hll_precision (int): HyperLogLog精度
+            kll_k (int): KLL精度参数
+            heavy_hitters_k (int): Misra-Gries计数器数量
+        """
+        self.dtype = str(dtype)
+        self.kind = get_column_kind(dtype)
+        self.count = 0
+        self.missing = 0
+        self.sum = 0.0
+        # 离均差平方和，按Chan等人的并行算法合并，避免直接累加平方和的精度损失
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.hll = HyperLogLog(hll_precision)
+        self.kll = KLLSketch(kll_k) if self.kind == 'numeric' else None
+        self.heavy_hitters = MisraGries(heavy_hitters_k) if self.kind == 'text' else None
+
+    def update(self, series):
+        """
+        用一块数据更新摘要
+
+        Args:
+            series (pandas.Series): 数据列
+        """
+        valid = series.dropna()
+        self.missing += len(series) - len(valid)
+        self.count += len(valid)
+        if valid.empty:
+            return
+
+        self.hll.update(valid)
+        if self.kind == 'numeric':
+            chunk_min, chunk_max = valid.min(), valid.max()
+            self.min = chunk_min if self.min is None else min(self.min, chunk_min)
+            self.max = chunk_max if self.max is None else max(self.max, chunk_max)
+            values = valid.to_numpy(dtype=np.float64)
+            chunk_sum = float(values.sum())
+            chunk_m2 = float(((values - chunk_sum / len(values)) ** 2).sum())
+            self._merge_moments(len(values), chunk_sum, chunk_m2, previous_count=self.count - len(values))
+            self.kll.update(values)
+        elif self.kind == 'text':
+            self.heavy_hitters.update(valid)
+
+    def merge(self, other):
+        """
+        合并另一块数据的摘要
+
+        Args:
+            other (ColumnSketch): 另一个摘要
+
+        Returns:
+            ColumnSketch: 自身
+        """
+        self.count += other.count
+        self.missing += other.missing
+        self._merge_moments(other.count, other.sum, other.m2, previous_count=self.count - other.count)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self.hll.merge(other.hll)
+        if self.kll is not None and other.kll is not None:
+            self.kll.merge(other.kll)
+        if self.heavy_hitters is not None and other.heavy_hitters is not None:
+            self.heavy_hitters.merge(other.heavy_hitters)
+        return self
+
+    def _merge_moments(self, count, total, m2, previous_count):
+        """
+        合并另一部分数据的求和与离均差平方和
+
+        Args:
+            count (int): 另一部分的非缺失值数量
+            total (float): 另一部分的求和
+            m2 (float): 另一部分的离均差平方和
+            previous_count (int): 合并前的非缺失值数量
+        """
+        if count == 0:
+            return
+        if previous_count > 0:
+            delta = total / count - self.sum / previous_count
+            m2 += delta * delta * previous_count * count / (previous_count + count)
+        self.sum += total
+        self.m2 += m2
+
+    def to_column_info(self):
+        """
+        转换为structure_analysis中的列信息
+
+        Returns:
+            dict: 列信息
+        """
+        info = {
+            "type": self.dtype,
+            "missing_values": self.missing,
+            # 近似估计不应超过非缺失值的数量
+            "unique_values": min(self.hll.estimate(), self.count)
+        }
+        approximate = {"unique_values_relative_error": round(self.hll.relative_error(), 6)}
+
+        if self.kind == 'numeric':
+            if self.count == 0:
+                info.update({"min": None, "max": None, "mean": None, "median": None, "std": None})
+            else:
+                info.update({
+                    "min": self.min,
+                    "max": self.max,
+                    "mean": self.sum / self.count,
+                    "median": self.kll.quantile(0.5),
+                    "std": (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else None
+                })
+                approximate["median_rank_error"] = round(self.kll.rank_error(), 6)
+        elif self.kind == 'text':
+            most_common = self.heavy_hitters.most_common(1)
+            if most_common:
+                value, count = most_common[0]
+                info["most_common"] = {"value": value, "count": count}
+                approximate["most_common_max_undercount"] = self.heavy_hitters.max_undercount()
+
+        info["approximate"] = approximate
+        return info
+
+
+class DataProfiler:
+    """
+    数据画像类，负责生成结构分析结果（structure_analysis）
+
+    与逐列循环不同，所有列按数据类型分块处理：
+    - 缺失值对整个数据框只统计一次
+    - 同一dtype的数值列组成一个二维数组，一次排序即可得到最小值、最大值、中位数和唯一值数量
+    - 字符串/分类列只做一次value_counts，同时得到唯一值数量和最常见值
+    """
+
+    def __init__(self, config=None):
+        """
+        初始化数据画像器
+
+        Args:
+            config (dict, optional): 配置信息
+        """
+        self.config = config or {}
+        profiling_config = self.config.get('analysis', {}).get('profiling', {})
+        # 画像模式：'exact'（精确）或 'approximate'（基于草图的近似画像）
+        self.mode = profiling_config.get('mode', 'exact')
+        self.hll_precision = profiling_config.get('hll_precision', 14)
+        self.kll_k = profiling_config.get('kll_k', 200)
+        self.heavy_hitters_k = profiling_config.get('heavy_hitters_k', 64)
+        self.chunk_size = profiling_config.get('chunk_size', 100000)
+
+    def profile_dataset(self, dataset_path):
+        """
+        生成缓存数据集的结构分析结果；近似模式下按块读取，不会把整个数据集装入内存
+
+        Args:
+            dataset_path (str): 缓存数据集路径
+
+        Returns:
+            dict: 数据结构分析结果
+        """
+        from .dataset_cache import read_dataset, iter_dataset_chunks
+
+        if self.mode == 'approximate':
+            return self.profile_chunks(iter_dataset_chunks(dataset_path, self.chunk_size), dataset_path)
+        return self.profile(read_dataset(dataset_path), dataset_path)
+
+    def profile_chunks(self, chunks, file_path):
+        """
+        基于草图对分块数据生成近似结构分析结果
+
+        Args:
+            chunks (iterable): 数据框块的迭代器
+            file_path (str): 数据文件路径
+
+        Returns:
+            dict: 数据结构分析结果
+        """
+        sketches, row_count = self.build_sketches(chunks)
+        return self.sketches_to_structure(sketches, row_count, file_path)
+
+    def build_sketches(self, chunks):
+        """
+        逐块构建每一列的可合并摘要
+
+        Args:
+            chunks (iterable): 数据框块的迭代器
+
+        Returns:
+            tuple: (列名到ColumnSketch的字典, 总行数)
+        """
+        sketches = {}
+        row_count = 0
+        for chunk in chunks:
+            row_count += len(chunk)
+            for col in chunk.columns:
+                if col not in sketches:
+                    sketches[col] = ColumnSketch(
+                        chunk[col].dtype, self.hll_precision, self.kll_k, self.heavy_hitters_k
+                    )
+                sketches[col].update(chunk[col])
+        return sketches, row_count
+
+    def sketches_to_structure(self, sketches, row_count, file_path):
+        """
+        将各列摘要转换为结构分析结果
+
+        Args:
+            sketches (dict): 列名到ColumnSketch的字典
+            row_count (int): 总行数
+            file_path (str): 数据文件路径
+
+        Returns:
+            dict: 数据结构分析结果
+        """
+        return {
+            "file_path": file_path,
+            "row_count": row_count,
+            "column_count": len(sketches),
+            "profiling_mode": "approximate",
+            "columns": {col: sketch.to_column_info() for col, sketch in sketches.items()}
+        }
+
+    def profile(self, df, file_path):
+        """
+        生成数据框的结构分析结果
+
+        Args:
+            df (pandas.DataFrame): 数据框
+            file_path (str): 数据文件路径
+
+        Returns:
+            dict: 数据结构分析结果
+        """
+        if self.mode == 'approximate':
+            chunks = (df.iloc[start:start + self.chunk_size] for start in range(0, max(len(df), 1), self.chunk_size))
+            return self.profile_chunks(chunks, file_path)
+
+        structure_analysis = {
+            "file_path": file_path,
+            "row_count": len(df),
+            "column_count": len(df.columns),
+            "columns": {}
+        }
+
+        # 按列名顺序预先创建结果，保证输出顺序与原始列顺序一致
+        missing_counts = df.isna().sum()
+        for col in df.columns:
+            structure_analysis["columns"][col] = {
+                "type": str(df[col].dtype),
+                "missing_values": int(missing_counts[col])
+            }
+
+        numeric_cols, text_cols, other_cols = self._split_columns(df)
+
+        self._profile_numeric(df, numeric_cols, structure_analysis["columns"])
+        self._profile_text(df, text_cols, structure_analysis["columns"])
+
+        if other_cols:
+            unique_counts = df[other_cols].nunique()
+            for col in other_cols:
+                structure_analysis["columns"][col]["unique_values"] = int(unique_counts[col])
+
+        # 恢复与原逐列实现一致的键顺序: type, missing_values, unique_values, 统计信息
+        for col, info in structure_analysis["columns"].items():
+            ordered = {key: info.pop(key) for key in ("type", "missing_values", "unique_values")}
+            ordered.update(info)
+            structure_analysis["columns"][col] = ordered
+
+        return structure_analysis
+
+    def _split_columns(self, df):
+        """
+        按数据类型将列分为数值列、文本/分类列和其他列
+
+        Args:
+            df (pandas.DataFrame): 数据框
+
+        Returns:
+            tuple: (数值列列表, 文本/分类列列表, 其他列列表)
+        """
+        columns_by_kind = {'numeric': [], 'text': [], 'other': []}
+        for col, dtype in df.dtypes.items():
+            columns_by_kind[get_column_kind(dtype)].append(col)
+        return columns_by_kind['numeric'], columns_by_kind['text'], columns_by_kind['other']
+
+    def _profile_numeric(self, df, numeric_cols, columns_info):
+        """
+        计算数值列的统计信息，同一dtype的列合并为一个二维数组统一排序
+
+        Args:
+            df (pandas.DataFrame): 数据框
+            numeric_cols (list): 数值列列表
+            columns_info (dict): 各列结果字典（原地更新）
+        """
+        blocks = {}
+        for col in numeric_cols:
+            dtype = df[col].dtype
+            # 可空整数等扩展类型以及复数无法直接排序，单独处理
+            if isinstance(dtype, np.dtype) and dtype.kind in 'if':
+                blocks.setdefault(dtype, []).append(col)
+            else:
+                self._profile_numeric_column(df[col], columns_info[col])
+
+        for dtype, cols in blocks.items():
+            # 转置为(列, 行)的连续数组，每列数据在内存中连续，排序和切片求和更快
+            values = df[cols].to_numpy(dtype=dtype).T.copy(order='C')
+            # 排序后NaN位于每列末尾
+            values.sort(axis=1)
+            if dtype.kind == 'f':
+                valid_counts = (~np.isnan(values)).sum(axis=1)
+            else:
+                valid_counts = np.full(len(cols), values.shape[1])
+
+            # 相邻元素不相等的位置数 + 1 即为唯一值数量（仅统计有效值范围内）
+            if values.shape[1] > 1:
+                changes = values[:, 1:] != values[:, :-1]
+                position = np.arange(1, values.shape[1])[None, :]
+                changes &= position < valid_counts[:, None]
+                unique_counts = changes.sum(axis=1) + (valid_counts > 0)
+            else:
+                unique_counts = (valid_counts > 0).astype(int)
+
+            for j, col in enumerate(cols):
+                n = int(valid_counts[j])
+                info = columns_info[col]
+                info["unique_values"] = int(unique_counts[j])
+                if n == 0:
+                    info.update({"min": None, "max": None, "mean": None, "median": None})
+                    continue
+                column = values[j, :n]
+                lower, upper = column[(n - 1) // 2], column[n // 2]
+                info.update({
+                    "min": column[0],
+                    "max": column[n - 1],
+                    "mean": np.float64(column.sum(dtype=np.float64) / n),
+                    "median": np.float64((np.float64(lower) + np.float64(upper)) / 2)
+                })
+
+    def _profile_numeric_column(self, series, info):
+        """
+        计算单个数值列的统计信息（用于无法合并为数组的扩展类型）
+
+        Args:
+            series (pandas.Series): 数值列
+            info (dict): 该列结果字典（原地更新）
+        """
+        info["unique_values"] = int(series.nunique())
+        if series.count() == 0:
+            info.update({"min": None, "max": None, "mean": None, "median": None})
+            return
+        info.update({
+            "min": series.min(),
+            "max": series.max(),
+            "mean": series.mean(),
+            "median": series.median()
+        })
+
+    def _profile_text(self, df, text_cols, columns_info):
+        """
+        计算文本/分类列的统计信息，每列只做一次value_counts
+
+        Args:
+            df (pandas.DataFrame): 数据框
+            text_cols (list): 文本/分类列列表
+            columns_info (dict): 各列结果字典（原地更新）
+        """
+        for col in text_cols:
+            value_counts = df[col].value_counts(dropna=True, sort=True)
+            value_counts = value_counts[value_counts > 0]
+            info = columns_info[col]
+            info["unique_values"] = int(len(value_counts))
+            if not value_counts.empty:
+                info["most_common"] = {
+                    "value": value_counts.index[0],
+                    "count": int(value_counts.iloc[0])
+                }
@@ -0,0 +1,866 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据集缓存模块 - 将源文件解析一次并缓存为列式格式（Parquet），供后续所有阶段复用
+"""
+
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import logging
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from .dtype_optimizer import DtypeOptimizer, fits_float32, memory_usage
+from .input_readers import ExcelReader, get_reader
+
+logger = logging.getLogger(__name__)
+
+# 缓存文件格式对应的扩展名
+DATASET_EXTENSIONS = {
+    'parquet': '.parquet',
+    'csv': '.csv'
+}
+
+
+def has_pyarrow():
+    """
+    检查是否安装了pyarrow（Parquet读写依赖）
+
+    Returns:
+        bool: 是否可用
+    """
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def compute_file_fingerprint(file_path, block_size=1024 * 1024):
+    """
+    计算文件内容的SHA-256指纹
+
+    Args:
+        file_path (str): 文件路径
+        block_size (int): 每次读取的字节数
+
+    Returns:
+        str: 十六进制指纹字符串
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def read_dataset(dataset_path, columns=None):
+    """
+    读取缓存数据集，根据扩展名自动选择读取方式
+
+    Args:
+        dataset_path (str): 数据集文件路径
+        columns (list, optional): 只读取指定的列
+
+    Returns:
+        pandas.DataFrame: 数据框
+    """
+    if dataset_path.endswith('.parquet'):
+        return pd.read_parquet(dataset_path, columns=columns)
+    return pd.read_csv(dataset_path, usecols=columns)
+
+
+def list_sheet_names(excel_path):
+    """
+    获取Excel文件中所有工作表的名称
+
+    Args:
+        excel_path (str): Excel文件路径
+
+    Returns:
+        list: 工作表名称列表
+    """
+    return ExcelReader().list_sheets(excel_path)
+
+
+def _build_sheet_dataset(config, source_path, sheet_name, fingerprint):
+    """
+    在工作进程中解析单个工作表并写入缓存（供进程池调用，必须是模块级函数）
+
+    Returns:
+        tuple: (工作表名称, 缓存数据集路径)
+    """
+    cache = DatasetCache(config)
+    return sheet_name, cache.get_or_create(source_path, sheet_name=sheet_name, fingerprint=fingerprint)
+
+
+def iter_dataset_chunks(dataset_path, chunk_size=100000, start_row=0):
+    """
+    按块读取缓存数据集，内存占用由块大小决定
+
+    Args:
+        dataset_path (str): 数据集文件路径
+        chunk_size (int): 每块的行数
+        start_row (int): 从第几行开始读取（增量分析时跳过已分析的行）
+
+    Yields:
+        pandas.DataFrame: 每块数据的数据框
+    """
+    if dataset_path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(dataset_path)
+        # 整个行组都在起始行之前的直接跳过，不读取
+        row_groups = []
+        skip = start_row
+        for index in range(parquet_file.num_row_groups):
+            group_rows = parquet_file.metadata.row_group(index).num_rows
+            if not row_groups and skip >= group_rows:
+                skip -= group_rows
+            else:
+                row_groups.append(index)
+        if not row_groups:
+            return
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, row_groups=row_groups):
+            if skip >= batch.num_rows:
+                skip -= batch.num_rows
+                continue
+            if skip:
+                batch = batch.slice(skip)
+                skip = 0
+            yield batch.to_pandas()
+    else:
+        skiprows = range(1, start_row + 1) if start_row else None
+        for chunk in pd.read_csv(dataset_path, chunksize=chunk_size, skiprows=skiprows):
+            yield chunk
+
+
+def get_loading_hint(dataset_path):
+    """
+    获取生成代码时读取数据集的提示说明
+
+    Args:
+        dataset_path (str): 数据集文件路径
+
+    Returns:
+        str: 提示说明文本
+    """
+    if dataset_path.endswith('.parquet'):
+        return (
+            f"数据文件说明:\n"
+            f"数据已缓存为带类型的Parquet列式文件: {dataset_path}\n"
+            f"请使用 pd.read_parquet(file_path) 读取数据（文件路径通过命令行参数 sys.argv[1] 传入），"
+            f"不要使用 pd.read_csv 读取该文件。\n"
+            f"列类型已在缓存中优化并保留（低基数字符串列为category，时间列已解析为datetime，"
+            f"数值列可能是int8/int16/float32等紧凑类型），无需再次转换类型。\n"
+        )
+    return (
+        f"数据文件说明:\n"
+        f"数据文件为CSV格式: {dataset_path}\n"
+        f"请使用 pd.read_csv(file_path) 读取数据（文件路径通过命令行参数 sys.argv[1] 传入）。\n"
+    )
+
+
+class DatasetCache:
+    """
+    数据集缓存类，按源文件内容指纹缓存解析后的数据集
+    同一版本的文件只解析一次，所有阶段（包括沙箱中执行的分析脚本）都从缓存读取
+    """
+
+    def __init__(self, config):
+        """
+        初始化数据集缓存
+
+        Args:
+            config (dict): 配置信息
+        """
+        self.config = config
+        cache_config = config.get('analysis', {}).get('dataset_cache', {})
+        self.cache_dir = cache_config.get('cache_dir', 'dataset_cache')
+        self.format = cache_config.get('format', 'parquet')
+
+        # 流式读取配置：大文件按块读取并直接写入磁盘，峰值内存由块大小决定
+        ingestion_config = config.get('analysis', {}).get('ingestion', {})
+        self.streaming = ingestion_config.get('streaming', False)
+        self.streaming_threshold_mb = ingestion_config.get('streaming_threshold_mb', 50)
+        self.chunk_size = ingestion_config.get('chunk_size', 50000)
+        # 多工作表并行解析的进程数，None表示按CPU核数
+        self.max_workers = ingestion_config.get('max_workers')
+
+        # 数据类型优化器（类型随缓存一起持久化，后续阶段无需重复转换）
+        self.dtype_optimizer = DtypeOptimizer(config)
+
+        # 影响缓存内容（列类型、解析方式）的配置，修改后使用新的缓存文件；
+        # format_version 在缓存写入方式变化时递增，使旧版本写入的缓存失效
+        settings = {
+            "format_version": 2,
+            "dtype_optimization": {
+                "enabled": self.dtype_optimizer.enabled,
+                "category_max_ratio": self.dtype_optimizer.category_max_ratio,
+                "downcast_integers": self.dtype_optimizer.downcast_integers,
+                "downcast_floats": self.dtype_optimizer.downcast_floats,
+                "parse_datetimes": self.dtype_optimizer.parse_datetimes
+            },
+            "ingestion": {
+                "streaming": self.streaming,
+                "streaming_threshold_mb": self.streaming_threshold_mb,
+                "chunk_size": self.chunk_size
+            },
+            # 输入读取配置（如CSV的分隔符和编码）决定解析出的数据
+            "input": config.get('analysis', {}).get('input', {}) or {}
+        }
+        self.settings_key = hashlib.sha1(
+            json.dumps(settings, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()[:8]
+
+        if self.format == 'parquet' and not has_pyarrow():
+            logger.warning("未安装pyarrow，数据集缓存将回退为CSV格式（pip install pyarrow 可启用Parquet缓存）")
+            self.format = 'csv'
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        logger.info(f"初始化数据集缓存: 目录={self.cache_dir}, 格式={self.format}")
+
+    def get_dataset_path(self, fingerprint, sheet_name=None):
+        """
+        获取指纹对应的缓存数据集路径（文件名包含类型优化和读取配置的摘要）
+
+        Args:
+            fingerprint (str): 源文件内容指纹
+            sheet_name (str, optional): 工作表名称，None表示第一个工作表
+
+        Returns:
+            str: 缓存数据集路径
+        """
+        name = f"{fingerprint[:32]}_{self.settings_key}"
+        if sheet_name is not None:
+            name += "_" + hashlib.sha1(str(sheet_name).encode('utf-8')).hexdigest()[:8]
+        return os.path.join(self.cache_dir, f"{name}{DATASET_EXTENSIONS[self.format]}")
+
+    def get_meta_path(self, dataset_path):
+        """
+        获取缓存数据集对应的元数据文件路径
+
+        Args:
+            dataset_path (str): 缓存数据集路径
+
+        Returns:
+            str: 元数据文件路径
+        """
+        return os.path.splitext(dataset_path)[0] + '.meta.json'
+
+    def load_meta(self, dataset_path):
+        """
+        读取缓存数据集的元数据
+
+        Args:
+            dataset_path (str): 缓存数据集路径
+
+        Returns:
+            dict: 元数据，如果不存在则返回None
+        """
+        meta_path = self.get_meta_path(dataset_path)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"读取数据集元数据失败: {str(e)}")
+            return None
+
+    def get_or_create(self, source_path, sheet_name=None, fingerprint=None):
+        """
+        获取源文件对应的缓存数据集，如果缓存不存在则解析源文件并创建缓存
+
+        Args:
+            source_path (str): 源文件路径（Excel）
+            sheet_name (str, optional): 工作表名称，None表示第一个工作表
+            fingerprint (str, optional): 已计算好的源文件指纹
+
+        Returns:
+            str: 缓存数据集路径，如果创建失败则返回None
+        """
+        try:
+            fingerprint = fingerprint or compute_file_fingerprint(source_path)
+            dataset_path = self.get_dataset_path(fingerprint, sheet_name)
+
+            if os.path.exists(dataset_path) and self.load_meta(dataset_path):
+                logger.info(f"命中数据集缓存: {dataset_path}")
+                return dataset_path
+
+            sheet_label = f" (工作表: {sheet_name})" if sheet_name is not None else ""
+            logger.info(f"数据集缓存未命中，开始解析源文件: {source_path}{sheet_label}")
+            meta = None
+            if self._should_stream(source_path):
+                try:
+                    meta = self._build_streaming(source_path, dataset_path, sheet_name)
+                except Exception as e:
+                    logger.warning(f"流式读取失败，回退为一次性读取: {str(e)}")
+
+            if meta is None:
+                meta = self._build_in_memory(source_path, dataset_path, sheet_name)
+
+            meta.update({
+                "source_path": os.path.abspath(source_path),
+                "sheet_name": sheet_name,
+                "fingerprint": fingerprint,
+                "format": self.format,
+                "created_at": datetime.now().isoformat()
+            })
+            self._write_meta(dataset_path, meta)
+            logger.info(f"已创建数据集缓存: {dataset_path}")
+
+            return dataset_path
+
+        except Exception as e:
+            logger.error(f"创建数据集缓存时出错: {str(e)}")
+            return None
+
+    def get_or_create_sheets(self, source_path, sheet_names):
+        """
+        并行解析多个工作表，每个工作表生成独立的缓存数据集
+
+        工作表在进程池中解析（pandas/openpyxl解析受GIL限制，多进程才能真正并行）
+
+        Args:
+            source_path (str): 源文件路径（Excel）
+            sheet_names (list): 工作表名称列表
+
+        Returns:
+            dict: 工作表名称到缓存数据集路径的有序字典（解析失败的工作表值为None）
+        """
+        fingerprint = compute_file_fingerprint(source_path)
+
+        # 已缓存的工作表无需再启动工作进程
+        results = {}
+        pending = []
+        for sheet_name in sheet_names:
+            dataset_path = self.get_dataset_path(fingerprint, sheet_name)
+            if os.path.exists(dataset_path) and self.load_meta(dataset_path):
+                logger.info(f"命中数据集缓存: {dataset_path} (工作表: {sheet_name})")
+                results[sheet_name] = dataset_path
+            else:
+                pending.append(sheet_name)
+
+        if len(pending) == 1:
+            results[pending[0]] = self.get_or_create(source_path, pending[0], fingerprint)
+        elif pending:
+            max_workers = min(self.max_workers or os.cpu_count() or 1, len(pending))
+            logger.info(f"使用 {max_workers} 个进程并行解析 {len(pending)} 个工作表")
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(_build_sheet_dataset, self.config, source_path, sheet_name, fingerprint)
+                    for sheet_name in pending
+                ]
+                for future in futures:
+                    try:
+                        sheet_name, dataset_path = future.result()
+                        results[sheet_name] = dataset_path
+                    except Exception as e:
+                        logger.error(f"并行解析工作表时出错: {str(e)}")
+
+        return {sheet_name: results.get(sheet_name) for sheet_name in sheet_names}
+
+    def get_or_create_sample(self, dataset_path, sampler, size):
+        """
+        获取缓存数据集的抽样子集，如果不存在则一遍扫描数据集生成并缓存
+
+        Args:
+            dataset_path (str): 缓存数据集路径
+            sampler (DataSampler): 数据抽样器
+            size (int): 样本大小
+
+        Returns:
+            str: 抽样数据集路径，如果创建失败则返回None
+        """
+        try:
+            base, extension = os.path.splitext(dataset_path)
+            sample_key = f"{sampler.method}_{size}_{sampler.seed}"
+            if sampler.method == 'stratified' and sampler.stratify_by:
+                sample_key += "_" + hashlib.sha1(str(sampler.stratify_by).encode('utf-8')).hexdigest()[:8]
+            sample_path = f"{base}_sample_{sample_key}{extension}"
+
+            if os.path.exists(sample_path) and self.load_meta(sample_path):
+                logger.info(f"命中抽样数据集缓存: {sample_path}")
+                return sample_path
+
+            sample_df, sampling_info = sampler.sample(iter_dataset_chunks(dataset_path, self.chunk_size), size)
+            self._write_dataset(sample_df, sample_path)
+
+            meta = dict(self.load_meta(dataset_path) or {})
+            meta.update({
+                "row_count": len(sample_df),
+                "column_count": len(sample_df.columns),
+                "dtypes": {col: str(dtype) for col, dtype in sample_df.dtypes.items()},
+                "sampling": sampling_info,
+                "parent_dataset": dataset_path,
+                "created_at": datetime.now().isoformat()
+            })
+            self._write_meta(sample_path, meta)
+            logger.info(f"已创建抽样数据集缓存: {sample_path}")
+
+            return sample_path
+
+        except Exception as e:
+            logger.error(f"创建抽样数据集时出错: {str(e)}")
+            return None
+
+    def _should_stream(self, source_path):
+        """
+        判断是否使用流式读取
+
+        Args:
+            source_path (str): 源文件路径
+
+        Returns:
+            bool: 是否使用流式读取
+        """
+        reader = get_reader(source_path, self.config)
+        if reader is None:
+            return False
+        if isinstance(reader, ExcelReader) and not reader.is_streamable(source_path):
+            return False
+        if self.streaming is True:
+            return True
+        if self.streaming == 'auto':
+            return os.path.getsize(source_path) >= self.streaming_threshold_mb * 1024 * 1024
+        return False
+
+    def _get_reader(self, source_path):
+        """
+        获取源文件对应的输入读取器
+
+        Args:
+            source_path (str): 源文件路径
+
+        Returns:
+            InputReader: 输入读取器
+        """
+        reader = get_reader(source_path, self.config)
+        if reader is None:
+            raise ValueError(f"不支持的文件格式: {source_path}")
+        return reader
+
+    def _build_in_memory(self, source_path, dataset_path, sheet_name=None):
+        """
+        一次性读取整个源文件并写入缓存
+
+        Args:
+            source_path (str): 源文件路径
+            dataset_path (str): 缓存数据集路径
+            sheet_name (str, optional): 工作表名称，None表示第一个工作表
+
+        Returns:
+            dict: 数据集元数据
+        """
+        df = self._get_reader(source_path).read(source_path, sheet_name)
+        df, memory_report = self.dtype_optimizer.optimize(df)
+        self._write_dataset(df, dataset_path)
+        return {
+            "ingestion": "in_memory",
+            "row_count": len(df),
+            "column_count": len(df.columns),
+            "dtypes": {str(col): str(dtype) for col, dtype in df.dtypes.items()},
+            "memory_report": memory_report
+        }
+
+    def _build_streaming(self, source_path, dataset_path, sheet_name=None):
+        """
+        按块流式读取源文件，每块直接追加写入缓存，不在内存中构建完整数据框
+
+        写入Parquet时先将各块按自身类型写入临时分块文件，同时合并出能无损容纳全部块的表结构
+        （如整数列后续出现小数则放宽为浮点数，出现文本则放宽为字符串）；启用类型优化时
+        再按该表结构统计全部数据，最后逐块转换为最终类型写入缓存
+
+        Args:
+            source_path (str): 源文件路径
+            dataset_path (str): 缓存数据集路径
+            sheet_name (str, optional): 工作表名称，None表示第一个工作表
+
+        Returns:
+            dict: 数据集元数据
+        """
+        reader = self._get_reader(source_path)
+
+        logger.info(f"使用流式读取: 格式={reader.format_name}, 块大小={self.chunk_size}行")
+        temp_path = f"{dataset_path}.{uuid.uuid4().hex}.tmp"
+        optimize = self.format == 'parquet' and self.dtype_optimizer.enabled
+        parts_dir = f"{dataset_path}.{uuid.uuid4().hex}.parts.tmp"
+        row_count = 0
+        column_count = 0
+        memory_report = None
+        try:
+            if self.format == 'parquet':
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                # Arrow表直接写入Parquet；列式数据源（Parquet/Feather）全程不经过pandas
+                os.makedirs(parts_dir)
+                part_paths = []
+                schema = None
+                for table in reader.iter_tables(source_path, self.chunk_size, sheet_name):
+                    schema = self._unify_schema(schema, table)
+                    part_path = os.path.join(parts_dir, f"{len(part_paths):06d}.parquet")
+                    pq.write_table(table, part_path)
+                    part_paths.append(part_path)
+                    row_count += table.num_rows
+                    column_count = table.num_columns
+                    logger.info(f"已流式读取 {row_count} 行")
+
+                if part_paths:
+                    # 全部为空的列按字符串处理
+                    schema = pa.schema([
+                        pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field
+                        for field in schema
+                    ])
+                    stats = None
+                    if optimize:
+                        for part_path in part_paths:
+                            stats = self._collect_column_stats(
+                                self._conform_table(pq.read_table(part_path), schema), stats
+                            )
+                    memory_report = self._write_parts(part_paths, temp_path, schema, stats)
+            else:
+                for chunk in reader.iter_chunks(source_path, self.chunk_size, sheet_name):
+                    chunk.to_csv(
+                        temp_path, mode='a', header=(row_count == 0), index=False, encoding='utf-8'
+                    )
+                    row_count += len(chunk)
+                    column_count = len(chunk.columns)
+                    logger.info(f"已流式写入 {row_count} 行")
+
+            if not os.path.exists(temp_path):
+                raise ValueError("数据源为空，没有可读取的数据")
+            os.replace(temp_path, dataset_path)
+        finally:
+            if os.path.exists(parts_dir):
+                shutil.rmtree(parts_dir, ignore_errors=True)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        meta = {
+            "ingestion": "streaming",
+            "chunk_size": self.chunk_size,
+            "row_count": row_count,
+            "column_count": column_count,
+            "memory_report": memory_report
+        }
+        if self.format == 'parquet':
+            import pyarrow.parquet as pq
+
+            empty_frame = pq.read_schema(dataset_path).empty_table().to_pandas()
+            meta["dtypes"] = {str(col): str(dtype) for col, dtype in empty_frame.dtypes.items()}
+        return meta
+
+    def _collect_column_stats(self, table, stats=None):
+        """
+        累计一块数据的类型优化统计（流式写入时逐块调用，类型优化方案基于全部数据确定）
+
+        - float64列: 所有值转换为float32后是否不变（与一次性读取时 DtypeOptimizer 的判断相同）
+        - 字符串列: 是否所有块都能无损解析为时间戳，以及唯一值集合（超过一个块的行数后不再记录，
+          此时不适合字典编码，也避免在内存中保存高基数列的所有取值）
+
+        Args:
+            table (pyarrow.Table): 一块数据（已按统一的表结构转换）
+            stats (dict, optional): 之前各块累计的统计，None表示第一块
+
+        Returns:
+            dict: 列名到统计信息的字典
+        """
+        import pyarrow as pa
+
+        if stats is None:
+            stats = {}
+            for field in table.schema:
+                if pa.types.is_float64(field.type):
+                    stats[field.name] = {"kind": "float", "fits_float32": self.dtype_optimizer.downcast_floats}
+                elif pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+                    stats[field.name] = {"kind": "string", "valid_count": 0, "timestamp": None, "values": set()}
+
+        for field, column in zip(table.schema, table.columns):
+            column_stats = stats.get(field.name)
+            if column_stats is None:
+                continue
+
+            if column_stats["kind"] == "float":
+                if column_stats["fits_float32"]:
+                    column_stats["fits_float32"] = fits_float32(column.to_numpy())
+                continue
+
+            valid_count = len(column) - column.null_count
+            if not valid_count:
+                continue
+            column_stats["valid_count"] += valid_count
+            if column_stats["timestamp"] is None:
+                # 第一块有值的数据按列名和取值判断是否为时间列，后续块只检查能否无损解析
+                column_stats["timestamp"] = self._is_timestamp_column(field.name, column)
+            elif column_stats["timestamp"]:
+                column_stats["timestamp"] = self._casts_to_timestamp(column)
+            if column_stats["values"] is not None:
+                column_stats["values"].update(column.unique().drop_null().to_pylist())
+                if len(column_stats["values"]) > self.chunk_size:
+                    column_stats["values"] = None
+
+        return stats
+
+    def _optimized_schema(self, schema, stats):
+        """
+        根据全部数据的统计确定流式写入时的类型优化方案
+
+        ISO格式的时间字符串列解析为时间戳，低基数字符串列使用字典编码（读取后为category），
+        转换为float32后数值不变的浮点列压缩为float32；整数列保持int64
+
+        Args:
+            schema (pyarrow.Schema): 第一遍写入的表结构
+            stats (dict): _collect_column_stats 累计的统计
+
+        Returns:
+            tuple: (优化后的表结构, 列名到类型转换描述的字典)
+        """
+        import pyarrow as pa
+
+        fields = []
+        converted = {}
+        for field in schema:
+            new_type = field.type
+            column_stats = stats.get(field.name)
+            if column_stats is None:
+                pass
+            elif column_stats["kind"] == "float":
+                if column_stats["fits_float32"]:
+                    new_type = pa.float32()
+            elif column_stats["valid_count"]:
+                values = column_stats["values"]
+                if column_stats["timestamp"]:
+                    new_type = pa.timestamp('us')
+                elif values is not None and len(values) <= self.dtype_optimizer.category_max_ratio * column_stats["valid_count"]:
+                    new_type = pa.dictionary(pa.int32(), field.type)
+            if new_type != field.type:
+                converted[field.name] = f"{field.type} -> {new_type}"
+            fields.append(pa.field(field.name, new_type))
+        return pa.schema(fields), converted
+
+    def _write_parts(self, part_paths, dataset_path, schema, stats=None):
+        """
+        将临时分块文件统一为最终表结构后逐块写入缓存文件
+
+        Args:
+            part_paths (list): 第一遍写入的临时分块文件
+            dataset_path (str): 缓存文件路径
+            schema (pyarrow.Schema): 能无损容纳全部块的表结构
+            stats (dict, optional): 全部数据的类型优化统计，None表示不做类型优化
+
+        Returns:
+            dict: 基于第一块数据测量的内存优化报告，未做类型优化时为None
+        """
+        import pyarrow.parquet as pq
+
+        target_schema, converted = schema, []
+        if stats is not None:
+            target_schema, converted = self._optimized_schema(schema, stats)
+        memory_report = None
+        writer = pq.ParquetWriter(dataset_path, target_schema)
+        try:
+            for part_path in part_paths:
+                table = self._conform_table(pq.read_table(part_path), schema)
+                if stats is None:
+                    writer.write_table(table)
+                    continue
+                optimized = table.cast(target_schema)
+                if memory_report is None:
+                    memory_report = self.dtype_optimizer.build_report(
+                        memory_usage(table.to_pandas()),
+                        memory_usage(optimized.to_pandas()),
+                        converted,
+                        measured_on='first_chunk'
+                    )
+                writer.write_table(optimized)
+        finally:
+            writer.close()
+        if stats is not None:
+            logger.info(f"已按全部数据的类型统计优化流式写入的数据集，转换了 {len(converted)} 列")
+        return memory_report
+
+    def _is_timestamp_column(self, name, column):
+        """
+        判断字符串列是否为可由Arrow直接解析的时间列（CSV、JSONL等文本格式）
+
+        Args:
+            name (str): 列名
+            column (pyarrow.ChunkedArray): 列数据
+
+        Returns:
+            bool: 是否为时间列
+        """
+        if not self.dtype_optimizer.parse_datetimes:
+            return False
+        sample = pd.Series(column.drop_null().slice(0, 100).to_pylist())
+        if not self.dtype_optimizer._looks_like_datetime(name, sample):
+            return False
+        return self._casts_to_timestamp(column)
+
+    def _casts_to_timestamp(self, column):
+        """
+        判断字符串列的所有非空值能否由Arrow无损解析为时间戳
+
+        Args:
+            column (pyarrow.ChunkedArray): 列数据
+
+        Returns:
+            bool: 是否能解析
+        """
+        import pyarrow as pa
+
+        try:
+            return column.cast(pa.timestamp('us')).null_count == column.null_count
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            return False
+
+    def _unify_schema(self, schema, table):
+        """
+        合并已有表结构与新数据块的列类型，得到能无损容纳两者的表结构
+
+        Args:
+            schema (pyarrow.Schema): 之前各块合并出的表结构，None表示第一块
+            table (pyarrow.Table): 新的数据块
+
+        Returns:
+            pyarrow.Schema: 合并后的表结构
+        """
+        import pyarrow as pa
+
+        # 全部为空的列不参与类型判断，由其他块的取值决定
+        fields = [
+            pa.field(field.name, pa.null())
+            if table.num_rows and column.null_count == table.num_rows
+            else field
+            for field, column in zip(table.schema, table.columns)
+        ]
+        if schema is None:
+            return pa.schema(fields)
+        if [field.name for field in fields] != schema.names:
+            raise ValueError("数据块的列与之前的数据块不一致，无法流式写入")
+        return pa.schema([
+            pa.field(old.name, self._widen_type(old.type, new.type))
+            for old, new in zip(schema, fields)
+        ])
+
+    def _widen_type(self, current, incoming):
+        """
+        返回能无损容纳两种列类型的类型：整数之间放宽为int64，整数与浮点数放宽为float64，
+        其余不一致的类型放宽为字符串
+
+        Args:
+            current (pyarrow.DataType): 已有的列类型
+            incoming (pyarrow.DataType): 新数据块的列类型
+
+        Returns:
+            pyarrow.DataType: 放宽后的列类型
+        """
+        import pyarrow as pa
+
+        if current == incoming or pa.types.is_null(incoming):
+            return current
+        if pa.types.is_null(current):
+            return incoming
+        if pa.types.is_integer(current) and pa.types.is_integer(incoming):
+            return pa.int64()
+        numeric = (pa.types.is_integer, pa.types.is_floating)
+        if any(check(current) for check in numeric) and any(check(incoming) for check in numeric):
+            return pa.float64()
+        return pa.string()
+
+    def _conform_table(self, table, schema):
+        """
+        将一块Arrow表无损转换为合并后的表结构，存在无法无损转换的取值
+        （如超出float64精确范围的整数）时抛出ValueError，由调用方回退为一次性读取
+
+        Args:
+            table (pyarrow.Table): 一块数据
+            schema (pyarrow.Schema): 合并后的表结构
+
+        Returns:
+            pyarrow.Table: 转换后的Arrow表
+        """
+        import pyarrow as pa
+
+        if schema == table.schema:
+            return table
+
+        arrays = []
+        for field, column in zip(schema, table.columns):
+            if column.type == field.type:
+                arrays.append(column)
+                continue
+            try:
+                # 默认的安全转换在会丢失信息时报错，而不是截断取值
+                arrays.append(column.cast(field.type))
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                if not pa.types.is_string(field.type):
+                    raise ValueError(f"列 {field.name} 无法无损转换为 {field.type}: {e}")
+                # 无法直接转换为字符串的类型逐值转换为文本
+                values = [str(v) if v is not None else None for v in column.to_pylist()]
+                arrays.append(pa.array(values, type=pa.string()))
+
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    def _write_dataset(self, df, dataset_path):
+        """
+        将数据框写入缓存（先写临时文件再原子替换，避免读到写了一半的文件）
+
+        Args:
+            df (pandas.DataFrame): 数据框
+            dataset_path (str): 缓存数据集路径
+        """
+        temp_path = f"{dataset_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            if self.format == 'parquet':
+                try:
+                    df.to_parquet(temp_path, index=False)
+                except Exception as e:
+                    # 混合类型的object列无法直接写入Parquet，转换为字符串后重试
+                    logger.warning(f"写入Parquet失败，尝试将混合类型列转换为字符串: {str(e)}")
+                    df = self._coerce_mixed_object_columns(df)
+                    df.to_parquet(temp_path, index=False)
+            else:
+                df.to_csv(temp_path, index=False, encoding='utf-8')
+            os.replace(temp_path, dataset_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _write_meta(self, dataset_path, meta):
+        """
+        写入缓存数据集的元数据
+
+        Args:
+            dataset_path (str): 缓存数据集路径
+            meta (dict): 元数据
+        """
+        meta_path = self.get_meta_path(dataset_path)
+        temp_path = f"{meta_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, meta_path)
+
+    def _coerce_mixed_object_columns(self, df):
+        """
+        将包含混合类型的object列转换为字符串（保留缺失值）
+
+        Args:
+            df (pandas.DataFrame): 数据框
+
+        Returns:
+            pandas.DataFrame: 转换后的数据框
+        """
+        df = df.copy()
+        for col in df.columns:
+            if df[col].dtype == 'object':
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+        return df
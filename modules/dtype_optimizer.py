@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据类型优化模块 - 在读取数据时压缩数值类型、将低基数字符串转换为category、解析时间列
+"""
+
+import re
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 列名中表示时间的关键字
+DATETIME_NAME_PATTERN = re.compile(r'(time|date|日期|时间)', re.IGNORECASE)
+
+# 值看起来像日期时间（包含数字和日期/时间分隔符）
+DATETIME_VALUE_PATTERN = re.compile(r'^\s*\d{1,4}[-/.:年]\d{1,2}')
+
+
+def fits_float32(values):
+    """
+    判断浮点数组转换为float32后数值是否完全不变（缺失值除外）
+
+    Args:
+        values (numpy.ndarray): float64数组
+
+    Returns:
+        bool: 是否可以无损压缩为float32
+    """
+    with np.errstate(over='ignore'):
+        return bool(np.array_equal(values.astype(np.float32).astype(np.float64), values, equal_nan=True))
+
+
+def memory_usage(df):
+    """
+    计算数据框的内存占用（包括object列中字符串的实际大小）
+
+    Args:
+        df (pandas.DataFrame): 数据框
+
+    Returns:
+        int: 字节数
+    """
+    return int(df.memory_usage(deep=True, index=False).sum())
+
+
+class DtypeOptimizer:
+    """
+    数据类型优化器类，负责在读取阶段一次性确定并应用更紧凑的列类型
+    """
+
+    def __init__(self, config):
+        """
+        初始化数据类型优化器
+
+        Args:
+            config (dict): 配置信息
+        """
+        self.config = config
+        optimization_config = config.get('analysis', {}).get('dtype_optimization', {})
+        self.enabled = optimization_config.get('enabled', True)
+        # 唯一值数量占非缺失值比例不超过该阈值的字符串列转换为category
+        self.category_max_ratio = optimization_config.get('category_max_ratio', 0.5)
+        self.downcast_integers = optimization_config.get('downcast_integers', True)
+        # float32约有7位有效数字，只压缩转换后数值不变的列
+        self.downcast_floats = optimization_config.get('downcast_floats', True)
+        self.parse_datetimes = optimization_config.get('parse_datetimes', True)
+
+    def optimize(self, df):
+        """
+        优化数据框的列类型
+
+        Args:
+            df (pandas.DataFrame): 数据框
+
+        Returns:
+            tuple: (优化后的数据框, 内存优化报告)
+        """
+        if not self.enabled:
+            return df, None
+
+        before_bytes = memory_usage(df)
+        converted = {}
+        optimized = {}
+
+        for col in df.columns:
+            series = df[col]
+            new_series = self._optimize_column(col, series)
+            if new_series is not None and new_series.dtype != series.dtype:
+                optimized[col] = new_series
+                converted[col] = f"{series.dtype} -> {new_series.dtype}"
+
+        if optimized:
+            df = df.copy(deep=False)
+            for col, values in optimized.items():
+                df[col] = values
+
+        report = self.build_report(before_bytes, memory_usage(df), converted)
+        logger.info(
+            f"数据类型优化完成: {report['before_bytes']} -> {report['after_bytes']} 字节 "
+            f"(缩小 {report['reduction_ratio']}x), 转换了 {len(converted)} 列"
+        )
+        return df, report
+
+    def build_report(self, before_bytes, after_bytes, converted, measured_on='full_data'):
+        """
+        构建内存优化报告
+
+        Args:
+            before_bytes (int): 优化前字节数
+            after_bytes (int): 优化后字节数
+            converted (dict): 列名到类型转换描述的字典
+            measured_on (str): 内存占用的测量范围
+
+        Returns:
+            dict: 内存优化报告
+        """
+        return {
+            "measured_on": measured_on,
+            "before_bytes": before_bytes,
+            "after_bytes": after_bytes,
+            "reduction_ratio": round(before_bytes / after_bytes, 2) if after_bytes else None,
+            "converted_columns": converted
+        }
+
+    def _optimize_column(self, col, series):
+        """
+        确定单列的优化类型
+
+        Args:
+            col (str): 列名
+            series (pandas.Series): 数据列
+
+        Returns:
+            pandas.Series: 转换后的列，如果不需要转换则返回None
+        """
+        dtype = series.dtype
+        if not isinstance(dtype, np.dtype) and not pd.api.types.is_string_dtype(dtype):
+            # category、可空整数等扩展类型保持不变
+            return None
+
+        if dtype.kind == 'i' and self.downcast_integers:
+            return pd.to_numeric(series, downcast='integer')
+
+        if dtype.kind == 'f' and self.downcast_floats:
+            downcast = pd.to_numeric(series, downcast='float')
+            if downcast.dtype != dtype and not fits_float32(series.to_numpy(dtype='float64')):
+                return None
+            return downcast
+
+        if dtype == 'object' or pd.api.types.is_string_dtype(dtype):
+            valid = series.dropna()
+            if valid.empty:
+                return None
+
+            if self.parse_datetimes and self._looks_like_datetime(col, valid):
+                parsed = pd.to_datetime(series, errors='coerce')
+                # 只有在所有非缺失值都能解析时才转换
+                if parsed.notna().sum() == len(valid):
+                    return parsed
+
+            # 混合类型的object列（如数字和字符串混合）不转换
+            if dtype == 'object' and not valid.map(type).eq(str).all():
+                return None
+
+            if valid.nunique() <= self.category_max_ratio * len(valid):
+                return series.astype('category')
+
+        return None
+
+    def _looks_like_datetime(self, col, valid):
+        """
+        判断字符串列是否可能是时间列（列名包含时间关键字，或抽样值都像日期时间）
+
+        Args:
+            col (str): 列名
+            valid (pandas.Series): 非缺失值
+
+        Returns:
+            bool: 是否可能是时间列
+        """
+        sample = valid.head(100).astype(str)
+        if not sample.str.match(DATETIME_VALUE_PATTERN).all():
+            return False
+        if DATETIME_NAME_PATTERN.search(str(col)):
+            return True
+        try:
+            pd.to_datetime(sample, errors='raise')
+            return True
+        except (ValueError, TypeError):
+            return False
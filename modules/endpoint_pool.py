@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+模型端点池模块 - 在多个等价的模型网关/密钥之间路由请求
+
+- 路由策略: 'ewma'（按首字节延迟的指数加权移动平均 × 在途请求数选择最快的端点）
+  或 'least_outstanding'（选择在途请求最少的端点）
+- 每个端点的并发上限，所有端点都满时等待空闲
+- 被动健康检查: 连续失败达到阈值或被限流（429）的端点进入冷却期，冷却期结束后重新参与路由
+- 故障转移: 一次调用失败后，重试优先使用本次调用还没有尝试过的健康端点，不等待退避时间
+"""
+
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class Endpoint:
+    """
+    模型端点（接口地址、密钥、模型名称及其运行状态）
+    """
+
+    def __init__(self, name, api_base, api_key, model_id, max_concurrency=None):
+        """
+        初始化模型端点
+
+        Args:
+            name (str): 端点名称
+            api_base (str): 接口地址
+            api_key (str): API密钥
+            model_id (str): 模型名称
+            max_concurrency (int, optional): 最大在途请求数，None表示不限制
+        """
+        self.name = name
+        self.api_base = api_base
+        self.api_key = api_key
+        self.model_id = model_id
+        self.max_concurrency = max_concurrency
+
+        self.outstanding = 0
+        self.ewma_latency = None
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def is_healthy(self, now):
+        """
+        判断端点是否不在冷却期
+
+        Args:
+            now (float): 当前时间（time.monotonic）
+
+        Returns:
+            bool: 是否健康
+        """
+        return now >= self.cooldown_until
+
+    def has_capacity(self):
+        """
+        判断端点是否还能接受新请求
+
+        Returns:
+            bool: 在途请求数是否低于上限
+        """
+        return self.max_concurrency is None or self.outstanding < self.max_concurrency
+
+
+class EndpointPool:
+    """
+    模型端点池类（线程安全）
+    """
+
+    def __init__(self, endpoints, config):
+        """
+        初始化端点池
+
+        Args:
+            endpoints (list): Endpoint列表
+            config (dict): 配置信息（读取 api.endpoint_pool）
+        """
+        pool_config = config.get('api', {}).get('endpoint_pool', {}) or {}
+        self.endpoints = endpoints
+        self.strategy = pool_config.get('strategy', 'ewma')
+        # EWMA平滑系数，越大越看重最近的延迟
+        self.alpha = pool_config.get('ewma_alpha', 0.3)
+        # 连续失败多少次后进入冷却期
+        self.failure_threshold = pool_config.get('failure_threshold', 3)
+        # 冷却时间（秒）
+        self.cooldown_seconds = pool_config.get('cooldown_seconds', 30)
+        self._condition = threading.Condition()
+
+        if len(endpoints) > 1:
+            logger.info(
+                f"初始化模型端点池: {', '.join(endpoint.name for endpoint in endpoints)} "
+                f"(路由策略: {self.strategy})"
+            )
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    def _score(self, endpoint):
+        """
+        计算端点的路由得分（越小越优先）
+
+        Args:
+            endpoint (Endpoint): 端点
+
+        Returns:
+            tuple: 得分
+        """
+        if self.strategy == 'least_outstanding':
+            return (endpoint.outstanding, endpoint.ewma_latency or 0.0)
+        # 没有延迟数据的端点优先尝试，以便尽快获得其延迟
+        latency = endpoint.ewma_latency if endpoint.ewma_latency is not None else 0.0
+        return (latency * (endpoint.outstanding + 1), endpoint.outstanding)
+
+    def _select(self, exclude):
+        """
+        选择端点（调用方持有锁）
+
+        Args:
+            exclude (set): 优先排除的端点名称（本次调用已经尝试过的端点）
+
+        Returns:
+            Endpoint: 选中的端点，所有端点都已满时返回None
+        """
+        now = time.monotonic()
+        available = [endpoint for endpoint in self.endpoints if endpoint.has_capacity()]
+        if not available:
+            return None
+
+        healthy = [endpoint for endpoint in available if endpoint.is_healthy(now)]
+        untried = [endpoint for endpoint in healthy if endpoint.name not in exclude]
+        if untried:
+            return min(untried, key=self._score)
+        if healthy:
+            return min(healthy, key=self._score)
+        # 所有端点都在冷却期时，使用最早结束冷却的端点
+        return min(available, key=lambda endpoint: endpoint.cooldown_until)
+
+    def acquire(self, exclude=(), timeout=None):
+        """
+        选择一个端点并占用一个并发名额，所有端点都满时等待
+
+        Args:
+            exclude (set): 优先排除的端点名称
+            timeout (float, optional): 最长等待时间（秒）
+
+        Returns:
+            Endpoint: 选中的端点，超时则返回None
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            while True:
+                endpoint = self._select(set(exclude))
+                if endpoint is not None:
+                    endpoint.outstanding += 1
+                    endpoint.requests += 1
+                    return endpoint
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+    def try_acquire(self, exclude=()):
+        """
+        不等待地选择一个端点（供异步调用轮询使用）
+
+        Args:
+            exclude (set): 优先排除的端点名称
+
+        Returns:
+            Endpoint: 选中的端点，所有端点都已满时返回None
+        """
+        return self.acquire(exclude, timeout=0)
+
+    def release(self, endpoint, latency=None, success=True, throttled=False, retry_after=None):
+        """
+        释放端点的并发名额并更新其状态
+
+        Args:
+            endpoint (Endpoint): 端点
+            latency (float, optional): 首字节延迟（秒）
+            success (bool): 请求是否成功
+            throttled (bool): 是否被限流（429）
+            retry_after (float, optional): 服务端要求的等待秒数
+        """
+        with self._condition:
+            endpoint.outstanding = max(endpoint.outstanding - 1, 0)
+            if latency is not None:
+                if endpoint.ewma_latency is None:
+                    endpoint.ewma_latency = latency
+                else:
+                    endpoint.ewma_latency = self.alpha * latency + (1 - self.alpha) * endpoint.ewma_latency
+
+            if success:
+                endpoint.consecutive_failures = 0
+            else:
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                cooldown = None
+                if throttled:
+                    cooldown = retry_after if retry_after is not None else self.cooldown_seconds
+                elif endpoint.consecutive_failures >= self.failure_threshold:
+                    cooldown = self.cooldown_seconds
+                if cooldown is not None and len(self.endpoints) > 1:
+                    endpoint.cooldown_until = time.monotonic() + cooldown
+                    logger.warning(f"模型端点 {endpoint.name} 进入冷却期 {cooldown:.1f}秒")
+            self._condition.notify_all()
+
+    def has_alternative(self, exclude):
+        """
+        判断是否还有本次调用未尝试过的健康端点
+
+        Args:
+            exclude (set): 已尝试的端点名称
+
+        Returns:
+            bool: 是否有可切换的端点
+        """
+        now = time.monotonic()
+        with self._condition:
+            return any(
+                endpoint.name not in exclude and endpoint.is_healthy(now)
+                for endpoint in self.endpoints
+            )
+
+    def snapshot(self):
+        """
+        获取各端点的状态
+
+        Returns:
+            dict: 端点名称到状态的字典
+        """
+        now = time.monotonic()
+        with self._condition:
+            return {
+                endpoint.name: {
+                    "requests": endpoint.requests,
+                    "failures": endpoint.failures,
+                    "outstanding": endpoint.outstanding,
+                    "ewma_latency_ms": round(endpoint.ewma_latency * 1000, 1) if endpoint.ewma_latency is not None else None,
+                    "healthy": endpoint.is_healthy(now)
+                }
+                for endpoint in self.endpoints
+            }
+
+    def log_summary(self, prefix="模型端点统计"):
+        """
+        将各端点的状态写入日志（只有一个端点时不记录）
+
+        Args:
+            prefix (str): 日志前缀
+        """
+        if len(self.endpoints) < 2:
+            return
+        for name, stats in self.snapshot().items():
+            logger.info(
+                f"{prefix} [{name}]: 请求 {stats['requests']} 次, 失败 {stats['failures']} 次, "
+                f"平均首字节延迟 {stats['ewma_latency_ms']}ms, 健康={stats['healthy']}"
+            )
+
+
+def create_endpoint_pool(endpoint_configs, default_endpoint, config):
+    """
+    根据配置创建端点池
+
+    Args:
+        endpoint_configs (list): 端点配置列表（每项包含 name、api_base、api_key、model_id、max_concurrency），
+            为空时只使用默认端点
+        default_endpoint (dict): 默认端点（api_base、api_key、model_id），端点配置中未设置的字段使用默认值
+        config (dict): 配置信息（读取 api.endpoint_pool）
+
+    Returns:
+        EndpointPool: 端点池
+    """
+    endpoints = []
+    for index, endpoint_config in enumerate(endpoint_configs or [{}]):
+        endpoint_config = endpoint_config or {}
+        endpoints.append(Endpoint(
+            name=endpoint_config.get('name') or f"endpoint{index + 1}",
+            api_base=endpoint_config.get('api_base', default_endpoint.get('api_base')),
+            api_key=endpoint_config.get('api_key', default_endpoint.get('api_key')),
+            model_id=endpoint_config.get('model_id', default_endpoint.get('model_id')),
+            max_concurrency=endpoint_config.get('max_concurrency')
+        ))
+    return EndpointPool(endpoints, config)
@@ -14,6 +14,7 @@ from pathlib import Path
 from datetime import datetime
 import numpy as np
 from .chart_generator import ChartGenerator
+from .prompt_builder import PromptBuilder
 
 logger = logging.getLogger(__name__)
 
@@ -49,11 +50,15 @@ class EnhancedMarkdownReportGenerator:
         self.config = config
         self.reports_dir = Path(config.get('reports_dir', 'reports'))
         
+        # generate_report 生成报告后是否自动在浏览器中打开（render_markdown_to_html 只渲染，由调用方决定是否打开）
+        self.open_browser = config.get('report', {}).get('open_browser', True)
+        
         # 确保报告目录存在
         os.makedirs(self.reports_dir, exist_ok=True)
         
         # 初始化图表生成器
         self.chart_generator = ChartGenerator(model_connector, config)
+        self.prompt_builder = PromptBuilder(config)
         
         # 初始化Markdown解析器
         self.markdown_parser = mistune.create_markdown()
@@ -120,12 +125,13 @@ class EnhancedMarkdownReportGenerator:
         Returns:
             str: 构建的提示词
         """
-        # 将分析结果转换为JSON字符串
+        # 将分析结果转换为紧凑的JSON字符串（不缩进），并按report_results预算截断
         try:
-            results_json = json.dumps(analysis_results, ensure_ascii=False, indent=2, cls=NumpyEncoder)
+            results_json = json.dumps(analysis_results, ensure_ascii=False, separators=(',', ':'), cls=NumpyEncoder)
         except Exception as e:
             logger.error(f"序列化分析结果时出错: {str(e)}")
             results_json = str(analysis_results)
+        results_json = self.prompt_builder.fit(results_json, "report_results")
         
         # 文件信息
         file_name = file_info.get('file_name', 'unknown')
@@ -156,14 +162,17 @@ class EnhancedMarkdownReportGenerator:
 
 请生成一份完整的Markdown报告，确保内容丰富、格式正确，并且可以直接转换为HTML。
 """
+        self.prompt_builder.log_prompt("综合报告", prompt)
         return prompt
     
-    def _generate_markdown_with_stream(self, prompt):
+    def _generate_markdown_with_stream(self, prompt, task="report", use_cache=True):
         """
         使用流式输出生成Markdown内容
         
         Args:
             prompt (str): 提示词
+            task (str): 模型任务名称（'report' 或 'unit_report'）
+            use_cache (bool): 是否读取模型响应缓存
             
         Returns:
             str: 生成的Markdown内容
@@ -171,18 +180,8 @@ class EnhancedMarkdownReportGenerator:
         logger.info("开始流式生成Markdown报告...")
         
         # 使用流式API调用模型
-        full_response = ""
-        print("\n开始生成Markdown报告...")
-        
         try:
-            for content in self.model.call_model_stream(prompt):
-                # 直接使用返回的内容字符串
-                if content:
-                    print(content, end='', flush=True)
-                    full_response += content
-            
-            print("\n\n报告内容接收完成，正在处理...")
-            return full_response
+            return self.model.stream_text(prompt, label="生成Markdown报告", task=task, use_cache=use_cache)
             
         except Exception as e:
             logger.error(f"生成Markdown内容时出错: {str(e)}")
@@ -562,12 +561,13 @@ class EnhancedMarkdownReportGenerator:
             logger.info(f"已将Markdown渲染为HTML并保存到: {output_file}")
             
             # 尝试自动打开HTML文件
-            try:
-                import webbrowser
-                webbrowser.open(f"file://{os.path.abspath(output_file)}")
-                logger.info(f"已自动打开HTML报告: {output_file}")
-            except Exception as e:
-                logger.warning(f"无法自动打开HTML报告: {str(e)}")
+            if self.open_browser:
+                try:
+                    import webbrowser
+                    webbrowser.open(f"file://{os.path.abspath(output_file)}")
+                    logger.info(f"已自动打开HTML报告: {output_file}")
+                except Exception as e:
+                    logger.warning(f"无法自动打开HTML报告: {str(e)}")
             
             return output_file
                 
@@ -577,13 +577,14 @@ class EnhancedMarkdownReportGenerator:
             logger.error(traceback.format_exc())
             return None
     
-    def generate_markdown_report(self, analysis_results, pngs_dir=None):
+    def generate_markdown_report(self, analysis_results, pngs_dir=None, use_cache=True):
         """
         从分析结果生成Markdown报告
         
         Args:
             analysis_results (dict): 分析结果
             pngs_dir (str, optional): 图表目录路径
+            use_cache (bool): 是否读取模型响应缓存
             
         Returns:
             str: 生成的Markdown内容
@@ -636,7 +637,7 @@ class EnhancedMarkdownReportGenerator:
             
             logger.info("开始流式生成Markdown报告...")
             # 调用模型生成报告
-            report_content = self._generate_report_with_model(prompt)
+            report_content = self._generate_report_with_model(prompt, use_cache=use_cache)
             
             # 如果有错误，添加错误信息
             if has_errors:
@@ -849,14 +850,6 @@ class EnhancedMarkdownReportGenerator:
             
             logger.info(f"已将Markdown渲染为HTML并保存到: {output_file}")
             
-            # 尝试自动打开HTML文件
-            try:
-                import webbrowser
-                webbrowser.open(f"file://{os.path.abspath(output_file)}")
-                logger.info(f"已自动打开HTML报告: {output_file}")
-            except Exception as e:
-                logger.warning(f"无法自动打开HTML报告: {str(e)}")
-            
             return output_file
                 
         except Exception as e:
@@ -932,12 +925,14 @@ class EnhancedMarkdownReportGenerator:
         else:
             return report_content
     
-    def _generate_report_with_model(self, prompt):
+    def _generate_report_with_model(self, prompt, task="report", use_cache=True):
         """
         使用模型生成报告
         
         Args:
             prompt (str): 提示词
+            task (str): 模型任务名称（'report' 为综合报告，'unit_report' 为分析单元报告）
+            use_cache (bool): 是否读取模型响应缓存
             
         Returns:
             str: 生成的报告内容
@@ -946,13 +941,15 @@ class EnhancedMarkdownReportGenerator:
         
         try:
             # 流式生成报告
-            report_content = self._generate_markdown_with_stream(prompt)
+            report_content = self._generate_markdown_with_stream(prompt, task, use_cache)
             
             # 验证并提取报告内容
             valid_report = self._extract_and_validate_markdown(report_content)
             
             if not valid_report:
                 logger.error("无法提取有效的报告内容")
+                if report_content:
+                    self.model.invalidate_cached_response(self.model.last_cache_key())
                 return None
             
             return valid_report
@@ -7,14 +7,21 @@ Excel分析器 - 负责分析Excel文件并生成报告
 """
 
 import os
+import json
+import hashlib
 import logging
-import pandas as pd
-import time
-from datetime import datetime
 
 from .code_generator import CodeGenerator
 from .enhanced_markdown_report_generator import EnhancedMarkdownReportGenerator
 from .analysis_dispatcher import AnalysisDispatcher
+from .dataset_cache import DatasetCache, list_sheet_names, compute_file_fingerprint
+from .data_profiler import DataProfiler
+from .sampling import DataSampler
+from .input_readers import get_reader
+from .session_index import SessionIndex
+from .incremental_profiler import IncrementalProfiler
+from .run_workspace import new_run_id
+from .session_checkpoint import SessionCheckpoint
 
 logger = logging.getLogger(__name__)
 
@@ -42,15 +49,38 @@ class ExcelAnalyzer:
         # 直接创建分析调度器
         self.dispatcher = AnalysisDispatcher(model, config)
         
-        # 确保临时目录存在
-        os.makedirs('temp_csv', exist_ok=True)
+        # 创建数据集缓存（按源文件内容指纹缓存解析结果）
+        self.dataset_cache = DatasetCache(config)
+        
+        # 创建数据画像器（向量化计算结构分析）
+        self.profiler = DataProfiler(config)
+        
+        # 创建增量画像器（只追加的滚动导出文件只处理新增的行）
+        self.incremental_profiler = IncrementalProfiler(config, self.profiler)
+        
+        # 创建数据抽样器（超过analysis.max_rows时对数据集抽样）
+        self.sampler = DataSampler(config)
+        
+        # 创建会话索引（文件未变化时复用历史分析会话）
+        self.session_index = SessionIndex(config)
+        
+        # 最近一次分析的运行ID
+        self.last_run_id = None
+        
+        # 复用了历史会话的分析（调用方指定的运行ID -> 会话索引记录），批量分析据此区分复用和失败
+        self.reused_sessions = {}
+        
+        # 报告生成后是否自动在浏览器中打开（批量分析时关闭）
+        self.open_browser = config.get('report', {}).get('open_browser', True)
     
-    def analyze_excel(self, file_path):
+    def analyze_excel(self, file_path, force=False, run_id=None):
         """
         分析Excel文件并生成报告
         
         Args:
             file_path (str): Excel文件路径
+            force (bool): 是否忽略可复用的历史会话和模型响应缓存，强制重新分析
+            run_id (str, optional): 本次分析的运行ID，默认生成新的运行ID（同一分析器并发分析多个文件时由调用方指定）
         
         Returns:
             tuple: (Markdown报告内容, HTML报告内容)
@@ -58,174 +88,546 @@ class ExcelAnalyzer:
         logger.info(f"开始分析Excel文件: {file_path}")
         
         try:
-            # 将Excel转换为CSV以便处理
-            csv_path = self._convert_excel_to_csv(file_path)
-            if not csv_path:
-                logger.error("转换Excel为CSV失败")
-                return "转换Excel为CSV失败，请检查文件格式是否正确", None
-            
-            # 获取数据结构分析和列名
-            structure_analysis, column_names = self._analyze_structure(csv_path)
-            if not structure_analysis or not column_names:
-                logger.error("分析数据结构失败")
-                return "分析数据结构失败，请检查文件内容是否有效", None
-            
-            # 使用分析调度器直接运行所有分析单元
-            logger.info("使用分析调度器运行所有分析单元...")
-            analysis_results = self.dispatcher.run_analysis(structure_analysis, column_names, csv_path)
-            
-            # 检查是否至少有一个分析单元成功执行
-            success = any(result["status"] == "success" for result in analysis_results.values())
-            
-            if not success:
-                logger.error("所有分析单元执行失败")
-                return "分析过程中出错，所有分析单元执行失败", None
-            
-            # 获取组合结果
-            combined_results = self.dispatcher.get_combined_results(analysis_results)
-            
-            # 获取最新的分析会话目录
-            analysis_dirs = [d for d in os.listdir(os.path.join(os.getcwd(), 'analysis_results')) 
-                            if d.startswith('analysis_session_')]
-            if analysis_dirs:
-                latest_dir = sorted(analysis_dirs)[-1]
-                analysis_session_dir = os.path.join(os.getcwd(), 'analysis_results', latest_dir)
-                pngs_dir = os.path.join(analysis_session_dir, 'pngs')
+            # 文件内容、启用的分析单元和模型都未变化时，直接复用历史会话
+            reuse_key = self._build_reuse_key(file_path)
+            if reuse_key and not force:
+                reused = self._reuse_session(reuse_key, run_id)
+                if reused:
+                    return reused
+            
+            # 为本次分析分配运行ID和独立的分析会话目录（显式传给调度器，不依赖"最新的会话目录"）
+            run_id = run_id or new_run_id()
+            self.last_run_id = run_id
+            analysis_session_dir = self.dispatcher.session_dir_for(run_id)
+            logger.info(f"本次分析的运行ID: {run_id}")
+            
+            # 确定要分析的工作表
+            sheet_names = self._select_sheets(file_path)
+            
+            # 在检查点清单中记录会话信息，中断或失败后可以使用 --resume 恢复
+            SessionCheckpoint(analysis_session_dir).update_session(
+                run_id=run_id,
+                source_path=os.path.abspath(file_path),
+                sheet_name=sheet_names[0] if len(sheet_names) == 1 else None,
+                reuse_key=reuse_key,
+                status="running"
+            )
+            
+            if len(sheet_names) > 1:
+                # 多工作表：并行解析所有工作表，在同一个会话中依次分析
+                sheet_inputs = self._prepare_sheets(file_path, sheet_names)
+                if not sheet_inputs:
+                    logger.error("所有工作表解析或结构分析失败")
+                    return "解析Excel文件失败，所有工作表都无法分析", None
+                
+                logger.info("使用分析调度器分析所有工作表...")
+                analysis_results = self.dispatcher.run_multi_sheet_analysis(
+                    sheet_inputs, session_dir=analysis_session_dir, run_id=run_id, use_cache=not force
+                )
+            else:
+                # 将Excel解析为缓存数据集（同一版本的文件只解析一次）
+                dataset_path = self._prepare_dataset(file_path, sheet_names[0] if sheet_names else None)
+                if not dataset_path:
+                    logger.error("解析Excel文件失败")
+                    return "解析Excel文件失败，请检查文件格式是否正确", None
+                
+                # 获取数据结构分析和列名
+                structure_analysis, column_names = self._analyze_structure(dataset_path)
+                if not structure_analysis or not column_names:
+                    logger.error("分析数据结构失败")
+                    return "分析数据结构失败，请检查文件内容是否有效", None
+                
+                # 使用分析调度器直接运行所有分析单元
+                logger.info("使用分析调度器运行所有分析单元...")
+                analysis_results = self.dispatcher.run_analysis(
+                    structure_analysis, column_names, dataset_path, session_dir=analysis_session_dir, run_id=run_id,
+                    use_cache=not force
+                )
+            
+            return self._finish_session(
+                analysis_results, analysis_session_dir, run_id, file_path, reuse_key, use_cache=not force
+            )
+            
+        except Exception as e:
+            logger.error(f"分析Excel文件时出错: {str(e)}")
+            return f"分析Excel文件时出错: {str(e)}", None
+    
+    def resume_session(self, session):
+        """
+        恢复中断或失败的分析会话，跳过检查点中已完成的阶段，从第一个未完成的阶段继续
+        （重新执行的阶段不读取模型响应缓存，避免回放上一次失败的响应）
+        
+        Args:
+            session (str): 分析会话目录、会话目录名或运行ID
+        
+        Returns:
+            tuple: (Markdown报告内容, HTML报告文件路径)
+        """
+        analysis_session_dir = self._resolve_session_dir(session)
+        if not analysis_session_dir:
+            logger.error(f"找不到可恢复的分析会话: {session}")
+            return f"找不到可恢复的分析会话: {session}", None
+        
+        try:
+            session_info = SessionCheckpoint(analysis_session_dir).session()
+            run_id = session_info.get("run_id")
+            file_path = session_info.get("source_path")
+            if not run_id or not file_path:
+                logger.error(f"分析会话的检查点清单不完整: {analysis_session_dir}")
+                return f"分析会话的检查点清单不完整，无法恢复: {analysis_session_dir}", None
+            
+            self.last_run_id = run_id
+            logger.info(f"恢复分析会话 {run_id}: {analysis_session_dir}")
+            print(f"恢复分析会话: {analysis_session_dir}")
+            
+            if session_info.get("sheets"):
+                # 多工作表：按记录的子目录恢复每个工作表
+                sheet_inputs = []
+                for sheet in session_info["sheets"]:
+                    sheet_dir = os.path.join(analysis_session_dir, sheet["dir"])
+                    inputs = self._load_session_inputs(sheet_dir, file_path, sheet["sheet_name"])
+                    if inputs is None:
+                        logger.error(f"无法恢复工作表 {sheet['sheet_name']} 的分析输入")
+                        return f"无法恢复工作表 {sheet['sheet_name']} 的分析输入", None
+                    sheet_inputs.append((sheet["sheet_name"],) + inputs)
+                
+                analysis_results = self.dispatcher.run_multi_sheet_analysis(
+                    sheet_inputs, session_dir=analysis_session_dir, run_id=run_id, use_cache=False
+                )
             else:
-                analysis_session_dir = None
-                pngs_dir = None
+                inputs = self._load_session_inputs(analysis_session_dir, file_path, session_info.get("sheet_name"))
+                if inputs is None:
+                    logger.error("无法恢复分析输入")
+                    return "无法恢复分析输入，请检查源文件是否仍然存在", None
+                
+                structure_analysis, column_names, dataset_path = inputs
+                analysis_results = self.dispatcher.run_analysis(
+                    structure_analysis, column_names, dataset_path, session_dir=analysis_session_dir, run_id=run_id,
+                    use_cache=False
+                )
+            
+            return self._finish_session(
+                analysis_results, analysis_session_dir, run_id, file_path, session_info.get("reuse_key"), use_cache=False
+            )
             
-            # 生成Markdown报告
+        except Exception as e:
+            logger.error(f"恢复分析会话时出错: {str(e)}")
+            return f"恢复分析会话时出错: {str(e)}", None
+    
+    def _resolve_session_dir(self, session):
+        """
+        将会话参数解析为包含检查点清单的分析会话目录
+        
+        Args:
+            session (str): 分析会话目录、会话目录名或运行ID
+        
+        Returns:
+            str: 分析会话目录的绝对路径，找不到时返回None
+        """
+        candidates = [
+            session,
+            os.path.join(self.dispatcher.results_dir, session),
+            self.dispatcher.session_dir_for(session)
+        ]
+        for candidate in candidates:
+            if SessionCheckpoint.exists(candidate):
+                return os.path.abspath(candidate)
+        return None
+    
+    def _load_session_inputs(self, session_dir, file_path, sheet_name=None):
+        """
+        读取分析会话保存的结构分析、列名和数据集路径，缺失时重新解析源文件
+        
+        Args:
+            session_dir (str): 分析会话目录（多工作表时为工作表子目录）
+            file_path (str): 源文件路径
+            sheet_name (str, optional): 工作表名称
+        
+        Returns:
+            tuple: (数据结构分析结果, 列名列表, 数据集路径)，无法恢复时返回None
+        """
+        dataset_path = SessionCheckpoint(session_dir).session().get("dataset_path")
+        if not dataset_path or not os.path.exists(dataset_path):
+            logger.info(f"会话的数据集已不存在，重新解析源文件: {file_path}")
+            dataset_path = self._prepare_dataset(file_path, sheet_name)
+            if not dataset_path:
+                return None
+        
+        structure_file = os.path.join(session_dir, "structure_analysis.json")
+        columns_file = os.path.join(session_dir, "column_names.json")
+        if os.path.exists(structure_file) and os.path.exists(columns_file):
+            with open(structure_file, 'r', encoding='utf-8') as f:
+                structure_analysis = json.load(f)
+            with open(columns_file, 'r', encoding='utf-8') as f:
+                column_names = json.load(f)
+        else:
+            structure_analysis, column_names = self._analyze_structure(dataset_path)
+            if not structure_analysis or not column_names:
+                return None
+            if sheet_name:
+                structure_analysis["sheet_name"] = sheet_name
+        
+        return structure_analysis, column_names, dataset_path
+    
+    def _finish_session(self, analysis_results, analysis_session_dir, run_id, file_path, reuse_key, use_cache=True):
+        """
+        汇总分析单元的结果，生成会话的Markdown报告、HTML报告、单元HTML报告和综合报告
+        （检查点中已完成的报告阶段直接使用已有的文件）
+        
+        Args:
+            analysis_results (dict): 所有分析单元的结果
+            analysis_session_dir (str): 分析会话目录
+            run_id (str): 运行ID
+            file_path (str): 源文件路径
+            reuse_key (str): 会话复用键，None表示不记录到会话索引
+            use_cache (bool): 生成报告时是否读取模型响应缓存
+        
+        Returns:
+            tuple: (Markdown报告内容, HTML报告文件路径)
+        """
+        checkpoint = SessionCheckpoint(analysis_session_dir)
+        
+        # 检查是否至少有一个分析单元成功执行
+        success = any(result["status"] == "success" for result in analysis_results.values())
+        
+        if not success:
+            logger.error("所有分析单元执行失败")
+            return "分析过程中出错，所有分析单元执行失败", None
+        
+        # 获取组合结果
+        combined_results = self.dispatcher.get_combined_results(analysis_results)
+        
+        # 会话报告包含的分析单元和结果（恢复会话后单元重新执行、结果有变化时重新生成会话报告）
+        report_units = [name for name, result in analysis_results.items() if result["status"] == "success"]
+        results_digest = self._digest(combined_results)
+        
+        # 本次运行的图表目录
+        pngs_dir = os.path.join(analysis_session_dir, 'pngs')
+        
+        # 生成Markdown报告
+        record = checkpoint.completed("markdown_report", units=report_units, results=results_digest)
+        if record:
+            markdown_file = checkpoint.resolve(record["files"]["markdown"])
+            logger.info(f"Markdown报告已生成（检查点），跳过: {markdown_file}")
+            with open(markdown_file, 'r', encoding='utf-8') as f:
+                markdown_report = f.read()
+        else:
             logger.info("生成Markdown报告...")
-            markdown_report = self.report_generator.generate_markdown_report(combined_results, pngs_dir)
+            markdown_report = self.report_generator.generate_markdown_report(combined_results, pngs_dir, use_cache=use_cache)
             
             if markdown_report is None:
                 logger.error("生成Markdown报告失败")
                 return "生成Markdown报告失败，请检查分析结果是否有效", None
             
             # 保存Markdown报告
-            report_timestamp = time.strftime('%Y%m%d_%H%M%S')
-            markdown_file = f"reports/excel_analysis_report_{report_timestamp}.md"
+            markdown_file = f"reports/excel_analysis_report_{run_id}.md"
             os.makedirs(os.path.dirname(markdown_file), exist_ok=True)
             with open(markdown_file, 'w', encoding='utf-8') as f:
                 f.write(markdown_report)
-            
-            # 将Markdown转换为HTML
-            html_file = f"reports/html_report_{report_timestamp}.html"
+            checkpoint.complete("markdown_report", files={"markdown": markdown_file}, units=report_units, results=results_digest)
+        
+        # 将Markdown转换为HTML（Markdown报告有变化时重新转换）
+        markdown_digest = self._digest(markdown_report)
+        record = checkpoint.completed("html_report", source=markdown_digest)
+        if record:
+            html_file = checkpoint.resolve(record["files"]["html"])
+            html_report = html_file
+            logger.info(f"HTML报告已生成（检查点），跳过: {html_file}")
+        else:
+            html_file = f"reports/html_report_{run_id}.html"
             html_report = self.report_generator.render_markdown_to_html(
                 markdown_report, 
                 output_file=html_file, 
                 title="Excel数据分析报告"
             )
-            
-            # 处理每个分析单元的独立报告
-            unit_html_reports = []
-            unit_md_files = []
-            for unit_name, unit_result in analysis_results.items():
-                if unit_result.get("status") == "success" and unit_result.get("report_file"):
-                    unit_md_file = unit_result["report_file"]
-                    if os.path.exists(unit_md_file):
-                        # 保存Markdown文件路径
-                        unit_md_files.append(unit_md_file)
-                        
-                        # 生成HTML文件名
-                        unit_html_file = unit_md_file.replace(".md", ".html")
-                        
-                        # 读取Markdown内容
-                        with open(unit_md_file, 'r', encoding='utf-8') as f:
-                            unit_md_content = f.read()
-                        
-                        # 转换为HTML
-                        unit_title = unit_name.replace("单元", "").strip() + "分析报告"
-                        unit_html_report = self.report_generator.render_markdown_to_html(
-                            unit_md_content,
-                            output_file=unit_html_file,
-                            title=unit_title
-                        )
-                        
-                        if unit_html_report:
-                            unit_html_reports.append(unit_html_file)
-                            logger.info(f"已将分析单元 {unit_name} 的Markdown报告转换为HTML: {unit_html_file}")
-            
-            # 尝试自动打开HTML报告
             if html_report:
+                checkpoint.complete("html_report", files={"html": html_file}, source=markdown_digest)
+        
+        # 处理每个分析单元的独立报告
+        unit_html_reports = []
+        unit_md_files = []
+        for unit_name, unit_result in analysis_results.items():
+            if unit_result.get("status") == "success" and unit_result.get("report_file"):
+                unit_md_file = unit_result["report_file"]
+                if os.path.exists(unit_md_file):
+                    # 保存Markdown文件路径
+                    unit_md_files.append(unit_md_file)
+                    
+                    # 生成HTML文件名
+                    unit_html_file = unit_md_file.replace(".md", ".html")
+                    
+                    if checkpoint.completed("html", unit_name, source=os.path.basename(unit_md_file)):
+                        unit_html_reports.append(unit_html_file)
+                        continue
+                    
+                    # 读取Markdown内容
+                    with open(unit_md_file, 'r', encoding='utf-8') as f:
+                        unit_md_content = f.read()
+                    
+                    # 转换为HTML
+                    unit_title = unit_name.replace("单元", "").strip() + "分析报告"
+                    unit_html_report = self.report_generator.render_markdown_to_html(
+                        unit_md_content,
+                        output_file=unit_html_file,
+                        title=unit_title
+                    )
+                    
+                    if unit_html_report:
+                        unit_html_reports.append(unit_html_file)
+                        checkpoint.complete("html", unit_name, files={"html": unit_html_file}, source=os.path.basename(unit_md_file))
+                        logger.info(f"已将分析单元 {unit_name} 的Markdown报告转换为HTML: {unit_html_file}")
+        
+        # 尝试自动打开HTML报告
+        if html_report and self.open_browser:
+            try:
+                import webbrowser
+                webbrowser.open(f"file://{os.path.abspath(html_file)}")
+                logger.info(f"已自动打开HTML报告: {html_file}")
+                # 添加输出信息
+                print(f"HTML图表报告已保存到: {html_file}")
+            except Exception as e:
+                logger.warning(f"无法自动打开HTML报告: {str(e)}")
+        
+        # 判断是否需要生成综合报告
+        generate_comprehensive = len(unit_md_files) > 1
+        
+        # 只有在不生成综合报告的情况下才打开单元报告
+        if not generate_comprehensive and self.open_browser:
+            # 尝试自动打开每个分析单元的HTML报告
+            for unit_html_file in unit_html_reports:
                 try:
                     import webbrowser
-                    webbrowser.open(f"file://{os.path.abspath(html_file)}")
-                    logger.info(f"已自动打开HTML报告: {html_file}")
-                    # 添加输出信息
-                    print(f"HTML图表报告已保存到: {html_file}")
-                except Exception as e:
-                    logger.warning(f"无法自动打开HTML报告: {str(e)}")
-            
-            # 判断是否需要生成综合报告
-            generate_comprehensive = len(unit_md_files) > 1
-            
-            # 只有在不生成综合报告的情况下才打开单元报告
-            if not generate_comprehensive:
-                # 尝试自动打开每个分析单元的HTML报告
-                for unit_html_file in unit_html_reports:
-                    try:
-                        import webbrowser
-                        webbrowser.open(f"file://{os.path.abspath(unit_html_file)}")
-                        logger.info(f"已自动打开分析单元HTML报告: {unit_html_file}")
-                        print(f"分析单元HTML报告已保存到: {unit_html_file}")
-                    except Exception as e:
-                        logger.warning(f"无法自动打开分析单元HTML报告: {str(e)}")
-            else:
-                # 只打印保存信息，不自动打开
-                for unit_html_file in unit_html_reports:
-                    logger.info(f"分析单元HTML报告已保存到: {unit_html_file}")
+                    webbrowser.open(f"file://{os.path.abspath(unit_html_file)}")
+                    logger.info(f"已自动打开分析单元HTML报告: {unit_html_file}")
                     print(f"分析单元HTML报告已保存到: {unit_html_file}")
-            
-            # 如果有多个分析单元报告，生成综合报告
-            if generate_comprehensive:
-                logger.info("开始生成综合分析报告...")
-                comprehensive_md, comprehensive_html = self.generate_comprehensive_report(unit_md_files)
-                if comprehensive_html:
-                    logger.info(f"综合分析报告已生成: {comprehensive_html}")
-                    print(f"综合分析报告已生成: {comprehensive_html}")
-            
-            return markdown_report, html_report
-            
+                except Exception as e:
+                    logger.warning(f"无法自动打开分析单元HTML报告: {str(e)}")
+        else:
+            # 只打印保存信息，不自动打开
+            for unit_html_file in unit_html_reports:
+                logger.info(f"分析单元HTML报告已保存到: {unit_html_file}")
+                print(f"分析单元HTML报告已保存到: {unit_html_file}")
+        
+        # 如果有多个分析单元报告，生成综合报告
+        if generate_comprehensive:
+            logger.info("开始生成综合分析报告...")
+            comprehensive_md, comprehensive_html = self.generate_comprehensive_report(
+                unit_md_files, run_id, checkpoint, use_cache=use_cache
+            )
+            if comprehensive_html:
+                logger.info(f"综合分析报告已生成: {comprehensive_html}")
+                print(f"综合分析报告已生成: {comprehensive_html}")
+        
+        # 记录本次会话，供同一文件再次分析时复用
+        if reuse_key and analysis_session_dir:
+            self.session_index.record(reuse_key, {
+                "source_path": os.path.abspath(file_path),
+                "session_dir": analysis_session_dir,
+                "markdown_file": os.path.abspath(markdown_file),
+                "html_file": os.path.abspath(html_file) if html_report else None,
+                "unit_reports": [os.path.abspath(path) for path in unit_md_files]
+            })
+        
+        # 所有分析单元都成功时会话完成，否则可以使用 --resume 重试失败的单元
+        failed_units = [name for name, result in analysis_results.items() if result.get("status") != "success"]
+        checkpoint.update_session(status="complete" if not failed_units else "partial", failed_units=failed_units)
+        if failed_units:
+            print(f"部分分析单元未成功，可以使用 --resume {run_id} 重试: {', '.join(failed_units)}")
+        
+        return markdown_report, html_report
+    
+    @staticmethod
+    def _digest(text):
+        """
+        计算文本的摘要（检查点据此判断报告的输入是否变化）
+        
+        Args:
+            text (str): 文本
+        
+        Returns:
+            str: SHA-256摘要
+        """
+        return hashlib.sha256((text or "").encode('utf-8')).hexdigest()
+    
+    def _build_reuse_key(self, file_path):
+        """
+        构建会话复用键（源文件内容指纹 + 启用的分析单元 + 模型）
+        
+        Args:
+            file_path (str): 数据文件路径
+        
+        Returns:
+            str: 复用键，如果无法计算则返回None
+        """
+        if not self.session_index.enabled:
+            return None
+        try:
+            fingerprint = compute_file_fingerprint(file_path)
         except Exception as e:
-            logger.error(f"分析Excel文件时出错: {str(e)}")
-            return f"分析Excel文件时出错: {str(e)}", None
+            logger.warning(f"计算文件指纹失败，不复用历史会话: {str(e)}")
+            return None
+        unit_names = [unit.unit_name for unit in self.dispatcher.analysis_units]
+        model_id = getattr(self.model, 'model_id', None) or self.config.get('model')
+        return self.session_index.build_key(fingerprint, unit_names, model_id)
     
-    def _convert_excel_to_csv(self, excel_path):
+    def _reuse_session(self, reuse_key, run_id=None):
         """
-        将Excel文件转换为CSV文件
+        复用历史分析会话的报告（复用的会话记录到 self.reused_sessions[run_id]）
         
         Args:
-            excel_path (str): Excel文件路径
+            reuse_key (str): 复用键
+            run_id (str, optional): 调用方为本次分析指定的运行ID
         
         Returns:
-            str: CSV文件路径，如果转换失败则返回None
+            tuple: (Markdown报告内容, HTML报告文件路径)，如果没有可复用的会话则返回None
         """
-        logger.info(f"将Excel文件转换为CSV: {excel_path}")
+        entry = self.session_index.lookup(reuse_key)
+        if not entry:
+            return None
         
         try:
-            # 读取Excel文件
-            df = pd.read_excel(excel_path)
-            
-            # 保存为CSV
-            csv_path = f"temp_csv/excel_data_{time.strftime('%Y%m%d%H%M%S')}.csv"
-            os.makedirs(os.path.dirname(csv_path), exist_ok=True)
-            df.to_csv(csv_path, index=False, encoding='utf-8')
-            logger.info(f"已将Excel转换为CSV: {csv_path}")
-            
-            return csv_path
-            
+            with open(entry["markdown_file"], 'r', encoding='utf-8') as f:
+                markdown_report = f.read()
         except Exception as e:
-            logger.error(f"转换Excel为CSV时出错: {str(e)}")
+            logger.warning(f"读取历史会话报告失败，重新分析: {str(e)}")
             return None
+        html_report = entry["html_file"] if entry.get("html_file") and os.path.exists(entry["html_file"]) else None
+        
+        # 使用历史会话的运行ID（main.py 按运行ID保存报告，不会为复用的会话生成新的报告副本）
+        self.last_run_id = os.path.basename(os.path.normpath(entry["session_dir"])).replace("analysis_session_", "", 1)
+        self.dispatcher.last_session_dir = entry["session_dir"]
+        self.reused_sessions[run_id] = entry
+        logger.info(f"文件未变化，复用历史分析会话: {entry['session_dir']}（使用 --force 可强制重新分析）")
+        print(f"文件未变化，复用历史分析会话: {entry['session_dir']}")
+        print(f"Markdown报告: {entry['markdown_file']}")
+        for unit_report in entry.get("unit_reports", []):
+            print(f"分析单元报告: {unit_report}")
+        
+        return markdown_report, html_report
+    
+    def _select_sheets(self, excel_path):
+        """
+        根据配置确定要分析的工作表
+        
+        配置项 analysis.sheets 可以是 'first'（默认，只分析第一个工作表）、
+        'all'（分析所有工作表）或工作表名称列表
+        
+        Args:
+            excel_path (str): Excel文件路径
+        
+        Returns:
+            list: 工作表名称列表，空列表表示只分析第一个工作表
+        """
+        sheets_config = self.config.get('analysis', {}).get('sheets', 'first')
+        if sheets_config in (None, 'first'):
+            return []
+        
+        # CSV、Parquet等格式没有工作表
+        reader = get_reader(excel_path, self.config)
+        if reader is None or not reader.supports_sheets:
+            return []
+        
+        try:
+            available = list_sheet_names(excel_path)
+        except Exception as e:
+            logger.warning(f"读取工作表列表失败，只分析第一个工作表: {str(e)}")
+            return []
+        
+        if sheets_config == 'all':
+            selected = available
+        else:
+            selected = [name for name in sheets_config if name in available]
+            missing = [name for name in sheets_config if name not in available]
+            if missing:
+                logger.warning(f"以下工作表不存在，已跳过: {missing}")
+        
+        logger.info(f"将分析 {len(selected)} 个工作表: {selected}")
+        return selected
+    
+    def _prepare_dataset(self, excel_path, sheet_name=None):
+        """
+        将Excel文件解析为缓存数据集
+        
+        Args:
+            excel_path (str): Excel文件路径
+            sheet_name (str, optional): 工作表名称，None表示第一个工作表
+        
+        Returns:
+            str: 缓存数据集路径，如果解析失败则返回None
+        """
+        logger.info(f"准备Excel文件的缓存数据集: {excel_path}")
+        
+        dataset_path = self.dataset_cache.get_or_create(excel_path, sheet_name=sheet_name)
+        if dataset_path:
+            logger.info(f"使用缓存数据集: {dataset_path}")
+            dataset_path = self._limit_rows(dataset_path)
+        
+        return dataset_path
+    
+    def _limit_rows(self, dataset_path):
+        """
+        数据集超过analysis.max_rows时，改用抽样后的数据集（结构分析和分析单元都基于样本）
+        
+        Args:
+            dataset_path (str): 缓存数据集路径
+        
+        Returns:
+            str: 实际使用的数据集路径，抽样失败时返回原数据集路径
+        """
+        row_count = (self.dataset_cache.load_meta(dataset_path) or {}).get("row_count")
+        if row_count is None or not self.sampler.should_limit(row_count):
+            return dataset_path
+        
+        logger.info(f"数据集共 {row_count} 行，超过最大分析行数 {self.sampler.max_rows}，使用抽样数据集")
+        sample_path = self.dataset_cache.get_or_create_sample(dataset_path, self.sampler, self.sampler.max_rows)
+        if not sample_path:
+            logger.warning("抽样失败，使用完整数据集")
+            return dataset_path
+        
+        logger.info(f"使用抽样数据集: {sample_path}")
+        return sample_path
+    
+    def _prepare_sheets(self, excel_path, sheet_names):
+        """
+        并行解析多个工作表，并为每个工作表生成结构分析
+        
+        Args:
+            excel_path (str): Excel文件路径
+            sheet_names (list): 工作表名称列表
+        
+        Returns:
+            list: [(工作表名称, 数据结构分析结果, 列名列表, 缓存数据集路径), ...]
+        """
+        logger.info(f"并行解析 {len(sheet_names)} 个工作表: {excel_path}")
+        
+        dataset_paths = self.dataset_cache.get_or_create_sheets(excel_path, sheet_names)
+        
+        sheet_inputs = []
+        for sheet_name, dataset_path in dataset_paths.items():
+            if not dataset_path:
+                logger.error(f"工作表 {sheet_name} 解析失败，已跳过")
+                continue
+            dataset_path = self._limit_rows(dataset_path)
+            
+            structure_analysis, column_names = self._analyze_structure(dataset_path)
+            if not structure_analysis or not column_names:
+                logger.error(f"工作表 {sheet_name} 结构分析失败，已跳过")
+                continue
+            
+            structure_analysis["sheet_name"] = sheet_name
+            sheet_inputs.append((sheet_name, structure_analysis, column_names, dataset_path))
+        
+        return sheet_inputs
             
-    def generate_comprehensive_report(self, unit_reports):
+    def generate_comprehensive_report(self, unit_reports, run_id=None, checkpoint=None, use_cache=True):
         """
         将每个分析单元的独立结果输入到大模型，生成一份总体分析的Markdown报告
         
         Args:
             unit_reports (list): 分析单元报告文件路径列表
+            run_id (str, optional): 运行ID（用于报告文件命名），默认生成新的运行ID
+            checkpoint (SessionCheckpoint, optional): 会话检查点，已生成综合报告时直接使用
+            use_cache (bool): 是否读取模型响应缓存
             
         Returns:
             tuple: (markdown_report, html_report)
@@ -233,6 +635,25 @@ class ExcelAnalyzer:
         logger.info("开始生成综合分析报告...")
         
         try:
+            # 综合报告包含的单元报告及其内容（恢复会话后单元报告有变化时重新生成）
+            report_names = [os.path.basename(path) for path in unit_reports]
+            report_contents = []
+            for unit_report in unit_reports:
+                if os.path.exists(unit_report):
+                    with open(unit_report, 'r', encoding='utf-8') as f:
+                        report_contents.append(f.read())
+            reports_digest = self._digest("\n".join(report_contents))
+            record = checkpoint.completed(
+                "comprehensive_report", reports=report_names, contents=reports_digest
+            ) if checkpoint else None
+            if record:
+                markdown_file = checkpoint.resolve(record["files"]["markdown"])
+                logger.info(f"综合报告已生成（检查点），跳过: {markdown_file}")
+                with open(markdown_file, 'r', encoding='utf-8') as f:
+                    comprehensive_report = f.read()
+                html_file = record["files"].get("html")
+                return comprehensive_report, checkpoint.resolve(html_file) if html_file else None
+            
             # 构建提示词，包含所有分析单元的结果
             prompt = """请基于以下各个分析单元的独立结果，生成一份全面的综合分析报告。
             
@@ -267,29 +688,34 @@ class ExcelAnalyzer:
             
             # 生成综合报告
             logger.info("开始流式生成综合Markdown报告...")
-            comprehensive_report = self.report_generator._generate_report_with_model(prompt)
+            comprehensive_report = self.report_generator._generate_report_with_model(prompt, use_cache=use_cache)
             
             if comprehensive_report is None:
                 logger.error("生成综合Markdown报告失败")
                 return "生成综合Markdown报告失败，请检查分析结果是否有效", None
             
             # 保存综合Markdown报告
-            report_timestamp = time.strftime('%Y%m%d_%H%M%S')
-            markdown_file = f"reports/comprehensive_report_{report_timestamp}.md"
+            run_id = run_id or new_run_id()
+            markdown_file = f"reports/comprehensive_report_{run_id}.md"
             os.makedirs(os.path.dirname(markdown_file), exist_ok=True)
             with open(markdown_file, 'w', encoding='utf-8') as f:
                 f.write(comprehensive_report)
             
             # 将Markdown转换为HTML
-            html_file = f"reports/comprehensive_html_report_{report_timestamp}.html"
+            html_file = f"reports/comprehensive_html_report_{run_id}.html"
             html_report = self.report_generator.render_markdown_to_html(
                 comprehensive_report, 
                 output_file=html_file, 
                 title="综合数据分析报告"
             )
+            if checkpoint:
+                checkpoint.complete("comprehensive_report", files={
+                    "markdown": markdown_file,
+                    "html": html_file if html_report else None
+                }, reports=report_names, contents=reports_digest)
             
             # 尝试自动打开HTML报告
-            if html_report:
+            if html_report and self.open_browser:
                 try:
                     import webbrowser
                     webbrowser.open(f"file://{os.path.abspath(html_file)}")
@@ -305,67 +731,44 @@ class ExcelAnalyzer:
             logger.error(f"生成综合报告时出错: {str(e)}")
             return f"生成综合报告时出错: {str(e)}", None
     
-    def _analyze_structure(self, csv_path):
+    def _analyze_structure(self, dataset_path):
         """
-        分析CSV文件的数据结构
+        分析数据集的数据结构
         
         Args:
-            csv_path (str): CSV文件路径
+            dataset_path (str): 缓存数据集路径
         
         Returns:
             tuple: (数据结构分析结果, 列名列表)，如果分析失败则返回(None, None)
         """
-        logger.info(f"分析CSV文件结构: {csv_path}")
+        logger.info(f"分析数据集结构: {dataset_path}")
         
         try:
-            # 读取CSV文件
-            df = pd.read_csv(csv_path)
+            dataset_meta = self.dataset_cache.load_meta(dataset_path) or {}
+            
+            # 计算所有列的统计信息（近似模式下按块读取数据集；增量模式下只处理追加的行）
+            if self.incremental_profiler.enabled and not dataset_meta.get("sampling"):
+                structure_analysis = self.incremental_profiler.profile(dataset_path, dataset_meta)
+            else:
+                structure_analysis = self.profiler.profile_dataset(dataset_path)
             
             # 获取列名
-            column_names = df.columns.tolist()
-            
-            # 创建结构分析
-            structure_analysis = {
-                "file_path": csv_path,
-                "row_count": len(df),
-                "column_count": len(df.columns),
-                "columns": {}
-            }
-            
-            # 分析每一列
-            for col in df.columns:
-                col_type = str(df[col].dtype)
-                structure_analysis["columns"][col] = {
-                    "type": col_type,
-                    "missing_values": df[col].isna().sum(),
-                    "unique_values": df[col].nunique()
-                }
-                
-                # 对于数值型列，计算基本统计信息
-                if df[col].dtype.kind in 'ifc':  # 整数、浮点数或复数
-                    structure_analysis["columns"][col].update({
-                        "min": df[col].min() if not df[col].isna().all() else None,
-                        "max": df[col].max() if not df[col].isna().all() else None,
-                        "mean": df[col].mean() if not df[col].isna().all() else None,
-                        "median": df[col].median() if not df[col].isna().all() else None
-                    })
-                
-                # 对于分类型或字符串列，计算最常见的值
-                elif df[col].dtype == 'object' or df[col].dtype.name == 'category':
-                    if not df[col].isna().all():
-                        value_counts = df[col].value_counts(dropna=True)
-                        if not value_counts.empty:
-                            structure_analysis["columns"][col]["most_common"] = {
-                                "value": value_counts.index[0],
-                                "count": int(value_counts.iloc[0])
-                            }
-            
-            logger.info("成功分析CSV文件结构")
+            column_names = list(structure_analysis["columns"].keys())
+            
+            # 记录读取阶段类型优化前后的内存占用
+            if dataset_meta.get("memory_report"):
+                structure_analysis["memory_optimization"] = dataset_meta["memory_report"]
+            
+            # 基于抽样数据集分析时，记录抽样方法和原始总行数
+            if dataset_meta.get("sampling"):
+                structure_analysis["sampling"] = dataset_meta["sampling"]
+            
+            logger.info("成功分析数据集结构")
             
             return structure_analysis, column_names
             
         except Exception as e:
-            logger.error(f"分析CSV文件结构时出错: {str(e)}")
+            logger.error(f"分析数据集结构时出错: {str(e)}")
             return None, None
 
 if __name__ == "__main__":
@@ -11,8 +11,65 @@ import logging
 import csv
 from io import StringIO
 
+from .sampling import DataSampler
+from .input_readers import get_reader
+
 logger = logging.getLogger(__name__)
 
+# 流式读取时默认每块的行数
+DEFAULT_CHUNK_SIZE = 50000
+
+def iter_excel_chunks(excel_path, chunk_size=DEFAULT_CHUNK_SIZE, sheet_name=None):
+    """
+    以openpyxl只读模式逐块读取Excel工作表，内存占用只与块大小有关，与文件大小无关
+    
+    Args:
+        excel_path (str): Excel文件路径（.xlsx/.xlsm）
+        chunk_size (int): 每块的行数
+        sheet_name (str, optional): 工作表名称，默认为第一个工作表
+    
+    Yields:
+        tuple: (列名列表, 行列表)，每行是一个值元组；空工作表只产出一次空行列表
+    """
+    from openpyxl import load_workbook
+    
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        rows_iter = worksheet.iter_rows(values_only=True)
+        
+        # 第一行作为列名，空列名与pandas保持一致命名为"Unnamed: i"
+        header = next(rows_iter, None)
+        if header is None:
+            return
+        column_names = [
+            str(name) if name is not None else f"Unnamed: {i}"
+            for i, name in enumerate(header)
+        ]
+        column_count = len(column_names)
+        
+        rows = []
+        yielded = False
+        for row in rows_iter:
+            # 跳过完全为空的行
+            if all(value is None for value in row):
+                continue
+            # 行长度与列数对齐
+            if len(row) < column_count:
+                row = tuple(row) + (None,) * (column_count - len(row))
+            elif len(row) > column_count:
+                row = tuple(row[:column_count])
+            rows.append(row)
+            if len(rows) >= chunk_size:
+                yield column_names, rows
+                yielded = True
+                rows = []
+        
+        if rows or not yielded:
+            yield column_names, rows
+    finally:
+        workbook.close()
+
 class ExcelProcessor:
     """
     Excel处理器类，负责读取和处理Excel文件
@@ -33,12 +90,15 @@ class ExcelProcessor:
         
         logger.info(f"初始化Excel处理器: 文件={self.excel_file}")
     
-    def load_sample_data(self, max_rows=50):
+    def load_sample_data(self, max_rows=None):
         """
-        加载Excel文件的样本数据（前N行）
+        加载Excel文件的样本数据
+        
+        按配置的抽样方法（analysis.sampling.method）一遍扫描整个文件抽取样本：
+        蓄水池抽样或分层抽样能覆盖整个文件，'head'只取前N行
         
         Args:
-            max_rows (int): 最大加载行数，默认为50
+            max_rows (int, optional): 样本行数，默认为analysis.sampling.prompt_rows（50）
         
         Returns:
             dict: 包含样本数据和列名的字典，如果加载失败则返回None
@@ -49,12 +109,22 @@ class ExcelProcessor:
                 logger.error(f"Excel文件不存在: {self.excel_path}")
                 return None
             
-            # 读取Excel文件
-            self.df = pd.read_excel(self.excel_path, nrows=max_rows)
+            sampler = DataSampler(self.config)
+            if max_rows is None:
+                max_rows = sampler.prompt_rows
+            
+            reader = get_reader(self.excel_path, self.config)
+            if reader is None:
+                logger.error(f"不支持的文件格式: {self.excel_path}")
+                return None
+            
+            # 按块读取数据文件并抽样，内存占用只与块大小和样本大小有关
+            chunks = reader.iter_chunks(self.excel_path, DEFAULT_CHUNK_SIZE)
+            self.df, sampling_info = sampler.sample(chunks, max_rows)
             rows_count, cols_count = self.df.shape
             self.column_names = self.df.columns.tolist()
             
-            logger.info(f"成功加载Excel文件: {self.excel_path}, 读取了 {rows_count} 行和 {cols_count} 列")
+            logger.info(f"成功加载Excel文件: {self.excel_path}, 抽样得到 {rows_count} 行和 {cols_count} 列")
             logger.info(f"列名: {self.column_names}")
             
             # 将数据转换为CSV格式的字符串
@@ -66,7 +136,8 @@ class ExcelProcessor:
                 'sample_csv': sample_csv,
                 'column_names': self.column_names,
                 'rows_count': rows_count,
-                'cols_count': cols_count
+                'cols_count': cols_count,
+                'sampling': sampling_info
             }
             
         except Exception as e:
@@ -99,6 +170,28 @@ class ExcelProcessor:
             logger.error(f"加载完整Excel数据时出错: {str(e)}")
             return None
     
+    def iter_full_data(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        分块流式加载Excel文件的完整数据，适用于无法一次性装入内存的大文件
+        
+        Args:
+            chunk_size (int): 每块的行数
+        
+        Yields:
+            pandas.DataFrame: 每块数据的数据框
+        """
+        if not os.path.exists(self.excel_path):
+            logger.error(f"Excel文件不存在: {self.excel_path}")
+            return
+        
+        rows_count = 0
+        for column_names, rows in iter_excel_chunks(self.excel_path, chunk_size):
+            self.column_names = column_names
+            rows_count += len(rows)
+            yield pd.DataFrame(rows, columns=column_names)
+        
+        logger.info(f"成功流式加载完整Excel数据: {self.excel_path}, 读取了 {rows_count} 行和 {len(self.column_names)} 列")
+    
     def get_column_names(self):
         """
         获取Excel文件的列名
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+HTTP传输模块 - 为模型API调用提供持久化的keep-alive连接池
+
+一次分析会话会发起十几次模型调用（结构分析、代码生成、代码修复、单元报告、综合报告），
+复用同一个 requests.Session 可以避免每次调用都重新进行TCP和TLS握手。
+连接池统计（请求数、新建连接数、复用率、建连耗时）会记录到日志中
+"""
+
+import time
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import PoolManager
+
+logger = logging.getLogger(__name__)
+
+
+class TransportStats:
+    """
+    连接池统计类（线程安全）
+    """
+
+    def __init__(self):
+        """
+        初始化连接池统计
+        """
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.connect_seconds = 0.0
+
+    def record_request(self):
+        """
+        记录一次请求
+        """
+        with self._lock:
+            self.requests += 1
+
+    def record_connect(self, seconds):
+        """
+        记录一次新建连接（包括TCP和TLS握手）
+
+        Args:
+            seconds (float): 建连耗时（秒）
+        """
+        with self._lock:
+            self.connections += 1
+            self.connect_seconds += seconds
+
+    def snapshot(self):
+        """
+        获取当前统计
+
+        Returns:
+            dict: 统计信息
+        """
+        with self._lock:
+            requests_count, connections, connect_seconds = self.requests, self.connections, self.connect_seconds
+        reused = max(requests_count - connections, 0)
+        return {
+            "requests": requests_count,
+            "connections": connections,
+            "reused": reused,
+            "reuse_rate": round(reused / requests_count, 4) if requests_count else None,
+            "connect_time_ms": round(connect_seconds * 1000, 1),
+            "avg_connect_time_ms": round(connect_seconds * 1000 / connections, 1) if connections else None
+        }
+
+    def log_summary(self, prefix="连接池统计"):
+        """
+        将统计信息写入日志
+
+        Args:
+            prefix (str): 日志前缀
+        """
+        stats = self.snapshot()
+        if not stats["requests"]:
+            return
+        reuse_rate = f"{stats['reuse_rate'] * 100:.1f}%" if stats["reuse_rate"] is not None else "-"
+        avg_connect = f"{stats['avg_connect_time_ms']}ms" if stats["avg_connect_time_ms"] is not None else "-"
+        logger.info(
+            f"{prefix}: 请求 {stats['requests']} 次, 新建连接 {stats['connections']} 次, "
+            f"复用连接 {stats['reused']} 次 (复用率 {reuse_rate}), "
+            f"建连总耗时 {stats['connect_time_ms']}ms (平均 {avg_connect})"
+        )
+
+
+class _TimedPoolManager(PoolManager):
+    """
+    记录新建连接次数和建连耗时的urllib3连接池管理器
+    """
+
+    def __init__(self, *args, stats=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = stats
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context)
+        stats = self.stats
+        if stats is None:
+            return pool
+
+        new_conn = pool._new_conn
+
+        def timed_new_conn():
+            conn = new_conn()
+            connect = conn.connect
+
+            def timed_connect():
+                start = time.perf_counter()
+                try:
+                    return connect()
+                finally:
+                    stats.record_connect(time.perf_counter() - start)
+
+            conn.connect = timed_connect
+            return conn
+
+        pool._new_conn = timed_new_conn
+        return pool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    带连接统计的HTTP适配器
+    """
+
+    def __init__(self, stats, **kwargs):
+        """
+        初始化HTTP适配器
+
+        Args:
+            stats (TransportStats): 连接池统计
+            **kwargs: 传给HTTPAdapter的参数（pool_connections、pool_maxsize、pool_block等）
+        """
+        # HTTPAdapter.__init__ 会调用 init_poolmanager，统计对象必须先设置
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _TimedPoolManager(
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            stats=self.stats,
+            **pool_kwargs
+        )
+
+    def send(self, request, **kwargs):
+        self.stats.record_request()
+        return super().send(request, **kwargs)
+
+
+def create_session(config):
+    """
+    创建带连接池的HTTP会话
+
+    Args:
+        config (dict): 配置信息（读取 api.http_pool）
+
+    Returns:
+        tuple: (requests.Session, TransportStats)
+    """
+    pool_config = config.get('api', {}).get('http_pool', {}) or {}
+    stats = TransportStats()
+    adapter = PooledHTTPAdapter(
+        stats,
+        # 缓存的连接池数量（每个主机一个连接池）
+        pool_connections=pool_config.get('pool_connections', 10),
+        # 每个连接池保持的最大连接数（并发调用模型时需要不小于并发数）
+        pool_maxsize=pool_config.get('pool_maxsize', 10),
+        # 连接数达到上限时是否等待空闲连接（否则新建临时连接）
+        pool_block=pool_config.get('pool_block', False)
+    )
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if pool_config.get('keep_alive', True):
+        session.headers['Connection'] = 'keep-alive'
+    else:
+        session.headers['Connection'] = 'close'
+
+    logger.info(
+        f"初始化HTTP连接池: 连接池数量={adapter._pool_connections}, "
+        f"每个连接池最大连接数={adapter._pool_maxsize}, keep-alive={pool_config.get('keep_alive', True)}"
+    )
+    return session, stats
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+增量画像模块 - 针对只追加、按时间排序的滚动导出文件（如服务器监控、5G基站数据）
+
+每次画像后按源文件保存各列的可合并摘要（计数、求和、最值、二阶矩、草图）、
+行数、按块计算的数据行摘要和时间高水位。源文件变化后，如果新数据是在旧数据末尾追加的
+（已分析的行逐块校验未变化、确实有新增的行、追加行的时间不早于高水位），
+只读取追加的行更新摘要，不重新构建历史数据的画像
+"""
+
+import os
+import pickle
+import hashlib
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .dataset_cache import read_dataset, iter_dataset_chunks
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalProfiler:
+    """
+    增量画像器类，负责保存画像状态并判断能否只处理追加的数据
+    """
+
+    def __init__(self, config, profiler):
+        """
+        初始化增量画像器
+
+        Args:
+            config (dict): 配置信息
+            profiler (DataProfiler): 数据画像器（负责构建和转换摘要）
+        """
+        self.config = config
+        self.profiler = profiler
+        incremental_config = config.get('analysis', {}).get('incremental', {}) or {}
+        self.enabled = incremental_config.get('enabled', False)
+        # 高水位列（按该列判断追加的行），不存在时只按行数判断
+        self.watermark_column = incremental_config.get('watermark_column', 'timestamp')
+        self.state_dir = incremental_config.get(
+            'state_dir', os.path.join('dataset_cache', 'profile_state')
+        )
+
+    def get_state_path(self, source_path, sheet_name=None):
+        """
+        获取源文件对应的画像状态文件路径（按源文件路径而不是内容指纹区分，文件追加后仍能找到）
+
+        Args:
+            source_path (str): 源文件路径
+            sheet_name (str, optional): 工作表名称
+
+        Returns:
+            str: 状态文件路径
+        """
+        key = f"{os.path.abspath(source_path)}|{sheet_name if sheet_name is not None else ''}"
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.state_dir, f"{name}.pkl")
+
+    def profile(self, dataset_path, dataset_meta):
+        """
+        生成数据集的结构分析结果，能增量更新时只处理追加的行
+
+        Args:
+            dataset_path (str): 缓存数据集路径
+            dataset_meta (dict): 缓存数据集的元数据（包含source_path、row_count、fingerprint等）
+
+        Returns:
+            dict: 数据结构分析结果
+        """
+        source_path = dataset_meta.get("source_path", dataset_path)
+        state_path = self.get_state_path(source_path, dataset_meta.get("sheet_name"))
+        state = self._load_state(state_path)
+        row_count = dataset_meta.get("row_count")
+        if row_count is None:
+            row_count = len(read_dataset(dataset_path, columns=[]))
+
+        start_row = self._detect_append(dataset_path, state, row_count, dataset_meta.get("fingerprint"))
+        if start_row is None:
+            logger.info(f"全量构建画像摘要: {dataset_path}")
+            sketches, _ = self.profiler.build_sketches(
+                iter_dataset_chunks(dataset_path, self.profiler.chunk_size)
+            )
+            previous_rows = 0
+        else:
+            logger.info(f"检测到追加数据: 已分析 {start_row} 行，新增 {row_count - start_row} 行，只处理新增部分")
+            sketches = state["sketches"]
+            delta_sketches, _ = self.profiler.build_sketches(
+                iter_dataset_chunks(dataset_path, self.profiler.chunk_size, start_row=start_row)
+            )
+            for col, delta_sketch in delta_sketches.items():
+                sketches[col].merge(delta_sketch)
+            previous_rows = start_row
+
+        # 已分析的完整块摘要不变，只重新计算最后一个不完整块及追加部分
+        block_rows = self.profiler.chunk_size
+        block_digests = []
+        if start_row is not None:
+            block_rows = state["block_rows"]
+            block_digests = state["block_digests"][:start_row // block_rows]
+        block_digests.extend(
+            self._iter_block_digests(dataset_path, block_rows, start_row=len(block_digests) * block_rows)
+        )
+
+        watermark, last_watermark = self._compute_watermark(dataset_path, row_count)
+        self._save_state(state_path, {
+            "fingerprint": dataset_meta.get("fingerprint"),
+            "row_count": row_count,
+            "block_rows": block_rows,
+            "block_digests": block_digests,
+            "columns": list(sketches.keys()),
+            "dtypes": {col: sketch.dtype for col, sketch in sketches.items()},
+            "watermark_column": self.watermark_column if watermark is not None else None,
+            "watermark": watermark,
+            "last_watermark": last_watermark,
+            "sketches": sketches,
+            "updated_at": datetime.now().isoformat()
+        })
+
+        structure_analysis = self.profiler.sketches_to_structure(sketches, row_count, dataset_path)
+        structure_analysis["incremental"] = {
+            "mode": "full" if start_row is None else "append",
+            "previous_rows": previous_rows,
+            "appended_rows": row_count - previous_rows,
+            "watermark_column": self.watermark_column if watermark is not None else None,
+            "watermark": str(watermark) if watermark is not None else None
+        }
+        return structure_analysis
+
+    def _detect_append(self, dataset_path, state, row_count, fingerprint=None):
+        """
+        判断新数据是否为在上次画像数据末尾的追加
+
+        Args:
+            dataset_path (str): 缓存数据集路径
+            state (dict): 上次保存的画像状态
+            row_count (int): 当前数据集行数
+            fingerprint (str, optional): 当前源文件指纹
+
+        Returns:
+            int: 追加数据的起始行号，如果不能增量更新则返回None
+        """
+        if not state:
+            return None
+        if "block_digests" not in state:
+            logger.info("画像状态中没有已分析数据的摘要，重新全量画像")
+            return None
+
+        previous_rows = state["row_count"]
+        if row_count < previous_rows:
+            logger.info("数据行数减少，不是追加写入，重新全量画像")
+            return None
+        if row_count == previous_rows and fingerprint != state.get("fingerprint"):
+            logger.info("源文件已变化但没有新增的行，不是追加写入，重新全量画像")
+            return None
+
+        # 列名和列类型必须与上次一致，否则摘要无法合并
+        current_dtypes = self._read_dtypes(dataset_path)
+        if list(current_dtypes) != state["columns"] or current_dtypes != state["dtypes"]:
+            logger.info("数据列或列类型发生变化，重新全量画像")
+            return None
+
+        watermark_column = state.get("watermark_column")
+        if watermark_column:
+            watermarks = read_dataset(dataset_path, columns=[watermark_column])[watermark_column]
+            # 已分析部分的最后一行应保持不变，追加的行不早于高水位（先做只读一列的快速检查）
+            if previous_rows and watermarks.iloc[previous_rows - 1] != state["last_watermark"]:
+                logger.info(f"第 {previous_rows} 行的 {watermark_column} 与上次不一致，重新全量画像")
+                return None
+            appended = watermarks.iloc[previous_rows:]
+            if not appended.dropna().empty and appended.min() < state["watermark"]:
+                logger.info(f"追加的行中存在早于高水位 {state['watermark']} 的数据，重新全量画像")
+                return None
+
+        # 已分析的行必须逐块与上次的摘要一致（原地修改历史数据时摘要不同）
+        digests = self._iter_block_digests(dataset_path, state["block_rows"], stop_row=previous_rows)
+        for index, expected in enumerate(state["block_digests"]):
+            if next(digests, None) != expected:
+                logger.info(f"第 {index * state['block_rows'] + 1} 行起的已分析数据与上次不一致，重新全量画像")
+                return None
+
+        return previous_rows
+
+    def _iter_block_digests(self, dataset_path, block_rows, start_row=0, stop_row=None):
+        """
+        按固定行数分块计算数据行的摘要（最后一块可以不完整）
+
+        Args:
+            dataset_path (str): 缓存数据集路径
+            block_rows (int): 每块的行数
+            start_row (int): 起始行号（应为块的边界）
+            stop_row (int, optional): 结束行号（不含），None表示到数据末尾
+
+        Yields:
+            str: 每块数据的摘要
+        """
+        pending = np.empty(0, dtype=np.uint64)
+        position = start_row
+        for chunk in iter_dataset_chunks(dataset_path, block_rows, start_row=start_row):
+            if stop_row is not None:
+                chunk = chunk.iloc[:max(stop_row - position, 0)]
+            position += len(chunk)
+            pending = np.concatenate([pending, pd.util.hash_pandas_object(chunk, index=False).to_numpy()])
+            while len(pending) >= block_rows:
+                yield hashlib.sha1(pending[:block_rows].tobytes()).hexdigest()
+                pending = pending[block_rows:]
+            if stop_row is not None and position >= stop_row:
+                break
+        if len(pending):
+            yield hashlib.sha1(pending.tobytes()).hexdigest()
+
+    def _read_dtypes(self, dataset_path):
+        """
+        读取数据集各列的类型（Parquet只读取表结构）
+
+        Args:
+            dataset_path (str): 缓存数据集路径
+
+        Returns:
+            dict: 列名到类型字符串的字典
+        """
+        if dataset_path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+
+            frame = pq.read_schema(dataset_path).empty_table().to_pandas()
+        else:
+            frame = pd.read_csv(dataset_path, nrows=100)
+        return {col: str(dtype) for col, dtype in frame.dtypes.items()}
+
+    def _compute_watermark(self, dataset_path, row_count):
+        """
+        计算高水位（高水位列的最大值）和最后一行的取值（只读取高水位列）
+
+        Args:
+            dataset_path (str): 缓存数据集路径
+            row_count (int): 数据集行数
+
+        Returns:
+            tuple: (高水位, 最后一行的取值)，高水位列不存在时返回(None, None)
+        """
+        if not self.watermark_column or not row_count:
+            return None, None
+        if self.watermark_column not in self._read_dtypes(dataset_path):
+            return None, None
+        values = read_dataset(dataset_path, columns=[self.watermark_column])[self.watermark_column]
+        return values.max(), values.iloc[-1]
+
+    def _load_state(self, state_path):
+        """
+        读取画像状态
+
+        Args:
+            state_path (str): 状态文件路径
+
+        Returns:
+            dict: 画像状态，如果不存在或无法读取则返回None
+        """
+        if not os.path.exists(state_path):
+            return None
+        try:
+            with open(state_path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            logger.warning(f"读取画像状态失败，重新全量画像: {str(e)}")
+            return None
+
+    def _save_state(self, state_path, state):
+        """
+        保存画像状态（先写临时文件再原子替换）
+
+        Args:
+            state_path (str): 状态文件路径
+            state (dict): 画像状态
+        """
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        temp_path = f"{state_path}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(state, f)
+        os.replace(temp_path, state_path)
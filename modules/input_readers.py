@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+输入读取器模块 - 可插拔的数据源读取层
+
+每种输入格式对应一个读取器，按文件扩展名选择：
+- ExcelReader: .xlsx/.xlsm（openpyxl只读模式流式读取）、.xls
+- CsvReader: .csv/.tsv（pandas分块读取）
+- ParquetReader: .parquet（按行组批量读取，内存映射，Arrow零拷贝）
+- FeatherReader: .feather/.arrow（Arrow IPC文件内存映射，零拷贝）
+- JsonlReader: .jsonl/.ndjson（每行一个JSON对象，分块读取）
+
+所有读取器提供相同的接口：
+- read(): 一次性读取为数据框
+- iter_chunks(): 按块读取为数据框
+- iter_tables(): 按块读取为Arrow表（供流式写入Parquet缓存使用）
+
+新格式可以通过 register_reader 注册
+"""
+
+import os
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class InputReader:
+    """
+    输入读取器基类
+    """
+
+    # 读取器支持的扩展名（小写，包含点）
+    extensions = ()
+    # 格式名称
+    format_name = ''
+    # 是否包含多个工作表
+    supports_sheets = False
+
+    def __init__(self, config=None):
+        """
+        初始化读取器
+
+        Args:
+            config (dict, optional): 配置信息
+        """
+        self.config = config or {}
+        self.input_config = self.config.get('analysis', {}).get('input', {}) or {}
+
+    def read(self, path, sheet_name=None):
+        """
+        一次性读取整个文件
+
+        Args:
+            path (str): 文件路径
+            sheet_name (str, optional): 工作表名称（仅Excel）
+
+        Returns:
+            pandas.DataFrame: 数据框
+        """
+        raise NotImplementedError("子类必须实现read方法")
+
+    def iter_chunks(self, path, chunk_size, sheet_name=None):
+        """
+        按块读取文件，内存占用由块大小决定
+
+        Args:
+            path (str): 文件路径
+            chunk_size (int): 每块的行数
+            sheet_name (str, optional): 工作表名称（仅Excel）
+
+        Yields:
+            pandas.DataFrame: 每块数据的数据框
+        """
+        df = self.read(path, sheet_name)
+        for start in range(0, max(len(df), 1), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+
+    def iter_tables(self, path, chunk_size, sheet_name=None):
+        """
+        按块读取文件为Arrow表
+
+        Args:
+            path (str): 文件路径
+            chunk_size (int): 每块的行数
+            sheet_name (str, optional): 工作表名称（仅Excel）
+
+        Yields:
+            pyarrow.Table: 每块数据的Arrow表
+        """
+        import pyarrow as pa
+
+        for chunk in self.iter_chunks(path, chunk_size, sheet_name):
+            yield pa.Table.from_pandas(chunk, preserve_index=False)
+
+
+class ExcelReader(InputReader):
+    """
+    Excel读取器（.xlsx/.xlsm支持流式读取）
+    """
+
+    extensions = ('.xlsx', '.xlsm', '.xls')
+    format_name = 'excel'
+    supports_sheets = True
+
+    def read(self, path, sheet_name=None):
+        return pd.read_excel(path, sheet_name=sheet_name if sheet_name is not None else 0)
+
+    def iter_chunks(self, path, chunk_size, sheet_name=None):
+        if not self.is_streamable(path):
+            yield from super().iter_chunks(path, chunk_size, sheet_name)
+            return
+
+        from .excel_processor import iter_excel_chunks
+
+        for column_names, rows in iter_excel_chunks(path, chunk_size, sheet_name):
+            yield pd.DataFrame(rows, columns=column_names)
+
+    def iter_tables(self, path, chunk_size, sheet_name=None):
+        if not self.is_streamable(path):
+            yield from super().iter_tables(path, chunk_size, sheet_name)
+            return
+
+        import pyarrow as pa
+        from .excel_processor import iter_excel_chunks
+
+        # 直接从行数据构建Arrow数组，不经过pandas
+        for column_names, rows in iter_excel_chunks(path, chunk_size, sheet_name):
+            columns = list(zip(*rows)) if rows else [()] * len(column_names)
+            arrays = [pa.array(values, from_pandas=True) for values in columns]
+            yield pa.Table.from_arrays(arrays, names=column_names)
+
+    def is_streamable(self, path):
+        """
+        判断文件是否支持openpyxl只读模式流式读取
+
+        Args:
+            path (str): 文件路径
+
+        Returns:
+            bool: 是否支持
+        """
+        return path.lower().endswith(('.xlsx', '.xlsm'))
+
+    def list_sheets(self, path):
+        """
+        获取所有工作表的名称
+
+        Args:
+            path (str): 文件路径
+
+        Returns:
+            list: 工作表名称列表
+        """
+        if self.is_streamable(path):
+            from openpyxl import load_workbook
+
+            workbook = load_workbook(path, read_only=True)
+            try:
+                return list(workbook.sheetnames)
+            finally:
+                workbook.close()
+        with pd.ExcelFile(path) as excel_file:
+            return list(excel_file.sheet_names)
+
+
+class CsvReader(InputReader):
+    """
+    CSV读取器（pandas分块读取）
+    """
+
+    extensions = ('.csv', '.tsv')
+    format_name = 'csv'
+
+    def _read_options(self, path):
+        csv_config = self.input_config.get('csv', {}) or {}
+        delimiter = csv_config.get('delimiter') or ('\t' if path.lower().endswith('.tsv') else ',')
+        return {
+            'sep': delimiter,
+            'encoding': csv_config.get('encoding', 'utf-8')
+        }
+
+    def read(self, path, sheet_name=None):
+        return pd.read_csv(path, **self._read_options(path))
+
+    def iter_chunks(self, path, chunk_size, sheet_name=None):
+        with pd.read_csv(path, chunksize=chunk_size, **self._read_options(path)) as reader:
+            yield from reader
+
+
+class ParquetReader(InputReader):
+    """
+    Parquet读取器（内存映射读取，Arrow表到缓存写入全程零拷贝）
+    """
+
+    extensions = ('.parquet', '.pq')
+    format_name = 'parquet'
+
+    def read(self, path, sheet_name=None):
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path, memory_map=True).to_pandas()
+
+    def iter_chunks(self, path, chunk_size, sheet_name=None):
+        for table in self.iter_tables(path, chunk_size, sheet_name):
+            yield table.to_pandas()
+
+    def iter_tables(self, path, chunk_size, sheet_name=None):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield pa.Table.from_batches([batch])
+
+
+class FeatherReader(InputReader):
+    """
+    Feather/Arrow IPC读取器（内存映射，记录批次零拷贝）
+    """
+
+    extensions = ('.feather', '.arrow')
+    format_name = 'feather'
+
+    def read(self, path, sheet_name=None):
+        import pyarrow.feather as feather
+
+        return feather.read_table(path, memory_map=True).to_pandas()
+
+    def iter_chunks(self, path, chunk_size, sheet_name=None):
+        for table in self.iter_tables(path, chunk_size, sheet_name):
+            yield table.to_pandas()
+
+    def iter_tables(self, path, chunk_size, sheet_name=None):
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        # 内存映射读取后按块切片，切片不复制数据
+        table = feather.read_table(path, memory_map=True)
+        for start in range(0, max(table.num_rows, 1), chunk_size):
+            yield table.slice(start, chunk_size)
+
+
+class JsonlReader(InputReader):
+    """
+    JSON Lines读取器（每行一个JSON对象，分块读取）
+    """
+
+    extensions = ('.jsonl', '.ndjson')
+    format_name = 'jsonl'
+
+    def read(self, path, sheet_name=None):
+        return pd.read_json(path, lines=True, encoding='utf-8')
+
+    def iter_chunks(self, path, chunk_size, sheet_name=None):
+        with pd.read_json(path, lines=True, chunksize=chunk_size, encoding='utf-8') as reader:
+            yield from reader
+
+
+# 已注册的读取器（后注册的优先）
+_READERS = [ExcelReader, CsvReader, ParquetReader, FeatherReader, JsonlReader]
+
+
+def register_reader(reader_class):
+    """
+    注册新的输入读取器
+
+    Args:
+        reader_class (type): InputReader的子类
+
+    Returns:
+        type: 读取器类（可用作装饰器）
+    """
+    _READERS.insert(0, reader_class)
+    return reader_class
+
+
+def get_reader(path, config=None):
+    """
+    根据文件扩展名获取读取器
+
+    Args:
+        path (str): 文件路径
+        config (dict, optional): 配置信息
+
+    Returns:
+        InputReader: 读取器实例，如果格式不支持则返回None
+    """
+    extension = os.path.splitext(path)[1].lower()
+    for reader_class in _READERS:
+        if extension in reader_class.extensions:
+            return reader_class(config)
+    return None
+
+
+def supported_extensions():
+    """
+    获取所有支持的文件扩展名
+
+    Returns:
+        list: 扩展名列表
+    """
+    extensions = []
+    for reader_class in _READERS:
+        extensions.extend(ext for ext in reader_class.extensions if ext not in extensions)
+    return extensions
@@ -15,6 +15,8 @@ import re
 import mistune  # 用于验证Markdown格式
 import numpy as np
 
+from .prompt_builder import PromptBuilder
+
 logger = logging.getLogger(__name__)
 
 # 自定义JSON编码器，处理NumPy类型
@@ -46,6 +48,7 @@ class MarkdownReportGenerator:
         """
         self.model = model
         self.config = config
+        self.prompt_builder = PromptBuilder(config)
         
         # 确保临时目录存在
         os.makedirs('temp_txts', exist_ok=True)
@@ -76,18 +79,7 @@ class MarkdownReportGenerator:
             
             # 调用模型生成Markdown报告（流式输出）
             logger.info("调用模型生成Markdown报告（流式输出）...")
-            print("\n开始生成Markdown报告...\n")
-            print("\n正在生成Markdown报告（流式输出）...\n")
-            
-            markdown_content = ""
-            
-            # 使用流式API调用
-            for chunk in self.model.call_model_stream(prompt):
-                if chunk:
-                    print(chunk, end="", flush=True)
-                    markdown_content += chunk
-            
-            print("\n\n报告内容接收完成，正在处理...\n\n")
+            markdown_content = self.model.stream_text(prompt, label="生成Markdown报告", task="report")
             
             # 提取和验证Markdown内容
             markdown_content = self._extract_and_validate_markdown(markdown_content)
@@ -128,13 +120,12 @@ class MarkdownReportGenerator:
         """
         # 提取文件路径和列信息
         file_path = structure_analysis.get("file_path", "未知文件")
-        columns_info = structure_analysis.get("columns", {})
         
-        # 将分析单元结果转换为简化格式
+        # 将分析单元结果转换为简化格式（每个单元的结果按execution_result预算截断）
         simplified_results = {}
         for unit_name, result in unit_results.items():
             if result.get("status") == "success":
-                simplified_results[unit_name] = result.get("results", "")
+                simplified_results[unit_name] = self.prompt_builder.fit(result.get("results", ""), "execution_result")
         
         # 构建提示信息
         prompt = f"""
@@ -146,7 +137,7 @@ class MarkdownReportGenerator:
 - 列数: {structure_analysis.get('column_count', '未知')}
 
 ## 列信息
-{json.dumps(columns_info, indent=2, ensure_ascii=False, cls=NumpyEncoder)}
+{self.prompt_builder.schema(structure_analysis)}
 
 ## 分析单元结果
 {json.dumps(simplified_results, indent=2, ensure_ascii=False, cls=NumpyEncoder)}
@@ -167,6 +158,7 @@ class MarkdownReportGenerator:
 
 请直接输出Markdown内容，不要添加额外的解释或前言。
 """
+        self.prompt_builder.log_prompt("综合报告", prompt)
         return prompt
     
     def _extract_and_validate_markdown(self, content):
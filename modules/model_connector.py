@@ -11,9 +11,43 @@ import requests
 import time
 import re
 import os
+import asyncio
+import threading
+import weakref
+
+from .http_transport import create_session
+from .response_cache import ResponseCache
+from .retry_policy import RetryPolicy, RateLimiter
+from .prompt_builder import estimate_tokens
+from .stream_sinks import create_sink
+from .endpoint_pool import create_endpoint_pool
+from .model_profiles import load_task_profiles
+from .stream_extractors import JsonObjectWatcher
 
 logger = logging.getLogger(__name__)
 
+# 进程内所有连接器共享的异步并发信号量（asyncio信号量绑定事件循环，按事件循环分别创建）
+_async_semaphores = weakref.WeakKeyDictionary()
+_async_semaphores_lock = threading.Lock()
+
+def get_async_semaphore(limit):
+    """
+    获取当前事件循环中进程共享的模型调用并发信号量
+    
+    Args:
+        limit (int): 最大并发调用数（只在第一次创建时生效）
+    
+    Returns:
+        asyncio.Semaphore: 并发信号量
+    """
+    loop = asyncio.get_running_loop()
+    with _async_semaphores_lock:
+        semaphore = _async_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(limit)
+            _async_semaphores[loop] = semaphore
+        return semaphore
+
 class ModelConnector:
     """
     模型连接器类，负责与大模型API的连接和交互
@@ -44,6 +78,8 @@ class ModelConnector:
             self.timeout = config.get('api', {}).get('timeout_ms', 60000) / 1000  # 转换为秒
             self.max_retries = config.get('api', {}).get('max_retries', 3)
             self.retry_delay = config.get('api', {}).get('retry_delay', 2)
+            endpoint_configs = self.model_config.get('endpoints')
+            profile_configs = self.model_config.get('task_profiles')
         else:
             # 直接模型配置格式
             self.model_type = config.get('type', 'openai')
@@ -60,10 +96,52 @@ class ModelConnector:
             self.timeout = config.get('timeout', 60)
             self.max_retries = config.get('retry_count', 3)
             self.retry_delay = config.get('retry_delay', 2)
+            endpoint_configs = config.get('endpoints')
+            profile_configs = config.get('task_profiles')
+        
+        # 按任务的模型配置档（结构分析、代码修复等任务可以使用更快的模型）
+        self.task_profiles = load_task_profiles(profile_configs)
+        
+        # 模型端点池（配置了多个等价端点时按延迟路由并在失败时切换端点，未配置时只有默认端点）
+        self.endpoint_pool = create_endpoint_pool(
+            endpoint_configs,
+            {'api_base': self.api_base, 'api_key': self.api_key, 'model_id': self.model_id},
+            config
+        )
+        
+        # 所有调用共用一个keep-alive连接池，避免每次调用都重新握手
+        self.session, self.transport_stats = create_session(config)
+        
+        # 持久化的提示词/响应缓存（相同提示词和采样参数不重复调用API）
+        self.response_cache = ResponseCache(config)
+        # 每个线程最近一次同步调用使用的缓存键（调用方据此使下游拒绝的响应失效）
+        self._cache_local = threading.local()
+        
+        # 重试策略（错误分类、全抖动指数退避、Retry-After）和客户端限流（每分钟请求数/token数）
+        self.retry_policy = RetryPolicy(config, self.retry_delay)
+        self.rate_limiter = RateLimiter(config)
+        
+        # 异步调用配置：进程内共享的最大并发数，可选的HTTP/2（需要安装httpx[http2]）
+        api_config = config.get('api', {})
+        self.max_concurrency = api_config.get('max_concurrency', 4)
+        self.http2 = api_config.get('http2', False)
+        self._async_clients = weakref.WeakKeyDictionary()
         
         logger.info(f"初始化模型连接器: 类型={self.model_type}, 模型={self.model_id}")
         logger.info(f"API调用参数: 超时={self.timeout}秒, 最大重试次数={self.max_retries}, 重试间隔={self.retry_delay}秒")
     
+    def close(self):
+        """
+        关闭HTTP连接池并记录连接池统计
+        """
+        self.transport_stats.log_summary("连接池最终统计")
+        self.response_cache.log_summary("模型响应缓存最终统计")
+        self.retry_policy.log_summary("重试最终统计")
+        self.rate_limiter.log_summary("限流最终统计")
+        self.endpoint_pool.log_summary("模型端点最终统计")
+        self.session.close()
+        self.response_cache.close()
+    
     def test_connection(self):
         """
         测试与大模型的连接
@@ -92,7 +170,7 @@ class ModelConnector:
             logger.error(f"连接测试失败: {str(e)}")
             return False
     
-    def call_model(self, prompt, json_mode=False, temperature=None):
+    def call_model(self, prompt, json_mode=False, temperature=None, task=None, use_cache=True):
         """
         调用大模型API
         
@@ -100,83 +178,71 @@ class ModelConnector:
             prompt (str): 提示词
             json_mode (bool): 是否使用JSON模式
             temperature (float): 温度参数，如果为None则使用配置中的值
+            task (str, optional): 任务名称（如 'code_fix'），按任务的模型配置档选择模型和参数
+            use_cache (bool): 是否读取响应缓存（为False时重新调用模型，新响应覆盖缓存中的旧响应）
         
         Returns:
             str: 模型响应，如果调用失败则返回None
         """
-        # 如果未指定温度参数，使用配置中的值
-        if temperature is None:
-            temperature = self.params.get('temperature', 0.7)
+        profile = self._profile(task)
+        response = self._call_model_once(prompt, json_mode, temperature, profile, use_cache)
+        if response is None and self._should_escalate(profile):
+            response = self._call_model_once(prompt, json_mode, temperature, None, use_cache)
+        return response
+    
+    def _call_model_once(self, prompt, json_mode, temperature, profile, use_cache=True):
+        """
+        使用指定的模型配置档调用大模型API（包含重试）
         
-        # 设置代理配置
-        proxy = self.params.get('proxy', None)
-        proxies = None
-        if proxy:
-            proxies = {"http": proxy, "https": proxy}
+        Args:
+            prompt (str): 提示词
+            json_mode (bool): 是否使用JSON模式
+            temperature (float): 温度参数，如果为None则使用配置档或配置中的值
+            profile (ModelProfile): 模型配置档，为None时使用默认模型
+            use_cache (bool): 是否读取响应缓存（为False时重新调用模型，新响应覆盖缓存中的旧响应）
+        
+        Returns:
+            str: 模型响应，如果调用失败则返回None
+        """
+        temperature = self._resolve_temperature(temperature, profile)
+        
+        # 先查找响应缓存
+        cache_key = self._cache_key(prompt, json_mode, temperature, profile=profile)
+        self._cache_local.key = cache_key
+        cached = self.response_cache.get(cache_key) if use_cache else None
+        if cached is not None:
+            logger.info("命中模型响应缓存，跳过API调用")
+            return cached["response"]
         
-        # 添加重试机制
+        # 添加重试机制（每次尝试从端点池中选择端点，失败后优先切换到未尝试过的端点）
+        prompt_tokens = estimate_tokens(prompt)
+        tried = set()
         for retry in range(self.max_retries):
+            self.rate_limiter.acquire(prompt_tokens)
+            endpoint = self.endpoint_pool.acquire(tried)
+            tried.add(endpoint.name)
+            outcome = {"success": False}
             try:
-                logger.info(f"尝试调用API (尝试 {retry+1}/{self.max_retries})...")
-                
-                # 准备请求头
-                headers = {
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {self.api_key}"
-                }
-                
-                # 准备请求体
-                payload = {
-                    "model": self.model_id,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": self.params.get('max_tokens', 4000),
-                    "temperature": temperature,
-                    "top_p": self.params.get('top_p', 0.95)
-                }
+                logger.info(f"尝试调用API (尝试 {retry+1}/{self.max_retries}, 端点 {endpoint.name})...")
                 
-                # 如果是JSON模式，添加响应格式
-                if json_mode:
-                    payload["response_format"] = {"type": "json_object"}
-                
-                try:
-                    # 先尝试使用代理
-                    if proxies:
-                        logger.info(f"使用代理尝试连接: {proxy}")
-                        response = requests.post(
-                            f"{self.api_base}/chat/completions",
-                            headers=headers,
-                            json=payload,
-                            timeout=self.timeout,
-                            proxies=proxies
-                        )
-                    else:
-                        # 如果没有配置代理，直接连接
-                        logger.info("直接连接API（无代理）")
-                        response = requests.post(
-                            f"{self.api_base}/chat/completions",
-                            headers=headers,
-                            json=payload,
-                            timeout=self.timeout
-                        )
-                except requests.exceptions.ProxyError as pe:
-                    # 如果代理连接失败，尝试直接连接
-                    logger.warning(f"代理连接失败: {str(pe)}，尝试直接连接...")
-                    response = requests.post(
-                        f"{self.api_base}/chat/completions",
-                        headers=headers,
-                        json=payload,
-                        timeout=self.timeout
-                    )
+                # 准备请求
+                url, headers, payload = self._build_request(prompt, json_mode, temperature, endpoint=endpoint, profile=profile)
+                response = self._post(url, headers, payload, timeout=self._timeout(profile))
+                outcome["latency"] = response.elapsed.total_seconds()
                 
                 # 检查响应状态
                 if response.status_code == 200:
+                    outcome["success"] = True
                     response_json = response.json()
                     logger.info(f"API响应状态: {response.status_code} OK")
+                    self.transport_stats.log_summary()
                     
                     # 尝试从响应中提取内容
                     if "choices" in response_json and response_json["choices"]:
                         if "message" in response_json["choices"][0] and "content" in response_json["choices"][0]["message"]:
                             content = response_json["choices"][0]["message"]["content"]
+                            self.rate_limiter.record_usage(self._completion_tokens(response_json, content))
+                            self.response_cache.put(cache_key, payload["model"], content)
                             return content
                     
                     # 如果无法提取内容，记录响应并返回适当的错误信息
@@ -184,20 +250,25 @@ class ModelConnector:
                     return None
                 else:
                     logger.error(f"API请求失败: 状态码 {response.status_code}, 响应: {response.text}")
+                    outcome.update(self._failure_outcome(response))
+                    retry_wait = self._next_retry_delay(retry, response=response, tried=tried)
             
             except requests.exceptions.RequestException as e:
                 logger.error(f"API请求异常 (尝试 {retry+1}/{self.max_retries}): {str(e)}")
+                retry_wait = self._next_retry_delay(retry, exception=e, tried=tried)
+            
+            finally:
+                self.endpoint_pool.release(endpoint, **outcome)
             
-            # 如果不是最后一次重试，等待一段时间后重试
-            if retry < self.max_retries - 1:
-                retry_wait = self.retry_delay * (retry + 1)  # 指数退避
-                logger.info(f"{retry_wait}秒后重试...")
-                time.sleep(retry_wait)
+            # 不可重试的错误或最后一次尝试失败时停止，否则等待后重试
+            if retry_wait is None:
+                break
+            time.sleep(retry_wait)
         
-        logger.error(f"达到最大重试次数 ({self.max_retries})，API调用失败")
+        logger.error(f"API调用失败（共尝试 {retry+1} 次）")
         return None
     
-    def call_model_stream(self, prompt, json_mode=False, temperature=None):
+    def call_model_stream(self, prompt, json_mode=False, temperature=None, task=None, stop=None, use_cache=True):
         """
         流式调用大模型API，实时返回结果
         
@@ -205,128 +276,806 @@ class ModelConnector:
             prompt (str): 提示词
             json_mode (bool): 是否使用JSON模式
             temperature (float): 温度参数，如果为None则使用配置中的值
+            task (str, optional): 任务名称（如 'code_fix'），按任务的模型配置档选择模型和参数
+            stop (StreamWatcher, optional): 流式内容检测器，所需内容完整后提前结束流式响应（关闭HTTP流）
+            use_cache (bool): 是否读取响应缓存（为False时重新调用模型，新响应覆盖缓存中的旧响应）
         
         Returns:
             generator: 返回一个生成器，可以逐步获取模型响应的片段
         """
-        # 如果未指定温度参数，使用配置中的值
-        if temperature is None:
-            temperature = self.params.get('temperature', 0.7)
+        profile = self._profile(task)
+        received = False
+        for content in self._call_model_stream_once(prompt, json_mode, temperature, profile, stop, use_cache):
+            received = True
+            yield content
+        # 已经输出了部分内容时不再升级，避免调用方收到两个模型拼接的响应
+        if not received and self._should_escalate(profile):
+            yield from self._call_model_stream_once(prompt, json_mode, temperature, None, stop, use_cache)
+    
+    def _call_model_stream_once(self, prompt, json_mode, temperature, profile, stop=None, use_cache=True):
+        """
+        使用指定的模型配置档流式调用大模型API（包含重试）
         
-        # 设置代理配置
-        proxy = self.params.get('proxy', None)
-        proxies = None
-        if proxy:
-            proxies = {"http": proxy, "https": proxy}
+        Args:
+            prompt (str): 提示词
+            json_mode (bool): 是否使用JSON模式
+            temperature (float): 温度参数，如果为None则使用配置档或配置中的值
+            profile (ModelProfile): 模型配置档，为None时使用默认模型
+            stop (StreamWatcher, optional): 流式内容检测器，所需内容完整后提前结束流式响应（关闭HTTP流）
+            use_cache (bool): 是否读取响应缓存（为False时重新调用模型，新响应覆盖缓存中的旧响应）
+        
+        Returns:
+            generator: 模型响应片段的生成器
+        """
+        temperature = self._resolve_temperature(temperature, profile)
+        
+        # 先查找响应缓存，命中时按原始片段回放
+        cache_key = self._cache_key(prompt, json_mode, temperature, stream=True, profile=profile, stop=stop)
+        self._cache_local.key = cache_key
+        cached = self.response_cache.get(cache_key) if use_cache else None
+        if cached is not None:
+            logger.info("命中模型响应缓存，回放缓存的流式响应")
+            yield from self._replay_cached_stream(cached)
+            return
         
-        # 添加重试机制
+        # 添加重试机制（每次尝试从端点池中选择端点，失败后优先切换到未尝试过的端点）
+        prompt_tokens = estimate_tokens(prompt)
+        tried = set()
         for retry in range(self.max_retries):
+            self.rate_limiter.acquire(prompt_tokens)
+            endpoint = self.endpoint_pool.acquire(tried)
+            tried.add(endpoint.name)
+            outcome = {"success": False}
+            received_chunks = []
             try:
-                logger.info(f"尝试流式调用API (尝试 {retry+1}/{self.max_retries})...")
+                logger.info(f"尝试流式调用API (尝试 {retry+1}/{self.max_retries}, 端点 {endpoint.name})...")
                 
-                # 准备请求头
-                headers = {
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {self.api_key}"
-                }
-                
-                # 准备请求体
-                payload = {
-                    "model": self.model_id,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": self.params.get('max_tokens', 65536),  # 增加到64K，确保HTML报告不会被截断
-                    "temperature": temperature,
-                    "top_p": self.params.get('top_p', 0.95),
-                    "stream": True  # 启用流式输出
-                }
-                
-                # 如果是JSON模式，添加响应格式
-                if json_mode:
-                    payload["response_format"] = {"type": "json_object"}
-                
-                try:
-                    # 先尝试使用代理
-                    if proxies:
-                        logger.info(f"使用代理尝试流式连接: {proxy}")
-                        response = requests.post(
-                            f"{self.api_base}/chat/completions",
-                            headers=headers,
-                            json=payload,
-                            timeout=self.timeout,
-                            proxies=proxies,
-                            stream=True
-                        )
-                    else:
-                        # 如果没有配置代理，直接连接
-                        logger.info("直接流式连接API（无代理）")
-                        response = requests.post(
-                            f"{self.api_base}/chat/completions",
-                            headers=headers,
-                            json=payload,
-                            timeout=self.timeout,
-                            stream=True
-                        )
-                except requests.exceptions.ProxyError as pe:
-                    # 如果代理连接失败，尝试直接连接
-                    logger.warning(f"代理流式连接失败: {str(pe)}，尝试直接连接...")
-                    response = requests.post(
-                        f"{self.api_base}/chat/completions",
-                        headers=headers,
-                        json=payload,
-                        timeout=self.timeout,
-                        stream=True
-                    )
+                # 准备请求
+                url, headers, payload = self._build_request(prompt, json_mode, temperature, stream=True, endpoint=endpoint, profile=profile)
+                response = self._post(url, headers, payload, stream=True, timeout=self._timeout(profile))
+                outcome["latency"] = response.elapsed.total_seconds()
                 
                 # 检查响应状态
                 if response.status_code == 200:
+                    # 连接建立后即视为端点可用（调用方提前停止不算端点失败，传输中断时在异常处理中改回失败）
+                    outcome["success"] = True
                     logger.info(f"API流式响应状态: {response.status_code} OK")
-                    
-                    print("\n开始接收流式响应...\n")
                     logger.info("开始接收流式响应...")
                     
-                    # 处理每个数据块并实时返回内容
-                    for chunk in response.iter_lines():
-                        if chunk:
-                            chunk_str = chunk.decode('utf-8')
-                            # 跳过保持连接的行
-                            if chunk_str.startswith('data: [DONE]'):
+                    # 逐行解析SSE并实时返回内容（结束后将连接归还连接池，调用方提前停止时也会释放）
+                    try:
+                        for line in response.iter_lines():
+                            if not line:
                                 continue
-                            if chunk_str.startswith('data: '):
-                                # 提取JSON部分
-                                json_str = chunk_str[6:]  # 去掉 'data: ' 前缀
-                                try:
-                                    chunk_data = json.loads(json_str)
-                                    
-                                    # 提取内容
-                                    if 'choices' in chunk_data and chunk_data['choices']:
-                                        choice = chunk_data['choices'][0]
-                                        if 'delta' in choice and 'content' in choice['delta']:
-                                            content = choice['delta']['content']
-                                            if content:
-                                                # 实时打印内容
-                                                print(content, end='', flush=True)
-                                                logger.debug(f"收到内容片段: {content}")
-                                                # 返回内容片段给调用者
-                                                yield content
-                                except json.JSONDecodeError:
-                                    logger.warning(f"无法解析JSON: {json_str}")
+                            content = self._parse_stream_line(line.decode('utf-8'))
+                            if content:
+                                received_chunks.append(content)
+                                yield content
+                                if stop is not None and stop.feed(content):
+                                    break
+                        
+                        if stop is not None and stop.complete:
+                            logger.info(f"所需内容已完整（{stop.name}），提前结束流式响应")
+                        else:
+                            logger.info("流式响应接收完成")
+                    finally:
+                        response.close()
+                    
+                    # 只缓存完整接收（或按检测器提前结束）的响应（调用方提前停止时不会执行到这里）
+                    if received_chunks:
+                        full_response = ''.join(received_chunks)
+                        self.rate_limiter.record_usage(estimate_tokens(full_response))
+                        self.response_cache.put(cache_key, payload["model"], full_response, received_chunks)
                     
-                    print("\n\n流式响应接收完成\n")
-                    logger.info("流式响应接收完成")
+                    self.transport_stats.log_summary()
                     return
                 else:
                     logger.error(f"API流式请求失败: 状态码 {response.status_code}, 响应: {response.text}")
+                    outcome.update(self._failure_outcome(response))
+                    retry_wait = self._next_retry_delay(retry, response=response, tried=tried)
             
             except requests.exceptions.RequestException as e:
                 logger.error(f"API流式请求异常 (尝试 {retry+1}/{self.max_retries}): {str(e)}")
+                outcome["success"] = False
+                if received_chunks:
+                    # 已经输出了部分内容时不再重试：重试会从头输出，调用方的检测器和输出目标会收到重复的内容
+                    logger.error(f"流式响应在输出 {len(received_chunks)} 个片段后中断，不再重试")
+                    retry_wait = None
+                else:
+                    retry_wait = self._next_retry_delay(retry, exception=e, tried=tried)
+            
+            finally:
+                # 流式响应在生成器结束（或调用方提前停止）时才释放端点
+                self.endpoint_pool.release(endpoint, **outcome)
+            
+            # 不可重试的错误或最后一次尝试失败时停止，否则等待后重试
+            if retry_wait is None:
+                break
+            time.sleep(retry_wait)
+        
+        logger.error(f"API流式调用失败（共尝试 {retry+1} 次）")
+        return None
+    
+    def _post(self, url, headers, payload, stream=False, timeout=None):
+        """
+        发送POST请求（配置了代理时先使用代理，代理连接失败时改为直接连接）
+        
+        Args:
+            url (str): 请求URL
+            headers (dict): 请求头
+            payload (dict): 请求体
+            stream (bool): 是否流式读取响应
+            timeout (float, optional): 超时时间（秒），为None时使用配置的超时时间
+        
+        Returns:
+            requests.Response: 响应
+        """
+        timeout = timeout or self.timeout
+        proxy = self.params.get('proxy', None)
+        if proxy:
+            try:
+                logger.info(f"使用代理尝试连接: {proxy}")
+                return self.session.post(
+                    url,
+                    headers=headers,
+                    json=payload,
+                    timeout=timeout,
+                    proxies={"http": proxy, "https": proxy},
+                    stream=stream
+                )
+            except requests.exceptions.ProxyError as pe:
+                # 如果代理连接失败，尝试直接连接
+                logger.warning(f"代理连接失败: {str(pe)}，尝试直接连接...")
+        else:
+            # 如果没有配置代理，直接连接
+            logger.info("直接连接API（无代理）")
+        return self.session.post(url, headers=headers, json=payload, timeout=timeout, stream=stream)
+    
+    def stream_text(self, prompt, json_mode=False, temperature=None, label=None, sink=None, task=None, stop=None, use_cache=True):
+        """
+        流式调用大模型API并返回完整响应
+        
+        内容片段交给输出目标（终端、进度、文件、回调或不输出），并用列表累积后一次拼接
+        
+        Args:
+            prompt (str): 提示词
+            json_mode (bool): 是否使用JSON模式
+            temperature (float): 温度参数，如果为None则使用配置中的值
+            label (str, optional): 响应的描述，用于输出目标显示
+            sink (StreamSink, optional): 输出目标，如果为None则按 api.stream_output 配置创建
+            task (str, optional): 任务名称，按任务的模型配置档选择模型和参数
+            stop (StreamWatcher, optional): 流式内容检测器（如 CodeBlockWatcher），所需内容完整后提前结束
+            use_cache (bool): 是否读取响应缓存（为False时重新调用模型，新响应覆盖缓存中的旧响应）
+        
+        Returns:
+            str: 完整的模型响应，如果没有收到内容则返回空字符串
+        """
+        if sink is None:
+            sink = create_sink(self.config)
+        
+        chunks = []
+        sink.on_start(label)
+        try:
+            for content in self.call_model_stream(prompt, json_mode, temperature, task, stop, use_cache):
+                chunks.append(content)
+                sink.on_chunk(content)
+        finally:
+            sink.on_end(label)
+        return ''.join(chunks)
+    
+    def _next_retry_delay(self, retry, response=None, exception=None, tried=None):
+        """
+        判断失败的请求是否需要重试，并计算重试前的等待时间
+        
+        还有本次调用未尝试过的健康端点时立即切换端点重试，不等待退避时间；
+        401、403、404 等端点相关的错误在有其他端点时也会切换端点重试
+        
+        Args:
+            retry (int): 当前尝试序号（从0开始）
+            response: 状态码不是200的响应（与exception二选一）
+            exception (Exception): 请求异常（与response二选一）
+            tried (set, optional): 本次调用已尝试过的端点名称
+        
+        Returns:
+            float: 等待秒数，不可重试或已达到最大重试次数时返回None
+        """
+        if response is not None:
+            reason = f"HTTP {response.status_code}"
+            retryable = self.retry_policy.is_retryable_status(response.status_code)
+            retry_after = self.retry_policy.parse_retry_after(response.headers)
+            endpoint_error = response.status_code in (401, 403, 404)
+        else:
+            reason = type(exception).__name__
+            retryable = self.retry_policy.is_retryable_exception(exception)
+            retry_after = None
+            endpoint_error = False
+        
+        can_failover = tried is not None and self.endpoint_pool.has_alternative(tried)
+        if not retryable and not (endpoint_error and can_failover):
+            logger.error(f"{reason} 为不可重试的错误，停止重试")
+            self.retry_policy.record_fatal(reason)
+            return None
+        if retry >= self.max_retries - 1:
+            return None
+        
+        if can_failover:
+            self.retry_policy.record_retry(reason, 0.0)
+            logger.info(f"{reason}，切换到其他模型端点重试...")
+            return 0.0
+        
+        retry_wait = self.retry_policy.compute_delay(retry, retry_after)
+        self.retry_policy.record_retry(reason, retry_wait)
+        if retry_after is not None:
+            logger.info(f"服务端要求 {retry_after:.1f}秒后重试 (Retry-After)，{retry_wait:.2f}秒后重试...")
+        else:
+            logger.info(f"{retry_wait:.2f}秒后重试...")
+        return retry_wait
+    
+    def _failure_outcome(self, response):
+        """
+        根据失败的响应生成端点状态更新参数（429时让端点按 Retry-After 进入冷却期）
+        
+        Args:
+            response: 状态码不是200的响应
+        
+        Returns:
+            dict: EndpointPool.release 的参数
+        """
+        if response.status_code == 429:
+            return {
+                "throttled": True,
+                "retry_after": self.retry_policy.parse_retry_after(response.headers)
+            }
+        return {}
+    
+    def _completion_tokens(self, response_json, content):
+        """
+        获取模型输出的token数（优先使用响应中的usage，没有时按内容估算）
+        
+        Args:
+            response_json (dict): 响应JSON
+            content (str): 模型输出内容
+        
+        Returns:
+            int: token数
+        """
+        usage = response_json.get("usage") or {}
+        return usage.get("completion_tokens") or estimate_tokens(content)
+    
+    def _cache_key(self, prompt, json_mode=False, temperature=None, stream=False, profile=None, stop=None):
+        """
+        构建响应缓存键（模型名称、规范化提示词和采样参数）
+        
+        Args:
+            prompt (str): 提示词
+            json_mode (bool): 是否使用JSON模式
+            temperature (float): 温度参数
+            stream (bool): 是否流式输出
+            profile (ModelProfile, optional): 模型配置档
+            stop (StreamWatcher, optional): 流式内容检测器（提前结束的响应单独缓存）
+        
+        Returns:
+            str: 缓存键
+        """
+        params = {
+            "temperature": temperature,
+            "top_p": self.params.get('top_p', 0.95),
+            "max_tokens": self._max_tokens(stream, profile),
+            "json_mode": json_mode,
+            "stream": stream
+        }
+        if stop is not None:
+            params["stop"] = stop.name
+        return self.response_cache.build_key(self._model_id(profile), prompt, params)
+    
+    def last_cache_key(self):
+        """
+        获取当前线程最近一次同步调用（call_model、call_model_stream、stream_text）使用的响应缓存键
+        
+        Returns:
+            str: 缓存键，当前线程还没有调用过模型时返回None
+        """
+        return getattr(self._cache_local, 'key', None)
+    
+    def invalidate_cached_response(self, cache_key):
+        """
+        删除缓存的响应（调用方无法使用该响应时调用，避免重新分析时回放同一个错误的响应）
+        
+        Args:
+            cache_key (str): 缓存键（last_cache_key() 的返回值）
+        """
+        if cache_key and self.response_cache.delete(cache_key):
+            logger.info("已从模型响应缓存中删除未通过校验的响应")
+    
+    def _profile(self, task):
+        """
+        获取任务的模型配置档
+        
+        Args:
+            task (str): 任务名称
+        
+        Returns:
+            ModelProfile: 模型配置档，任务没有配置时返回None（使用默认模型）
+        """
+        return self.task_profiles.get(task) if task else None
+    
+    def _should_escalate(self, profile):
+        """
+        判断使用配置档的调用失败后是否升级到默认模型重试（记录升级日志）
+        
+        Args:
+            profile (ModelProfile): 模型配置档
+        
+        Returns:
+            bool: 是否升级
+        """
+        if profile is None or not profile.escalate:
+            return False
+        logger.warning(f"任务 {profile.task} 使用 {self._model_id(profile)} 调用失败，升级到默认模型 {self.model_id} 重试")
+        return True
+    
+    def escalation_task(self, task, attempt):
+        """
+        获取重复任务（如多轮代码修复）第n次调用应使用的任务名称
+        
+        配置了 escalate 的任务只在第一次调用时使用该任务的模型，之后（上一次的结果不可用）改用默认模型
+        
+        Args:
+            task (str): 任务名称
+            attempt (int): 第几次调用（从1开始）
+        
+        Returns:
+            str: 任务名称，使用默认模型时返回None
+        """
+        profile = self._profile(task)
+        if profile is not None and profile.escalate and attempt > 1:
+            logger.info(f"任务 {task} 第 {attempt} 次调用，升级到默认模型 {self.model_id}")
+            return None
+        return task
+    
+    def _model_id(self, profile):
+        """
+        获取配置档使用的模型名称
+        
+        Args:
+            profile (ModelProfile): 模型配置档
+        
+        Returns:
+            str: 模型名称
+        """
+        return profile.model_id if profile is not None and profile.model_id else self.model_id
+    
+    def _max_tokens(self, stream, profile):
+        """
+        获取最大输出token数（配置档优先）
+        
+        Args:
+            stream (bool): 是否流式输出
+            profile (ModelProfile): 模型配置档
+        
+        Returns:
+            int: 最大输出token数
+        """
+        if profile is not None and profile.max_tokens:
+            return profile.max_tokens
+        return self.params.get('max_tokens', 65536 if stream else 4000)
+    
+    def _resolve_temperature(self, temperature, profile):
+        """
+        获取温度参数（调用方指定的值优先，其次是配置档，最后是配置中的值）
+        
+        Args:
+            temperature (float): 调用方指定的温度参数
+            profile (ModelProfile): 模型配置档
+        
+        Returns:
+            float: 温度参数
+        """
+        if temperature is not None:
+            return temperature
+        if profile is not None and profile.temperature is not None:
+            return profile.temperature
+        return self.params.get('temperature', 0.7)
+    
+    def _timeout(self, profile):
+        """
+        获取请求超时时间（配置档优先）
+        
+        Args:
+            profile (ModelProfile): 模型配置档
+        
+        Returns:
+            float: 超时时间（秒）
+        """
+        return profile.timeout if profile is not None and profile.timeout else self.timeout
+    
+    def _replay_cached_stream(self, cached):
+        """
+        以生成器形式回放缓存的流式响应
+        
+        Args:
+            cached (dict): 缓存条目
+        
+        Yields:
+            str: 响应片段
+        """
+        chunks = cached["chunks"] if cached["chunks"] is not None else [cached["response"]]
+        yield from chunks
+    
+    def _build_request(self, prompt, json_mode=False, temperature=None, stream=False, endpoint=None, profile=None):
+        """
+        构建chat/completions请求
+        
+        Args:
+            prompt (str): 提示词
+            json_mode (bool): 是否使用JSON模式
+            temperature (float): 温度参数，如果为None则使用配置中的值
+            stream (bool): 是否流式输出
+            endpoint (Endpoint, optional): 目标端点，为None时使用默认端点
+            profile (ModelProfile, optional): 模型配置档，设置了模型时覆盖端点的模型
+        
+        Returns:
+            tuple: (请求URL, 请求头, 请求体)
+        """
+        temperature = self._resolve_temperature(temperature, profile)
+        
+        api_base = endpoint.api_base if endpoint is not None else self.api_base
+        api_key = endpoint.api_key if endpoint is not None else self.api_key
+        model_id = endpoint.model_id if endpoint is not None else self.model_id
+        if profile is not None and profile.model_id:
+            model_id = profile.model_id
+        
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        }
+        payload = {
+            "model": model_id,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": self._max_tokens(stream, profile),
+            "temperature": temperature,
+            "top_p": self.params.get('top_p', 0.95)
+        }
+        if stream:
+            payload["stream"] = True
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        
+        return f"{api_base}/chat/completions", headers, payload
+    
+    def _get_async_client(self):
+        """
+        获取当前事件循环的异步HTTP客户端（httpx.AsyncClient，连接池在调用之间复用）
+        
+        Returns:
+            httpx.AsyncClient: 异步客户端，如果未安装httpx则返回None
+        """
+        try:
+            import httpx
+        except ImportError:
+            return None
+        
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            pool_config = self.config.get('api', {}).get('http_pool', {}) or {}
+            http2 = self.http2
+            if http2:
+                try:
+                    import h2  # noqa: F401
+                except ImportError:
+                    logger.warning("未安装h2，异步客户端使用HTTP/1.1（pip install httpx[http2] 可启用HTTP/2）")
+                    http2 = False
+            proxy = self.params.get('proxy')
+            client = httpx.AsyncClient(
+                http2=http2,
+                timeout=self.timeout,
+                proxy=proxy or None,
+                limits=httpx.Limits(
+                    max_connections=pool_config.get('pool_maxsize', 10),
+                    max_keepalive_connections=pool_config.get('pool_maxsize', 10)
+                )
+            )
+            self._async_clients[loop] = client
+            logger.info(f"初始化异步HTTP客户端: HTTP/2={http2}, 最大并发={self.max_concurrency}")
+        return client
+    
+    async def aclose(self):
+        """
+        关闭当前事件循环的异步HTTP客户端
+        """
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+    
+    async def acall_model(self, prompt, json_mode=False, temperature=None, task=None, use_cache=True):
+        """
+        异步调用大模型API（受进程共享的并发信号量限制）
+        
+        未安装httpx时在线程池中执行同步调用，仍然可以与其他调用并发
+        
+        Args:
+            prompt (str): 提示词
+            json_mode (bool): 是否使用JSON模式
+            temperature (float): 温度参数，如果为None则使用配置中的值
+            task (str, optional): 任务名称，按任务的模型配置档选择模型和参数
+            use_cache (bool): 是否读取响应缓存（为False时重新调用模型，新响应覆盖缓存中的旧响应）
+        
+        Returns:
+            str: 模型响应，如果调用失败则返回None
+        """
+        async with get_async_semaphore(self.max_concurrency):
+            client = self._get_async_client()
+            if client is None:
+                return await asyncio.to_thread(self.call_model, prompt, json_mode, temperature, task, use_cache)
+            
+            profile = self._profile(task)
+            response = await self._acall_model_once(client, prompt, json_mode, temperature, profile, use_cache)
+            if response is None and self._should_escalate(profile):
+                response = await self._acall_model_once(client, prompt, json_mode, temperature, None, use_cache)
+            return response
+    
+    async def _acall_model_once(self, client, prompt, json_mode, temperature, profile, use_cache=True):
+        """
+        使用指定的模型配置档异步调用大模型API（包含重试）
+        
+        Args:
+            client (httpx.AsyncClient): 异步客户端
+            prompt (str): 提示词
+            json_mode (bool): 是否使用JSON模式
+            temperature (float): 温度参数，如果为None则使用配置档或配置中的值
+            profile (ModelProfile): 模型配置档，为None时使用默认模型
+            use_cache (bool): 是否读取响应缓存（为False时重新调用模型，新响应覆盖缓存中的旧响应）
+        
+        Returns:
+            str: 模型响应，如果调用失败则返回None
+        """
+        import httpx
+        
+        temperature = self._resolve_temperature(temperature, profile)
+        cache_key = self._cache_key(prompt, json_mode, temperature, profile=profile)
+        cached = self.response_cache.get(cache_key) if use_cache else None
+        if cached is not None:
+            logger.info("命中模型响应缓存，跳过API调用")
+            return cached["response"]
+        
+        prompt_tokens = estimate_tokens(prompt)
+        tried = set()
+        for retry in range(self.max_retries):
+            await asyncio.sleep(self.rate_limiter.reserve(prompt_tokens))
+            endpoint = await self._acquire_endpoint_async(tried)
+            tried.add(endpoint.name)
+            outcome = {"success": False}
+            try:
+                logger.info(f"尝试异步调用API (尝试 {retry+1}/{self.max_retries}, 端点 {endpoint.name})...")
+                url, headers, payload = self._build_request(prompt, json_mode, temperature, endpoint=endpoint, profile=profile)
+                started = time.monotonic()
+                response = await client.post(url, headers=headers, json=payload, timeout=self._timeout(profile))
+                outcome["latency"] = time.monotonic() - started
+                
+                if response.status_code == 200:
+                    outcome["success"] = True
+                    response_json = response.json()
+                    logger.info(f"API异步响应状态: {response.status_code} OK")
+                    
+                    if "choices" in response_json and response_json["choices"]:
+                        message = response_json["choices"][0].get("message", {})
+                        if "content" in message:
+                            self.rate_limiter.record_usage(self._completion_tokens(response_json, message["content"]))
+                            self.response_cache.put(cache_key, payload["model"], message["content"])
+                            return message["content"]
+                    
+                    logger.warning(f"API响应格式异常: {response_json}")
+                    return None
+                else:
+                    logger.error(f"API异步请求失败: 状态码 {response.status_code}, 响应: {response.text}")
+                    outcome.update(self._failure_outcome(response))
+                    retry_wait = self._next_retry_delay(retry, response=response, tried=tried)
+            
+            except httpx.HTTPError as e:
+                logger.error(f"API异步请求异常 (尝试 {retry+1}/{self.max_retries}): {str(e)}")
+                retry_wait = self._next_retry_delay(retry, exception=e, tried=tried)
+            
+            finally:
+                self.endpoint_pool.release(endpoint, **outcome)
+            
+            # 等待后重试（不阻塞事件循环）
+            if retry_wait is None:
+                break
+            await asyncio.sleep(retry_wait)
+        
+        logger.error(f"API异步调用失败（共尝试 {retry+1} 次）")
+        return None
+
+    async def acall_model_stream(self, prompt, json_mode=False, temperature=None, task=None, stop=None, use_cache=True):
+        """
+        异步流式调用大模型API，返回异步迭代器（受进程共享的并发信号量限制）
+        
+        未安装httpx时在后台线程中执行同步流式调用，内容片段通过队列传回事件循环
+        
+        Args:
+            prompt (str): 提示词
+            json_mode (bool): 是否使用JSON模式
+            temperature (float): 温度参数，如果为None则使用配置中的值
+            task (str, optional): 任务名称，按任务的模型配置档选择模型和参数
+            stop (StreamWatcher, optional): 流式内容检测器，所需内容完整后提前结束流式响应（关闭HTTP流）
+            use_cache (bool): 是否读取响应缓存（为False时重新调用模型，新响应覆盖缓存中的旧响应）
+        
+        Yields:
+            str: 模型响应的内容片段
+        """
+        async with get_async_semaphore(self.max_concurrency):
+            client = self._get_async_client()
+            if client is None:
+                async for content in self._stream_in_thread(prompt, json_mode, temperature, task, stop, use_cache):
+                    yield content
+                return
+            
+            profile = self._profile(task)
+            received = False
+            async for content in self._acall_model_stream_once(client, prompt, json_mode, temperature, profile, stop, use_cache):
+                received = True
+                yield content
+            if not received and self._should_escalate(profile):
+                async for content in self._acall_model_stream_once(client, prompt, json_mode, temperature, None, stop, use_cache):
+                    yield content
+    
+    async def _acall_model_stream_once(self, client, prompt, json_mode, temperature, profile, stop=None, use_cache=True):
+        """
+        使用指定的模型配置档异步流式调用大模型API（包含重试）
+        
+        Args:
+            client (httpx.AsyncClient): 异步客户端
+            prompt (str): 提示词
+            json_mode (bool): 是否使用JSON模式
+            temperature (float): 温度参数，如果为None则使用配置档或配置中的值
+            profile (ModelProfile): 模型配置档，为None时使用默认模型
+            stop (StreamWatcher, optional): 流式内容检测器，所需内容完整后提前结束流式响应（关闭HTTP流）
+            use_cache (bool): 是否读取响应缓存（为False时重新调用模型，新响应覆盖缓存中的旧响应）
+        
+        Yields:
+            str: 模型响应的内容片段
+        """
+        import httpx
+        
+        temperature = self._resolve_temperature(temperature, profile)
+        cache_key = self._cache_key(prompt, json_mode, temperature, stream=True, profile=profile, stop=stop)
+        cached = self.response_cache.get(cache_key) if use_cache else None
+        if cached is not None:
+            logger.info("命中模型响应缓存，回放缓存的流式响应")
+            for content in cached["chunks"] or [cached["response"]]:
+                yield content
+            return
+        
+        prompt_tokens = estimate_tokens(prompt)
+        tried = set()
+        for retry in range(self.max_retries):
+            await asyncio.sleep(self.rate_limiter.reserve(prompt_tokens))
+            endpoint = await self._acquire_endpoint_async(tried)
+            tried.add(endpoint.name)
+            outcome = {"success": False}
+            received_chunks = []
+            try:
+                logger.info(f"尝试异步流式调用API (尝试 {retry+1}/{self.max_retries}, 端点 {endpoint.name})...")
+                url, headers, payload = self._build_request(prompt, json_mode, temperature, stream=True, endpoint=endpoint, profile=profile)
+                started = time.monotonic()
+                async with client.stream("POST", url, headers=headers, json=payload, timeout=self._timeout(profile)) as response:
+                    outcome["latency"] = time.monotonic() - started
+                    if response.status_code == 200:
+                        outcome["success"] = True
+                        logger.info(f"API异步流式响应状态: {response.status_code} OK")
+                        async for line in response.aiter_lines():
+                            content = self._parse_stream_line(line)
+                            if content:
+                                received_chunks.append(content)
+                                yield content
+                                if stop is not None and stop.feed(content):
+                                    break
+                        if stop is not None and stop.complete:
+                            logger.info(f"所需内容已完整（{stop.name}），提前结束异步流式响应")
+                        else:
+                            logger.info("异步流式响应接收完成")
+                        if received_chunks:
+                            full_response = ''.join(received_chunks)
+                            self.rate_limiter.record_usage(estimate_tokens(full_response))
+                            self.response_cache.put(cache_key, payload["model"], full_response, received_chunks)
+                        return
+                    
+                    await response.aread()
+                    logger.error(f"API异步流式请求失败: 状态码 {response.status_code}, 响应: {response.text}")
+                    outcome.update(self._failure_outcome(response))
+                    retry_wait = self._next_retry_delay(retry, response=response, tried=tried)
+            
+            except httpx.HTTPError as e:
+                logger.error(f"API异步流式请求异常 (尝试 {retry+1}/{self.max_retries}): {str(e)}")
+                outcome["success"] = False
+                if received_chunks:
+                    # 已经输出了部分内容时不再重试（重试会从头输出重复的内容）
+                    logger.error(f"异步流式响应在输出 {len(received_chunks)} 个片段后中断，不再重试")
+                    retry_wait = None
+                else:
+                    retry_wait = self._next_retry_delay(retry, exception=e, tried=tried)
+            
+            finally:
+                self.endpoint_pool.release(endpoint, **outcome)
             
-            # 如果不是最后一次重试，等待一段时间后重试
-            if retry < self.max_retries - 1:
-                retry_wait = self.retry_delay * (retry + 1)  # 指数退避
-                logger.info(f"{retry_wait}秒后重试...")
-                time.sleep(retry_wait)
+            if retry_wait is None:
+                break
+            await asyncio.sleep(retry_wait)
+        
+        logger.error(f"API异步流式调用失败（共尝试 {retry+1} 次）")
+
+    async def _acquire_endpoint_async(self, tried):
+        """
+        异步获取端点（所有端点都满时让出事件循环并轮询，不阻塞其他协程）
         
-        logger.error(f"达到最大重试次数 ({self.max_retries})，API流式调用失败")
+        Args:
+            tried (set): 本次调用已尝试过的端点名称
+        
+        Returns:
+            Endpoint: 选中的端点
+        """
+        while True:
+            endpoint = self.endpoint_pool.try_acquire(tried)
+            if endpoint is not None:
+                return endpoint
+            await asyncio.sleep(0.05)
+    
+    async def _stream_in_thread(self, prompt, json_mode=False, temperature=None, task=None, stop=None, use_cache=True):
+        """
+        在后台线程中执行同步流式调用，并以异步迭代器的形式返回内容片段
+        
+        Args:
+            prompt (str): 提示词
+            json_mode (bool): 是否使用JSON模式
+            temperature (float): 温度参数
+            task (str, optional): 任务名称
+            stop (StreamWatcher, optional): 流式内容检测器
+            use_cache (bool): 是否读取响应缓存（为False时重新调用模型，新响应覆盖缓存中的旧响应）
+        
+        Yields:
+            str: 模型响应的内容片段
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        finished = object()
+        
+        def produce():
+            try:
+                for content in self.call_model_stream(prompt, json_mode, temperature, task, stop, use_cache):
+                    loop.call_soon_threadsafe(queue.put_nowait, content)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, finished)
+        
+        producer = loop.run_in_executor(None, produce)
+        while True:
+            content = await queue.get()
+            if content is finished:
+                break
+            yield content
+        await producer
+    
+    def _parse_stream_line(self, line):
+        """
+        解析一行SSE流式响应
+        
+        Args:
+            line (str): 响应行
+        
+        Returns:
+            str: 内容片段，没有内容时返回None
+        """
+        if not line or not line.startswith('data: ') or line.startswith('data: [DONE]'):
+            return None
+        json_str = line[6:]
+        try:
+            chunk_data = json.loads(json_str)
+        except json.JSONDecodeError:
+            logger.warning(f"无法解析JSON: {json_str}")
+            return None
+        if 'choices' in chunk_data and chunk_data['choices']:
+            delta = chunk_data['choices'][0].get('delta', {})
+            return delta.get('content') or None
         return None
 
     def analyze_data_structure(self, excel_data):
@@ -374,15 +1123,7 @@ JSON结构应该包含以下字段:
             
             # 调用模型（使用流式API调用）
             logger.info("尝试调用API分析数据结构（流式输出）...")
-            print("\n开始分析数据结构...\n")
-            
-            response = ""
-            for chunk in self.call_model_stream(prompt, json_mode=True):
-                if chunk:
-                    print(chunk, end='', flush=True)
-                    response += chunk
-            
-            print("\n\n数据结构分析完成\n")
+            response = self.stream_text(prompt, json_mode=True, label="分析数据结构", task="structure", stop=JsonObjectWatcher())
             
             if not response:
                 logger.error("分析Excel数据结构失败: 模型未返回有效响应")
@@ -396,6 +1137,14 @@ JSON结构应该包含以下字段:
             except json.JSONDecodeError as e:
                 logger.error(f"解析数据结构分析结果失败: {str(e)}")
                 
+                # 响应以完整的JSON开头但后面还有其他内容时（如提前结束流式响应的最后一个片段），只解析开头的JSON
+                try:
+                    structure_analysis, _ = json.JSONDecoder().raw_decode(response.strip())
+                    logger.info("成功解析响应开头的数据结构分析结果")
+                    return structure_analysis
+                except json.JSONDecodeError:
+                    pass
+                
                 # 尝试提取JSON部分
                 json_match = re.search(r'```json\s*(.*?)\s*```', response, re.DOTALL)
                 if json_match:
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+模型配置档模块 - 按调用场景（任务）选择模型和调用参数
+
+结构分析、代码修复等任务不需要旗舰模型，可以为每个任务配置单独的模型、最大输出token数、
+温度和超时时间。配置了 escalate 的任务先使用该任务的（通常更快更便宜的）模型，
+调用失败时再升级到默认模型重试
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 支持的任务（调用场景）
+TASKS = {
+    "structure": "数据结构分析",
+    "code_generation": "生成分析代码",
+    "code_fix": "修复分析代码",
+    "chart": "生成图表代码",
+    "unit_report": "分析单元报告",
+    "report": "综合报告"
+}
+
+
+class ModelProfile:
+    """
+    模型配置档（未设置的字段使用默认模型的配置）
+    """
+
+    def __init__(self, task, model_id=None, max_tokens=None, temperature=None, timeout=None, escalate=False):
+        """
+        初始化模型配置档
+
+        Args:
+            task (str): 任务名称
+            model_id (str, optional): 模型名称
+            max_tokens (int, optional): 最大输出token数
+            temperature (float, optional): 温度参数
+            timeout (float, optional): 请求超时时间（秒）
+            escalate (bool): 调用失败时是否升级到默认模型重试
+        """
+        self.task = task
+        self.model_id = model_id
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.timeout = timeout
+        self.escalate = escalate
+
+    def describe(self):
+        """
+        获取配置档的描述（用于日志）
+
+        Returns:
+            str: 描述
+        """
+        fields = [
+            f"{name}={value}" for name, value in (
+                ("模型", self.model_id),
+                ("最大输出", self.max_tokens),
+                ("温度", self.temperature),
+                ("超时", self.timeout)
+            ) if value is not None
+        ]
+        if self.escalate:
+            fields.append("失败时升级到默认模型")
+        return f"{self.task}({TASKS.get(self.task, self.task)}): {', '.join(fields) or '使用默认模型'}"
+
+
+def load_task_profiles(profile_configs):
+    """
+    根据配置创建各任务的模型配置档
+
+    Args:
+        profile_configs (dict): 任务名称到配置的字典，每项可包含 model_id、max_tokens、temperature、
+            timeout_ms、escalate
+
+    Returns:
+        dict: 任务名称到 ModelProfile 的字典
+    """
+    profiles = {}
+    for task, profile_config in (profile_configs or {}).items():
+        if task not in TASKS:
+            logger.warning(f"未知的模型任务: {task}，可用的任务: {', '.join(TASKS)}")
+            continue
+        profile_config = profile_config or {}
+        timeout_ms = profile_config.get('timeout_ms')
+        profile = ModelProfile(
+            task,
+            model_id=profile_config.get('model_id'),
+            max_tokens=profile_config.get('max_tokens'),
+            temperature=profile_config.get('temperature'),
+            timeout=timeout_ms / 1000 if timeout_ms else None,
+            escalate=profile_config.get('escalate', False)
+        )
+        profiles[task] = profile
+        logger.info(f"任务模型配置: {profile.describe()}")
+    return profiles
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+提示词构建模块 - 按token预算组装提示词
+
+结构分析结果用 json.dumps(indent=2) 嵌入提示词时，大量的缩进和重复键名会占用数千个token，
+而且每次会话要发送五次以上（每个分析单元一次，每轮代码修复一次）。本模块提供：
+- token估算（安装了tiktoken时精确计算，否则按中英文字符估算）
+- 结构分析结果的紧凑表格编码（每列一行，键名只出现一次）
+- 按段落的token预算（结构信息、前序单元结果、执行结果、错误信息、综合报告的分析结果），超出预算时截断或摘要
+- 按阶段记录每个提示词的token数
+"""
+
+import re
+import json
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 中日韩字符（每个字符大约对应一个token）
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+# 各段落的默认token预算
+DEFAULT_BUDGETS = {
+    "schema": 3000,
+    "data_context": 1500,
+    "execution_result": 3000,
+    "error_message": 1000,
+    "report_results": 12000
+}
+
+_tokenizer = None
+_tokenizer_loaded = False
+
+
+def _get_tokenizer():
+    """
+    获取tiktoken分词器（可选依赖，未安装时返回None）
+
+    Returns:
+        tiktoken.Encoding: 分词器
+    """
+    global _tokenizer, _tokenizer_loaded
+    if not _tokenizer_loaded:
+        _tokenizer_loaded = True
+        try:
+            import tiktoken
+
+            _tokenizer = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _tokenizer = None
+    return _tokenizer
+
+
+def estimate_tokens(text):
+    """
+    估算文本的token数
+
+    Args:
+        text (str): 文本
+
+    Returns:
+        int: token数
+    """
+    if not text:
+        return 0
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, disallowed_special=()))
+    # 中日韩字符按每字1个token，其余字符按每4个字符1个token估算
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    return cjk_count + math.ceil((len(text) - cjk_count) / 4)
+
+
+def truncate_to_tokens(text, max_tokens, marker="\n...（中间省略约 {omitted} 个token）...\n"):
+    """
+    将文本截断到token预算内（保留开头和结尾，中间用省略标记代替）
+
+    Args:
+        text (str): 文本
+        max_tokens (int): token预算
+        marker (str): 省略标记，{omitted} 会替换为省略的token数
+
+    Returns:
+        str: 截断后的文本
+    """
+    if not text:
+        return text
+    total = estimate_tokens(text)
+    if max_tokens is None or max_tokens <= 0 or total <= max_tokens:
+        return text
+
+    # 按字符比例估算保留长度，开头保留三分之二，结尾保留三分之一（错误信息的关键行通常在末尾）
+    keep_chars = max(int(len(text) * max_tokens / total), 1)
+    head = text[:keep_chars * 2 // 3]
+    tail = text[len(text) - keep_chars // 3:] if keep_chars // 3 else ""
+    omitted = max(total - estimate_tokens(head) - estimate_tokens(tail), 0)
+    return head + marker.format(omitted=omitted) + tail
+
+
+def _format_value(value):
+    """
+    格式化统计值（浮点数保留4位有效数字）
+
+    Args:
+        value: 统计值
+
+    Returns:
+        str: 格式化后的字符串
+    """
+    if isinstance(value, float) or type(value).__name__.startswith('float'):
+        if math.isnan(value):
+            return "nan"
+        return f"{value:.4g}"
+    if isinstance(value, dict):
+        if set(value) == {"value", "count"}:
+            return f"{value['value']}({value['count']})"
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str)
+    return str(value)
+
+
+def encode_schema(structure_analysis, max_tokens=None):
+    """
+    将结构分析结果编码为紧凑的表格文本
+
+    每列一行: 列名|类型|缺失值|唯一值|统计信息。超出预算时，
+    预算内的列保留完整统计信息，其余列只列出列名和类型
+
+    Args:
+        structure_analysis (dict): 数据结构分析结果
+        max_tokens (int, optional): token预算
+
+    Returns:
+        str: 紧凑的结构信息文本
+    """
+    lines = []
+    file_fields = []
+    for key, value in structure_analysis.items():
+        if key == "columns":
+            continue
+        if isinstance(value, (dict, list)):
+            lines.append(f"{key}: {json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str)}")
+        else:
+            file_fields.append(f"{key}={value}")
+    if file_fields:
+        lines.insert(0, "; ".join(file_fields))
+
+    columns = structure_analysis.get("columns", {}) or {}
+    lines.append("列名|类型|缺失值|唯一值|统计信息")
+    header = "\n".join(lines)
+    used = estimate_tokens(header)
+
+    column_lines = []
+    compact_columns = []
+    for col, info in columns.items():
+        stats = ", ".join(
+            f"{key}={_format_value(value)}" for key, value in info.items()
+            if key not in ("type", "missing_values", "unique_values")
+        )
+        line = f"{col}|{info.get('type', '')}|{info.get('missing_values', '')}|{info.get('unique_values', '')}|{stats}"
+        line_tokens = estimate_tokens(line) + 1
+        if compact_columns or (max_tokens and used + line_tokens > max_tokens):
+            compact_columns.append(f"{col}:{info.get('type', '')}")
+            continue
+        column_lines.append(line)
+        used += line_tokens
+
+    text = "\n".join([header] + column_lines)
+    if compact_columns:
+        text += f"\n其余 {len(compact_columns)} 列（仅列名:类型）: " + ", ".join(compact_columns)
+        text = truncate_to_tokens(text, max_tokens)
+    return text
+
+
+class PromptBuilder:
+    """
+    提示词构建器类，负责按段落预算组装提示词并统计token数
+    """
+
+    def __init__(self, config):
+        """
+        初始化提示词构建器
+
+        Args:
+            config (dict): 配置信息（读取 analysis.prompt）
+        """
+        prompt_config = config.get('analysis', {}).get('prompt', {}) or {}
+        # 结构信息编码: compact（紧凑表格）或 json（原始缩进JSON）
+        self.schema_format = prompt_config.get('schema_format', 'compact')
+        self.budgets = dict(DEFAULT_BUDGETS)
+        self.budgets.update(prompt_config.get('budgets', {}) or {})
+
+    def schema(self, structure_analysis):
+        """
+        编码结构分析结果
+
+        Args:
+            structure_analysis (dict): 数据结构分析结果
+
+        Returns:
+            str: 结构信息文本
+        """
+        if self.schema_format == 'json':
+            from .analysis_units.base_analysis_unit import NumpyEncoder
+
+            text = json.dumps(structure_analysis, ensure_ascii=False, indent=2, cls=NumpyEncoder)
+            return truncate_to_tokens(text, self.budgets.get("schema"))
+        return encode_schema(structure_analysis, self.budgets.get("schema"))
+
+    def fit(self, text, section):
+        """
+        将段落截断到对应的token预算内
+
+        Args:
+            text (str): 段落文本
+            section (str): 段落名称（data_context、execution_result、error_message等）
+
+        Returns:
+            str: 截断后的文本
+        """
+        if text is None:
+            return text
+        if not isinstance(text, str):
+            text = str(text)
+        fitted = truncate_to_tokens(text, self.budgets.get(section))
+        if fitted is not text:
+            logger.info(f"段落 {section} 超出token预算 {self.budgets.get(section)}，已截断")
+        return fitted
+
+    def context(self, data_context):
+        """
+        将前序分析单元的结果汇总到 data_context 预算内（预算按单元平均分配）
+
+        Args:
+            data_context (dict): 分析单元名称到结果文本的字典
+
+        Returns:
+            str: 汇总文本
+        """
+        if not data_context:
+            return ""
+        budget = self.budgets.get("data_context")
+        per_unit = budget // len(data_context) if budget else None
+        parts = [f"{name}: {truncate_to_tokens(str(value), per_unit)}" for name, value in data_context.items()]
+        return "\n".join(parts)
+
+    def log_prompt(self, stage, prompt):
+        """
+        记录提示词的token数
+
+        Args:
+            stage (str): 阶段名称
+            prompt (str): 提示词
+
+        Returns:
+            int: token数
+        """
+        tokens = estimate_tokens(prompt)
+        logger.info(f"提示词token数 [{stage}]: 约 {tokens}")
+        return tokens
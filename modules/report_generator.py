@@ -12,6 +12,8 @@ import time
 import glob
 from datetime import datetime
 
+from .stream_extractors import HtmlDocumentWatcher
+
 logger = logging.getLogger(__name__)
 
 class ReportGenerator:
@@ -84,15 +86,7 @@ class ReportGenerator:
             
             # 调用模型（使用流式API调用）
             logger.info("尝试调用API生成HTML报告（流式输出）...")
-            print("\n开始生成HTML报告...\n")
-            
-            response = ""
-            for chunk in self.model.call_model_stream(prompt):
-                if chunk:
-                    print(chunk, end='', flush=True)
-                    response += chunk
-            
-            print("\n\nHTML报告生成完成\n")
+            response = self.model.stream_text(prompt, label="生成HTML报告", task="report", stop=HtmlDocumentWatcher())
             
             if not response:
                 logger.error("生成HTML报告失败: 模型未返回有效响应")
@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+模型响应缓存模块 - 基于SQLite的持久化提示词/响应缓存
+
+同一数据集重新分析时，各分析单元的提示词与上次完全相同；测试脚本也会反复发送相同的报告提示词。
+缓存按 模型名称 + 规范化提示词哈希 + 采样参数 作为键保存模型响应，命中时不再调用API。
+支持过期时间（TTL）、按总大小的LRU淘汰、流式响应按原始片段回放，以及命中/未命中统计。
+缓存默认关闭（api.response_cache.enabled）；下游无法使用的响应（如提取不到代码、代码执行失败）会从缓存中删除
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    模型响应缓存类（线程安全）
+    """
+
+    def __init__(self, config):
+        """
+        初始化响应缓存
+
+        Args:
+            config (dict): 配置信息（读取 api.response_cache）
+        """
+        cache_config = config.get('api', {}).get('response_cache', {}) or {}
+        # 默认关闭：模型输出带有随机性，缓存会让重新分析回放同一个响应
+        self.enabled = cache_config.get('enabled', False)
+        self.path = cache_config.get('path', os.path.join('dataset_cache', 'model_responses.sqlite'))
+        # 过期时间（秒），小于等于0表示永不过期
+        self.ttl_seconds = cache_config.get('ttl_seconds', 7 * 24 * 3600)
+        # 缓存总大小上限（MB），超出后按最近访问时间淘汰
+        self.max_size_bytes = int(cache_config.get('max_size_mb', 200) * 1024 * 1024)
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        if self.enabled:
+            try:
+                self._connect()
+                logger.info(f"启用模型响应缓存: {self.path}")
+            except sqlite3.Error as e:
+                logger.warning(f"无法打开模型响应缓存，已禁用缓存: {str(e)}")
+                self.enabled = False
+
+    def _connect(self):
+        """
+        打开SQLite数据库并创建缓存表
+        """
+        cache_dir = os.path.dirname(self.path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        # WAL模式允许多个进程同时读取缓存
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model_id TEXT NOT NULL,
+                response TEXT NOT NULL,
+                chunks TEXT,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        self._conn.commit()
+
+    def build_key(self, model_id, prompt, params):
+        """
+        构建缓存键
+
+        Args:
+            model_id (str): 模型名称
+            prompt (str): 提示词
+            params (dict): 采样参数（temperature、top_p、max_tokens、json_mode等）
+
+        Returns:
+            str: 缓存键
+        """
+        key_source = {
+            "model": model_id,
+            "prompt": hashlib.sha256(self.normalize_prompt(prompt).encode('utf-8')).hexdigest(),
+            "params": params
+        }
+        encoded = json.dumps(key_source, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def normalize_prompt(prompt):
+        """
+        规范化提示词（统一换行符，去掉行尾和首尾空白），只有空白差异的提示词共用缓存
+
+        Args:
+            prompt (str): 提示词
+
+        Returns:
+            str: 规范化后的提示词
+        """
+        lines = prompt.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+        return '\n'.join(line.rstrip() for line in lines).strip()
+
+    def get(self, key):
+        """
+        查找缓存的响应
+
+        Args:
+            key (str): 缓存键
+
+        Returns:
+            dict: {"response": 完整响应, "chunks": 流式片段列表或None}，未命中则返回None
+        """
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT response, chunks, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and self.ttl_seconds > 0 and now - row[2] > self.ttl_seconds:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                    row = None
+                if row is None:
+                    self.misses += 1
+                    return None
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self.hits += 1
+        except sqlite3.Error as e:
+            logger.warning(f"读取模型响应缓存失败: {str(e)}")
+            return None
+
+        return {
+            "response": row[0],
+            "chunks": json.loads(row[1]) if row[1] is not None else None
+        }
+
+    def put(self, key, model_id, response, chunks=None):
+        """
+        保存模型响应，超出大小上限时淘汰最近最少访问的条目
+
+        Args:
+            key (str): 缓存键
+            model_id (str): 模型名称
+            response (str): 完整响应
+            chunks (list, optional): 流式响应的片段列表
+        """
+        if not self.enabled or response is None:
+            return
+
+        chunks_json = json.dumps(chunks, ensure_ascii=False) if chunks is not None else None
+        size = len(response.encode('utf-8')) + (len(chunks_json.encode('utf-8')) if chunks_json else 0)
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model_id, response, chunks, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, model_id, response, chunks_json, size, now, now)
+                )
+                self.stores += 1
+                self._evict(now)
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"写入模型响应缓存失败: {str(e)}")
+
+    def delete(self, key):
+        """
+        删除缓存的响应
+
+        Args:
+            key (str): 缓存键
+
+        Returns:
+            bool: 是否删除了条目
+        """
+        if not self.enabled:
+            return False
+
+        try:
+            with self._lock:
+                cursor = self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            logger.warning(f"删除模型响应缓存失败: {str(e)}")
+            return False
+
+    def _evict(self, now):
+        """
+        删除过期条目，并按最近访问时间淘汰条目直到总大小不超过上限（调用方持有锁）
+
+        Args:
+            now (float): 当前时间戳
+        """
+        if self.ttl_seconds > 0:
+            cursor = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            self.evictions += max(cursor.rowcount, 0)
+
+        total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total_size <= self.max_size_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC").fetchall()
+        # 刚写入的条目最后淘汰
+        for key, size in rows[:-1]:
+            if total_size <= self.max_size_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total_size -= size
+            self.evictions += 1
+
+    def snapshot(self):
+        """
+        获取缓存统计
+
+        Returns:
+            dict: 统计信息
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "stores": self.stores,
+            "evictions": self.evictions
+        }
+
+    def log_summary(self, prefix="模型响应缓存统计"):
+        """
+        将统计信息写入日志
+
+        Args:
+            prefix (str): 日志前缀
+        """
+        stats = self.snapshot()
+        if not self.enabled or not (stats["hits"] or stats["misses"]):
+            return
+        hit_rate = f"{stats['hit_rate'] * 100:.1f}%" if stats["hit_rate"] is not None else "-"
+        logger.info(
+            f"{prefix}: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次 (命中率 {hit_rate}), "
+            f"写入 {stats['stores']} 次, 淘汰 {stats['evictions']} 条"
+        )
+
+    def close(self):
+        """
+        关闭数据库连接
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        self.enabled = False
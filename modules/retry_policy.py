@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+重试与限流模块 - 模型API调用的重试策略和客户端限流
+
+- RetryPolicy: 区分可重试错误（429、5xx、连接错误、超时）和不可重试错误（其他4xx、无效请求），
+  可重试错误按全抖动指数退避等待，服务端返回 Retry-After 时按其等待，避免并发调用同时重试
+- RateLimiter: 令牌桶限流，同时限制每分钟请求数和每分钟token数
+两者都会统计重试次数、重试原因、限流次数和等待时间，并写入日志
+"""
+
+import time
+import random
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# 默认可重试的HTTP状态码
+DEFAULT_RETRYABLE_STATUS = (408, 409, 425, 429, 500, 502, 503, 504)
+
+
+class RetryPolicy:
+    """
+    重试策略类（线程安全）
+    """
+
+    def __init__(self, config, base_delay=2):
+        """
+        初始化重试策略
+
+        Args:
+            config (dict): 配置信息（读取 api.retry）
+            base_delay (float): 退避基础时间（秒），即 api.retry_delay
+        """
+        retry_config = config.get('api', {}).get('retry', {}) or {}
+        self.base_delay = base_delay
+        # 单次等待的上限（秒），Retry-After 不受此限制
+        self.max_delay = retry_config.get('max_delay', 60)
+        self.retryable_status = set(retry_config.get('retryable_status', DEFAULT_RETRYABLE_STATUS))
+
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.retry_wait_seconds = 0.0
+        self.retry_reasons = Counter()
+        self.fatal_errors = Counter()
+
+    def is_retryable_status(self, status_code):
+        """
+        判断HTTP状态码是否可重试
+
+        Args:
+            status_code (int): HTTP状态码
+
+        Returns:
+            bool: 是否可重试
+        """
+        return status_code in self.retryable_status
+
+    def is_retryable_exception(self, exception):
+        """
+        判断请求异常是否可重试（连接错误、超时、响应中断可重试，无效URL等请求错误不可重试）
+
+        Args:
+            exception (Exception): 请求异常
+
+        Returns:
+            bool: 是否可重试
+        """
+        retryable_types = (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+            requests.exceptions.ChunkedEncodingError
+        )
+        try:
+            import httpx
+
+            retryable_types += (httpx.TransportError,)
+        except ImportError:
+            pass
+        return isinstance(exception, retryable_types)
+
+    @staticmethod
+    def parse_retry_after(headers):
+        """
+        解析 Retry-After 响应头（秒数或HTTP日期）
+
+        Args:
+            headers (Mapping): 响应头
+
+        Returns:
+            float: 需要等待的秒数，没有或无法解析时返回None
+        """
+        value = headers.get('Retry-After') if headers else None
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+            if retry_at.tzinfo is None:
+                retry_at = retry_at.replace(tzinfo=timezone.utc)
+            return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    def compute_delay(self, attempt, retry_after=None):
+        """
+        计算重试前的等待时间
+
+        没有 Retry-After 时使用全抖动指数退避: uniform(0, min(max_delay, base_delay * 2^attempt))；
+        有 Retry-After 时等待其指定的时间，再加上最多一个基础时间的随机抖动，避免并发调用同时重试
+
+        Args:
+            attempt (int): 已失败的次数（从0开始）
+            retry_after (float, optional): 服务端要求的等待秒数
+
+        Returns:
+            float: 等待秒数
+        """
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def record_retry(self, reason, delay):
+        """
+        记录一次重试
+
+        Args:
+            reason (str): 重试原因（如 "HTTP 429"、"ReadTimeout"）
+            delay (float): 等待秒数
+        """
+        with self._lock:
+            self.retries += 1
+            self.retry_wait_seconds += delay
+            self.retry_reasons[reason] += 1
+
+    def record_fatal(self, reason):
+        """
+        记录一次不可重试的错误
+
+        Args:
+            reason (str): 错误原因
+        """
+        with self._lock:
+            self.fatal_errors[reason] += 1
+
+    def snapshot(self):
+        """
+        获取重试统计
+
+        Returns:
+            dict: 统计信息
+        """
+        with self._lock:
+            return {
+                "retries": self.retries,
+                "retry_wait_seconds": round(self.retry_wait_seconds, 2),
+                "retry_reasons": dict(self.retry_reasons),
+                "fatal_errors": dict(self.fatal_errors)
+            }
+
+    def log_summary(self, prefix="重试统计"):
+        """
+        将统计信息写入日志
+
+        Args:
+            prefix (str): 日志前缀
+        """
+        stats = self.snapshot()
+        if not stats["retries"] and not stats["fatal_errors"]:
+            return
+        logger.info(
+            f"{prefix}: 重试 {stats['retries']} 次, 等待 {stats['retry_wait_seconds']}秒, "
+            f"重试原因 {stats['retry_reasons']}, 不可重试错误 {stats['fatal_errors']}"
+        )
+
+
+class _TokenBucket:
+    """
+    令牌桶（每分钟补充capacity个令牌，允许预支，预支的部分由后续调用等待偿还）
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount, now):
+        """
+        预约令牌
+
+        Args:
+            amount (float): 令牌数量
+            now (float): 当前时间（time.monotonic）
+
+        Returns:
+            float: 需要等待的秒数
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # 单次请求超过桶容量时按桶容量计算，避免永远无法发送
+        self.tokens -= min(amount, self.capacity)
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class RateLimiter:
+    """
+    客户端限流器类（线程安全），按每分钟请求数和每分钟token数限流
+    """
+
+    def __init__(self, config):
+        """
+        初始化限流器
+
+        Args:
+            config (dict): 配置信息（读取 api.rate_limit，值为0或不设置表示不限制）
+        """
+        rate_config = config.get('api', {}).get('rate_limit', {}) or {}
+        requests_per_minute = rate_config.get('requests_per_minute', 0) or 0
+        tokens_per_minute = rate_config.get('tokens_per_minute', 0) or 0
+        self._requests = _TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = _TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.enabled = bool(self._requests or self._tokens)
+
+        self._lock = threading.Lock()
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+
+        if self.enabled:
+            logger.info(f"启用客户端限流: 每分钟请求数={requests_per_minute or '不限'}, 每分钟token数={tokens_per_minute or '不限'}")
+
+    def reserve(self, tokens=0):
+        """
+        为一次请求预约额度（不阻塞）
+
+        Args:
+            tokens (int): 请求预计消耗的token数
+
+        Returns:
+            float: 发送请求前需要等待的秒数
+        """
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            if self._requests:
+                wait = max(wait, self._requests.reserve(1, now))
+            if self._tokens and tokens:
+                wait = max(wait, self._tokens.reserve(tokens, now))
+            if wait > 0:
+                self.throttled += 1
+                self.throttled_seconds += wait
+        if wait > 0:
+            logger.info(f"触发客户端限流，等待 {wait:.2f}秒")
+        return wait
+
+    def acquire(self, tokens=0):
+        """
+        为一次请求预约额度，需要时阻塞等待
+
+        Args:
+            tokens (int): 请求预计消耗的token数
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    def record_usage(self, tokens):
+        """
+        记录请求完成后额外消耗的token数（如模型输出的token），从令牌桶中扣除
+
+        Args:
+            tokens (int): token数
+        """
+        if not self._tokens or not tokens:
+            return
+        with self._lock:
+            self._tokens.reserve(tokens, time.monotonic())
+
+    def snapshot(self):
+        """
+        获取限流统计
+
+        Returns:
+            dict: 统计信息
+        """
+        with self._lock:
+            return {
+                "throttled": self.throttled,
+                "throttled_seconds": round(self.throttled_seconds, 2)
+            }
+
+    def log_summary(self, prefix="限流统计"):
+        """
+        将统计信息写入日志
+
+        Args:
+            prefix (str): 日志前缀
+        """
+        stats = self.snapshot()
+        if not stats["throttled"]:
+            return
+        logger.info(f"{prefix}: 限流 {stats['throttled']} 次, 共等待 {stats['throttled_seconds']}秒")
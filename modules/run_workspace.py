@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+运行工作区模块 - 为每次分析会话分配唯一的运行ID和独立的工作目录
+
+生成的分析代码按提示词把结果写到相对路径（如 "pngs/analysis_results.txt"），
+临时脚本和分析结论原来也写到全局的 temp_py、temp_txts 目录，文件名只精确到秒。
+同一台机器上同时运行多个分析时会互相覆盖结果。每个会话使用独立的工作目录：
+- 运行ID: 时间戳 + 随机后缀，同一秒内启动的会话也不会冲突
+- 工作目录即分析会话目录，包含 pngs、temp_py、temp_txts、reports 子目录
+- 沙箱以工作目录作为当前目录执行代码，相对路径都落在本会话内，
+  并通过环境变量 DATA_ANALYSIS_RUN_ID、DATA_ANALYSIS_WORKSPACE 传入运行ID和工作目录
+"""
+
+import os
+import uuid
+from datetime import datetime
+
+from .session_checkpoint import SessionCheckpoint
+
+# 工作目录下的子目录
+WORKSPACE_SUBDIRS = ("pngs", "temp_py", "temp_txts", "reports")
+
+
+def new_run_id():
+    """
+    生成运行ID
+
+    Returns:
+        str: 运行ID（如 20250101_120000_1a2b3c4d），按字符串排序即按启动时间排序
+    """
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+class RunWorkspace:
+    """
+    分析会话的独立工作目录
+    """
+
+    def __init__(self, root, run_id=None, use_cache=True):
+        """
+        初始化工作目录（不存在时创建）
+
+        Args:
+            root (str): 工作目录路径
+            run_id (str, optional): 运行ID，默认生成新的运行ID
+            use_cache (bool): 本次会话调用模型时是否读取响应缓存（强制重新分析时为False）
+        """
+        self.run_id = run_id or new_run_id()
+        self.root = os.path.abspath(root)
+        self.use_cache = use_cache
+        for subdir in WORKSPACE_SUBDIRS:
+            os.makedirs(os.path.join(self.root, subdir), exist_ok=True)
+        # 检查点清单（记录已完成的阶段，恢复会话时跳过）
+        self.checkpoint = SessionCheckpoint(self.root)
+
+    def path(self, *parts):
+        """
+        获取工作目录下的路径
+
+        Args:
+            *parts (str): 相对路径的各部分
+
+        Returns:
+            str: 绝对路径
+        """
+        return os.path.join(self.root, *parts)
+
+    def env(self):
+        """
+        获取沙箱进程的环境变量
+
+        Returns:
+            dict: 当前进程的环境变量加上运行ID和工作目录
+        """
+        env = os.environ.copy()
+        env["DATA_ANALYSIS_RUN_ID"] = self.run_id
+        env["DATA_ANALYSIS_WORKSPACE"] = self.root
+        return env
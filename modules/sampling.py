@@ -0,0 +1,445 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据抽样模块 - 为面向大模型的阶段（结构分析、提示词、快速分析）生成有代表性的样本
+
+- ReservoirSampler: 一遍扫描的蓄水池抽样，每行被选中的概率相同，内存只与样本大小有关
+- StratifiedSampler: 按指定列（如base_station_id、server_id）分层，每层按随机优先级保留有限的行，
+  扫描结束后按各层行数成比例分配样本量
+- HeadSampler: 取前N行（原有行为，按时间排序的数据只能覆盖开头一小段时间）
+
+所有抽样器都按块更新（update），可以与分块/流式读取配合使用；
+结果按原始行顺序排列，时间序列数据抽样后仍然有序
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 支持的抽样方法
+SAMPLING_METHODS = ('reservoir', 'stratified', 'head')
+
+
+def _restore_categories(df, dtypes):
+    """
+    恢复分类列的类型（不同块的分类列拼接后可能退化为object）
+
+    Args:
+        df (pandas.DataFrame): 数据框
+        dtypes (pandas.Series): 原始列类型
+
+    Returns:
+        pandas.DataFrame: 恢复类型后的数据框
+    """
+    for col, dtype in dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype) and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+
+class ReservoirSampler:
+    """
+    蓄水池抽样器（Algorithm R的向量化实现）
+
+    第i行（从0开始）以 size / (i + 1) 的概率替换蓄水池中随机的一行；
+    同一块内多行命中同一位置时以最后一行为准，与逐行执行的结果一致
+    """
+
+    def __init__(self, size, seed=None):
+        """
+        初始化蓄水池抽样器
+
+        Args:
+            size (int): 样本大小
+            seed (int or numpy.random.Generator, optional): 随机种子
+        """
+        self.size = size
+        self.seen = 0
+        self._rng = np.random.default_rng(seed)
+        # 每个蓄水池位置当前保存的原始行号
+        self._owners = np.empty(0, dtype=np.int64)
+        self._sample = None
+        self._dtypes = None
+
+    def update(self, chunk, positions=None):
+        """
+        用一块数据更新样本
+
+        Args:
+            chunk (pandas.DataFrame): 数据块
+            positions (array-like, optional): 各行的原始行号，默认按读取顺序连续编号
+        """
+        n = len(chunk)
+        if positions is None:
+            positions = np.arange(self.seen, self.seen + n, dtype=np.int64)
+        else:
+            positions = np.asarray(positions, dtype=np.int64)
+        if self._dtypes is None:
+            self._dtypes = chunk.dtypes
+        if n == 0 or self.size <= 0:
+            self.seen += n
+            return
+
+        chunk = chunk.set_axis(positions)
+        new_parts = []
+        evicted = np.empty(0, dtype=np.int64)
+
+        # 蓄水池未满时直接放入
+        fill = min(n, max(self.size - self.seen, 0))
+        if fill:
+            new_parts.append(chunk.iloc[:fill])
+            self._owners = np.concatenate([self._owners, positions[:fill]])
+
+        if fill < n:
+            # 第i行（全局序号）在[0, i]中均匀抽取位置，落在蓄水池范围内则替换
+            seen_index = np.arange(self.seen + fill, self.seen + n, dtype=np.int64)
+            slots = self._rng.integers(0, seen_index + 1)
+            rows = np.nonzero(slots < self.size)[0]
+            slots = slots[rows]
+            if rows.size:
+                # 同一位置被多次命中时只保留最后一次
+                _, last = np.unique(slots[::-1], return_index=True)
+                keep = np.sort(slots.size - 1 - last)
+                rows, slots = rows[keep] + fill, slots[keep]
+                evicted = self._owners[slots]
+                self._owners[slots] = positions[rows]
+                new_parts.append(chunk.iloc[rows])
+
+        if new_parts:
+            # 被替换的行可能来自之前的块，也可能来自本块刚放入蓄水池的部分
+            parts = [self._sample] if self._sample is not None else []
+            sample = pd.concat(parts + new_parts)
+            self._sample = sample.drop(index=evicted) if evicted.size else sample
+
+        self.seen += n
+
+    def result(self):
+        """
+        获取样本
+
+        Returns:
+            pandas.DataFrame: 按原始行顺序排列的样本，索引为原始行号
+        """
+        if self._sample is None:
+            return pd.DataFrame(columns=self._dtypes.index if self._dtypes is not None else None)
+        return _restore_categories(self._sample.sort_index(), self._dtypes)
+
+
+class StratifiedSampler:
+    """
+    分层抽样器
+
+    每行分配一个随机优先级，每层保留优先级最小的若干行（优先级最小的k行是该层的均匀样本）。
+    每层最多保留 ceil(size * 该层行数 / 总行数) 行，每块更新后按新的行数重新计算并裁剪，
+    保留的总行数不超过样本大小与分层数量之和，与数据总行数无关。
+    扫描结束后按各层行数成比例分配样本量（最大余数法），样本量足够时每层至少保留一行；
+    某层保留的行不足分配的样本量时，差额转给仍有剩余行的层
+    """
+
+    def __init__(self, size, key, seed=None):
+        """
+        初始化分层抽样器
+
+        Args:
+            size (int): 样本大小
+            key (str): 分层列名
+            seed (int, optional): 随机种子
+        """
+        self.size = size
+        self.key = key
+        self.seen = 0
+        self._rng = np.random.default_rng(seed)
+        # 层到编号的映射（按首次出现的顺序）及各层的行数
+        self._codes = {}
+        self._counts = np.empty(0, dtype=np.int64)
+        # 保留的行，以及与之一一对应的层编号和随机优先级
+        self._sample = None
+        self._row_codes = np.empty(0, dtype=np.int64)
+        self._priorities = np.empty(0, dtype=np.float64)
+        self._dtypes = None
+
+    def update(self, chunk):
+        """
+        用一块数据更新各层样本
+
+        Args:
+            chunk (pandas.DataFrame): 数据块
+        """
+        if self._dtypes is None:
+            self._dtypes = chunk.dtypes
+        n = len(chunk)
+        if n == 0 or self.size <= 0:
+            self.seen += n
+            return
+
+        values, uniques = pd.factorize(chunk[self.key], use_na_sentinel=False)
+        # 缺失值作为单独的一层（NaN之间不相等，统一用None作为键）
+        unique_codes = np.array([
+            self._codes.setdefault(None if pd.isna(stratum) else stratum, len(self._codes))
+            for stratum in uniques
+        ], dtype=np.int64)
+        codes = unique_codes[values]
+        counts = np.zeros(len(self._codes), dtype=np.int64)
+        counts[:self._counts.size] = self._counts
+        self._counts = counts + np.bincount(codes, minlength=len(self._codes))
+        self.seen += n
+
+        # 按更新后的行数重新计算各层容量，之前的层也按新容量裁剪
+        capacity = -(-self.size * self._counts // self.seen)
+        row_codes = np.concatenate([self._row_codes, codes])
+        priorities = np.concatenate([self._priorities, self._rng.random(n)])
+        keep = self._lowest_priorities(row_codes, priorities, capacity)
+
+        retained = self._row_codes.size
+        chunk = chunk.set_axis(np.arange(self.seen - n, self.seen, dtype=np.int64))
+        parts = [self._sample.iloc[keep[keep < retained]]] if self._sample is not None else []
+        self._sample = pd.concat(parts + [chunk.iloc[keep[keep >= retained] - retained]])
+        self._row_codes = row_codes[keep]
+        self._priorities = priorities[keep]
+
+    def _lowest_priorities(self, codes, priorities, limits):
+        """
+        找出每层优先级最小的若干行
+
+        Args:
+            codes (numpy.ndarray): 各行的层编号
+            priorities (numpy.ndarray): 各行的随机优先级
+            limits (numpy.ndarray): 各层最多保留的行数（按层编号索引）
+
+        Returns:
+            numpy.ndarray: 保留的行的位置（升序）
+        """
+        order = np.lexsort((priorities, codes))
+        sorted_codes = codes[order]
+        # 排序后每行在本层中的名次
+        ranks = np.arange(order.size) - np.searchsorted(sorted_codes, sorted_codes)
+        return np.sort(order[ranks < limits[sorted_codes]])
+
+    def allocate(self):
+        """
+        按各层行数成比例分配样本量
+
+        Returns:
+            dict: 层到样本量的字典
+        """
+        strata = list(self._codes)
+        counts = self._counts
+        available = np.bincount(self._row_codes, minlength=len(strata))
+        total = int(counts.sum())
+        if total <= self.size:
+            return {stratum: int(size) for stratum, size in zip(strata, available)}
+
+        sizes = counts.astype(np.float64)
+        quotas = sizes * self.size / total
+        allocation = np.floor(quotas).astype(np.int64)
+
+        # 样本量足够时每层至少一行
+        if len(strata) <= self.size:
+            allocation = np.maximum(allocation, 1)
+        else:
+            logger.warning(f"分层数量({len(strata)})超过样本大小({self.size})，部分小层可能不出现在样本中")
+
+        # 最大余数法分配剩余名额（或从最大的层中扣除多分配的名额）
+        remainder = self.size - int(allocation.sum())
+        if remainder > 0:
+            order = np.argsort(-(quotas - np.floor(quotas)), kind='stable')
+            allocation[order[:remainder]] += 1
+        elif remainder < 0:
+            for index in np.argsort(-allocation, kind='stable'):
+                take = min(-remainder, int(allocation[index]) - 1)
+                allocation[index] -= take
+                remainder += take
+                if remainder == 0:
+                    break
+
+        # 保留的行不足分配量的层（之前行数占比较小时被裁剪），差额按行数比例转给仍有剩余行的层
+        allocation = np.minimum(allocation, available)
+        shortfall = self.size - int(allocation.sum())
+        while shortfall > 0:
+            spare = available - allocation
+            eligible = spare > 0
+            if not eligible.any():
+                break
+            quotas = np.where(eligible, sizes, 0) * shortfall / sizes[eligible].sum()
+            extra = np.minimum(np.floor(quotas).astype(np.int64), spare)
+            order = np.argsort(-(quotas - np.floor(quotas)), kind='stable')
+            order = order[(spare - extra)[order] > 0][:shortfall - int(extra.sum())]
+            extra[order] += 1
+            allocation += extra
+            shortfall -= int(extra.sum())
+
+        return {stratum: int(size) for stratum, size in zip(strata, allocation)}
+
+    def result(self):
+        """
+        获取样本
+
+        Returns:
+            pandas.DataFrame: 按原始行顺序排列的样本，索引为原始行号
+        """
+        if self._sample is None:
+            return pd.DataFrame(columns=self._dtypes.index if self._dtypes is not None else None)
+
+        # 各层保留的行中优先级最小的k行仍是该层的均匀样本
+        allocation = self.allocate()
+        limits = np.array([allocation[stratum] for stratum in self._codes], dtype=np.int64)
+        keep = self._lowest_priorities(self._row_codes, self._priorities, limits)
+        return _restore_categories(self._sample.iloc[keep].sort_index(), self._dtypes)
+
+
+class HeadSampler:
+    """
+    取前N行的抽样器（原有行为）
+    """
+
+    def __init__(self, size):
+        """
+        初始化抽样器
+
+        Args:
+            size (int): 样本大小
+        """
+        self.size = size
+        self.seen = 0
+        self._parts = []
+        self._dtypes = None
+
+    def update(self, chunk):
+        """
+        用一块数据更新样本
+
+        Args:
+            chunk (pandas.DataFrame): 数据块
+        """
+        if self._dtypes is None:
+            self._dtypes = chunk.dtypes
+        taken = sum(len(part) for part in self._parts)
+        if taken < self.size:
+            part = chunk.iloc[:self.size - taken]
+            self._parts.append(part.set_axis(np.arange(self.seen, self.seen + len(part))))
+        self.seen += len(chunk)
+
+    def result(self):
+        """
+        获取样本
+
+        Returns:
+            pandas.DataFrame: 前N行，索引为原始行号
+        """
+        if not self._parts:
+            return pd.DataFrame(columns=self._dtypes.index if self._dtypes is not None else None)
+        return _restore_categories(pd.concat(self._parts), self._dtypes)
+
+
+class DataSampler:
+    """
+    数据抽样器类，按配置选择抽样方法
+    """
+
+    def __init__(self, config=None):
+        """
+        初始化数据抽样器
+
+        Args:
+            config (dict, optional): 配置信息
+        """
+        self.config = config or {}
+        analysis_config = self.config.get('analysis', {})
+        sampling_config = analysis_config.get('sampling', {}) or {}
+        # 分析的最大行数，-1表示分析全部数据
+        self.max_rows = analysis_config.get('max_rows', -1)
+        self.method = sampling_config.get('method', 'reservoir')
+        self.stratify_by = sampling_config.get('stratify_by')
+        self.seed = sampling_config.get('seed', 42)
+        # 提示词中样本数据的行数
+        self.prompt_rows = sampling_config.get('prompt_rows', 50)
+
+        if self.method not in SAMPLING_METHODS:
+            logger.warning(f"不支持的抽样方法: {self.method}，将使用蓄水池抽样")
+            self.method = 'reservoir'
+
+    def should_limit(self, row_count):
+        """
+        判断数据是否超过最大分析行数
+
+        Args:
+            row_count (int): 数据总行数
+
+        Returns:
+            bool: 是否需要抽样
+        """
+        return self.max_rows is not None and 0 < self.max_rows < row_count
+
+    def create_sampler(self, size, columns=None):
+        """
+        创建抽样器
+
+        Args:
+            size (int): 样本大小
+            columns (list, optional): 数据列名，用于检查分层列是否存在
+
+        Returns:
+            抽样器对象（ReservoirSampler、StratifiedSampler或HeadSampler）
+        """
+        if self.method == 'head':
+            return HeadSampler(size)
+        if self.method == 'stratified':
+            if self.stratify_by and (columns is None or self.stratify_by in columns):
+                return StratifiedSampler(size, self.stratify_by, seed=self.seed)
+            logger.warning(f"分层列不存在或未配置: {self.stratify_by}，改用蓄水池抽样")
+        return ReservoirSampler(size, seed=self.seed)
+
+    def sample(self, chunks, size):
+        """
+        一遍扫描分块数据并抽取样本
+
+        Args:
+            chunks (iterable): 数据框块的迭代器
+            size (int): 样本大小
+
+        Returns:
+            tuple: (样本数据框（按原始行顺序，索引重置）, 抽样信息字典)
+        """
+        sampler = None
+        for chunk in chunks:
+            if sampler is None:
+                sampler = self.create_sampler(size, list(chunk.columns))
+            sampler.update(chunk)
+            # 取前N行时读够即可停止
+            if isinstance(sampler, HeadSampler) and sampler.seen >= size:
+                break
+
+        if sampler is None:
+            return pd.DataFrame(), self.describe('head', 0, 0)
+
+        sample_df = sampler.result().reset_index(drop=True)
+        method = {ReservoirSampler: 'reservoir', StratifiedSampler: 'stratified', HeadSampler: 'head'}[type(sampler)]
+        info = self.describe(method, sampler.seen, len(sample_df))
+        logger.info(f"抽样完成: 方法={method}, {info['total_rows']} 行中抽取 {info['sample_rows']} 行")
+        return sample_df, info
+
+    def describe(self, method, total_rows, sample_rows):
+        """
+        构建抽样信息
+
+        Args:
+            method (str): 实际使用的抽样方法
+            total_rows (int): 扫描的总行数（取前N行时为已读取的行数）
+            sample_rows (int): 样本行数
+
+        Returns:
+            dict: 抽样信息
+        """
+        info = {
+            "method": method,
+            "total_rows": int(total_rows),
+            "sample_rows": int(sample_rows),
+            "seed": self.seed
+        }
+        if method == 'stratified':
+            info["stratify_by"] = self.stratify_by
+        return info
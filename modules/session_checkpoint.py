@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+会话检查点模块 - 在分析会话目录中记录已完成的阶段，中断或失败后可以从第一个未完成的阶段继续
+
+检查点清单（checkpoint.json）记录：
+- 会话信息：运行ID、源文件、数据集路径、工作表
+- 分析单元的各个阶段：code（生成的代码）、result（执行结果）、report（单元报告）、html（单元HTML报告）
+- 会话的报告阶段：markdown_report、html_report、comprehensive_report
+
+每个阶段记录其产物文件（相对会话目录的路径），产物文件丢失的阶段视为未完成。
+清单每次更新都重新读取并原子替换，同一会话目录可以被多个线程和对象同时更新
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# 检查点清单文件名
+CHECKPOINT_FILE = "checkpoint.json"
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(path):
+    """
+    获取清单文件对应的锁（同一进程内同一清单文件共用一把锁）
+
+    Args:
+        path (str): 清单文件路径
+
+    Returns:
+        threading.Lock: 锁
+    """
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+class SessionCheckpoint:
+    """
+    分析会话检查点清单
+    """
+
+    def __init__(self, session_dir):
+        """
+        初始化检查点清单（清单文件在第一次更新时创建）
+
+        Args:
+            session_dir (str): 分析会话目录
+        """
+        self.session_dir = os.path.abspath(session_dir)
+        self.path = os.path.join(self.session_dir, CHECKPOINT_FILE)
+        self._lock = _lock_for(self.path)
+
+    @staticmethod
+    def exists(session_dir):
+        """
+        判断会话目录中是否有检查点清单
+
+        Args:
+            session_dir (str): 分析会话目录
+
+        Returns:
+            bool: 是否存在
+        """
+        return os.path.exists(os.path.join(session_dir, CHECKPOINT_FILE))
+
+    def _read(self):
+        """
+        读取清单（调用方持有锁）
+
+        Returns:
+            dict: 清单内容，文件不存在或无法解析时返回空清单
+        """
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.warning(f"读取检查点清单失败，将重新记录: {str(e)}")
+        return {"session": {}, "units": {}, "stages": {}}
+
+    def _write(self, manifest):
+        """
+        原子写入清单（调用方持有锁）
+
+        Args:
+            manifest (dict): 清单内容
+        """
+        manifest["updated_at"] = datetime.now().isoformat(timespec='seconds')
+        os.makedirs(self.session_dir, exist_ok=True)
+        temp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+    def load(self):
+        """
+        读取完整清单
+
+        Returns:
+            dict: 清单内容
+        """
+        with self._lock:
+            return self._read()
+
+    def session(self):
+        """
+        读取会话信息
+
+        Returns:
+            dict: 会话信息（运行ID、源文件等）
+        """
+        return self.load().get("session", {})
+
+    def update_session(self, **fields):
+        """
+        更新会话信息
+
+        Args:
+            **fields: 会话信息字段
+        """
+        with self._lock:
+            manifest = self._read()
+            manifest.setdefault("session", {}).update(fields)
+            self._write(manifest)
+
+    def _stages(self, manifest, unit=None):
+        """
+        获取会话或分析单元的阶段记录（调用方持有锁）
+
+        Args:
+            manifest (dict): 清单内容
+            unit (str, optional): 分析单元名称，None表示会话的报告阶段
+
+        Returns:
+            dict: 阶段名称到阶段记录的字典
+        """
+        if unit is None:
+            return manifest.setdefault("stages", {})
+        return manifest.setdefault("units", {}).setdefault(unit, {})
+
+    def completed(self, stage, unit=None, **expected):
+        """
+        获取已完成阶段的记录
+
+        Args:
+            stage (str): 阶段名称
+            unit (str, optional): 分析单元名称，None表示会话的报告阶段
+            **expected: 阶段记录中必须一致的信息（如报告包含的分析单元），不一致时视为未完成
+
+        Returns:
+            dict: 阶段记录（files 为相对会话目录的产物文件路径），未完成或产物文件丢失时返回None
+        """
+        with self._lock:
+            record = self._stages(self._read(), unit).get(stage)
+        if not record or record.get("status") != "done":
+            return None
+        for key, value in expected.items():
+            if record.get(key) != value:
+                logger.info(f"检查点阶段 {unit + '/' if unit else ''}{stage} 的输入已变化，将重新执行")
+                return None
+        for relative_path in (record.get("files") or {}).values():
+            if relative_path and not os.path.exists(self.resolve(relative_path)):
+                logger.info(f"检查点阶段 {unit + '/' if unit else ''}{stage} 的产物文件已丢失，将重新执行: {relative_path}")
+                return None
+        return record
+
+    def complete(self, stage, unit=None, files=None, **data):
+        """
+        记录阶段已完成
+
+        Args:
+            stage (str): 阶段名称
+            unit (str, optional): 分析单元名称，None表示会话的报告阶段
+            files (dict, optional): 产物文件（名称到路径，路径会转换为相对会话目录的路径）
+            **data: 阶段的其他信息
+        """
+        record = dict(data)
+        record["status"] = "done"
+        record["completed_at"] = datetime.now().isoformat(timespec='seconds')
+        record["files"] = {name: self.relative(path) for name, path in (files or {}).items() if path}
+        with self._lock:
+            manifest = self._read()
+            self._stages(manifest, unit)[stage] = record
+            self._write(manifest)
+
+    def relative(self, path):
+        """
+        将路径转换为相对会话目录的路径（会话目录外的文件保留绝对路径）
+
+        Args:
+            path (str): 文件路径
+
+        Returns:
+            str: 相对路径或绝对路径
+        """
+        absolute = os.path.abspath(path)
+        if absolute.startswith(self.session_dir + os.sep):
+            return os.path.relpath(absolute, self.session_dir)
+        return absolute
+
+    def resolve(self, relative_path):
+        """
+        将清单中记录的路径转换为绝对路径
+
+        Args:
+            relative_path (str): 清单中的路径
+
+        Returns:
+            str: 绝对路径
+        """
+        return os.path.join(self.session_dir, relative_path)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+会话索引模块 - 按源文件内容指纹索引历史分析会话
+
+同一文件（内容不变）在启用的分析单元、模型和数据选项都相同时，
+直接复用之前会话的分析结果和报告，无需再次调用大模型和执行分析代码
+"""
+
+import os
+import json
+import uuid
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class SessionIndex:
+    """
+    会话索引类，维护 复用键 -> 分析会话 的索引文件
+    """
+
+    def __init__(self, config):
+        """
+        初始化会话索引
+
+        Args:
+            config (dict): 配置信息
+        """
+        self.config = config
+        reuse_config = config.get('analysis', {}).get('session_reuse', {}) or {}
+        self.enabled = reuse_config.get('enabled', True)
+        self.index_file = reuse_config.get(
+            'index_file', os.path.join('analysis_results', 'session_index.json')
+        )
+        # 批量分析时多个线程同时记录会话，读取-修改-写入需要加锁
+        self._lock = threading.Lock()
+
+    def build_key(self, fingerprint, unit_names, model_id):
+        """
+        构建会话复用键
+
+        除文件指纹、分析单元和模型外，影响分析数据的选项（工作表、输入读取配置、抽样、画像模式）也计入复用键
+
+        Args:
+            fingerprint (str): 源文件内容指纹
+            unit_names (list): 启用的分析单元名称列表
+            model_id (str): 模型名称
+
+        Returns:
+            str: 复用键
+        """
+        analysis_config = self.config.get('analysis', {})
+        key_source = {
+            "fingerprint": fingerprint,
+            "units": list(unit_names),
+            "model": model_id,
+            "sheets": analysis_config.get('sheets', 'first'),
+            "input": analysis_config.get('input', {}) or {},
+            "max_rows": analysis_config.get('max_rows', -1),
+            "sampling": analysis_config.get('sampling', {}),
+            "profiling_mode": (analysis_config.get('profiling', {}) or {}).get('mode', 'exact')
+        }
+        encoded = json.dumps(key_source, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def lookup(self, key):
+        """
+        查找可复用的历史会话（会话目录和报告文件都必须仍然存在）
+
+        Args:
+            key (str): 复用键
+
+        Returns:
+            dict: 会话记录，如果没有可复用的会话则返回None
+        """
+        if not self.enabled:
+            return None
+
+        entry = self._load_index().get(key)
+        if not entry:
+            return None
+
+        required_paths = [entry.get("session_dir"), entry.get("markdown_file")]
+        if not all(path and os.path.exists(path) for path in required_paths):
+            logger.info("历史会话的结果文件已被删除，无法复用")
+            return None
+
+        return entry
+
+    def record(self, key, entry):
+        """
+        记录一次成功的分析会话
+
+        Args:
+            key (str): 复用键
+            entry (dict): 会话记录（session_dir、markdown_file、html_file等）
+        """
+        if not self.enabled:
+            return
+
+        try:
+            with self._lock:
+                index = self._load_index()
+                index[key] = dict(entry, created_at=datetime.now().isoformat())
+                self._write_index(index)
+            logger.info(f"已将分析会话记录到索引: {entry.get('session_dir')}")
+        except Exception as e:
+            logger.warning(f"写入会话索引失败: {str(e)}")
+
+    def _load_index(self):
+        """
+        读取索引文件
+
+        Returns:
+            dict: 复用键到会话记录的字典
+        """
+        if not os.path.exists(self.index_file):
+            return {}
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"读取会话索引失败: {str(e)}")
+            return {}
+
+    def _write_index(self, index):
+        """
+        写入索引文件（先写临时文件再原子替换）
+
+        Args:
+            index (dict): 复用键到会话记录的字典
+        """
+        index_dir = os.path.dirname(self.index_file)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        temp_path = f"{self.index_file}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.index_file)
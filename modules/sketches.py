@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据草图模块 - 提供可合并的近似统计结构，用于超大表的近似画像
+
+- HyperLogLog: 近似唯一值数量
+- KLLSketch: 近似分位数（中位数等）
+- MisraGries: 近似高频值（最常见值）
+
+所有草图都支持按块更新（update）和跨块合并（merge），
+因此可以与分块/流式读取配合使用，内存占用与数据总量无关
+"""
+
+import math
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def hash_values(series):
+    """
+    将一列值向量化地哈希为64位无符号整数（缺失值需在调用前去除）
+
+    Args:
+        series (pandas.Series): 数据列
+
+    Returns:
+        numpy.ndarray: uint64哈希值数组
+    """
+    return pd.util.hash_pandas_object(series, index=False).to_numpy(dtype=np.uint64)
+
+
+class HyperLogLog:
+    """
+    HyperLogLog唯一值计数草图
+
+    使用2^precision个寄存器，相对标准误差约为 1.04 / sqrt(2^precision)
+    """
+
+    def __init__(self, precision=14):
+        """
+        初始化HyperLogLog
+
+        Args:
+            precision (int): 寄存器数量的以2为底的对数（4-18）
+        """
+        if not 4 <= precision <= 18:
+            raise ValueError(f"HyperLogLog精度必须在4到18之间: {precision}")
+        self.precision = precision
+        self.register_count = 1 << precision
+        self.registers = np.zeros(self.register_count, dtype=np.uint8)
+
+    def update(self, series):
+        """
+        用一块数据更新草图
+
+        Args:
+            series (pandas.Series): 数据列（缺失值会被忽略）
+        """
+        series = series.dropna()
+        if series.empty:
+            return
+        hashes = hash_values(series)
+        rest_bits = 64 - self.precision
+        index = (hashes >> np.uint64(rest_bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        # 剩余位中前导零的个数 + 1；rest不超过50位，转换为float64时是精确的
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rank = (rest_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        """
+        合并另一个草图（精度必须相同）
+
+        Args:
+            other (HyperLogLog): 另一个草图
+
+        Returns:
+            HyperLogLog: 自身
+        """
+        if other.precision != self.precision:
+            raise ValueError("只能合并精度相同的HyperLogLog")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        """
+        估计唯一值数量
+
+        Returns:
+            int: 唯一值数量估计
+        """
+        m = self.register_count
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # 小基数时使用线性计数修正
+        if raw <= 2.5 * m and zeros > 0:
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+    def relative_error(self):
+        """
+        相对标准误差
+
+        Returns:
+            float: 相对标准误差
+        """
+        return 1.04 / math.sqrt(self.register_count)
+
+
+class KLLSketch:
+    """
+    KLL分位数草图
+
+    第h层中的每个元素代表2^h个原始值，各层容量按2/3的比例递减；
+    归一化秩误差约为 2.296 / k^0.9723（与Apache DataSketches一致）
+    """
+
+    def __init__(self, k=200, seed=None):
+        """
+        初始化KLL草图
+
+        Args:
+            k (int): 精度参数，越大越精确
+            seed (int, optional): 压缩时随机偏移的种子
+        """
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(math.ceil(self.k * (2.0 / 3.0) ** depth)), 2)
+
+    def update(self, values):
+        """
+        用一块数值更新草图
+
+        Args:
+            values (array-like): 数值（NaN会被忽略）
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.n += int(values.size)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        """
+        合并另一个草图
+
+        Args:
+            other (KLLSketch): 另一个草图
+
+        Returns:
+            KLLSketch: 自身
+        """
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0, dtype=np.float64))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _compress(self):
+        # 从低层向高层压缩：排序后随机保留奇数或偶数位置的元素，升入上一层（权重翻倍）
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if items.size > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+                items = np.sort(items)
+                # 元素个数为奇数时，保留一个元素在当前层
+                keep = items[:1] if items.size % 2 else items[:0]
+                pairs = items[keep.size:]
+                offset = int(self._rng.integers(2))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], pairs[offset::2]])
+                self.levels[level] = keep
+            level += 1
+
+    def quantile(self, q):
+        """
+        估计分位数
+
+        Args:
+            q (float): 分位点（0-1）
+
+        Returns:
+            float: 分位数估计，如果草图为空则返回None
+        """
+        if self.n == 0:
+            return None
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(level_items.size, 1 << level, dtype=np.int64)
+            for level, level_items in enumerate(self.levels)
+        ])
+        order = np.argsort(items, kind='mergesort')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        position = int(np.searchsorted(cumulative, q * cumulative[-1], side='left'))
+        return float(items[min(position, items.size - 1)])
+
+    def rank_error(self):
+        """
+        单个分位数查询的归一化秩误差（约99%置信度）
+
+        Returns:
+            float: 归一化秩误差
+        """
+        return 2.296 / self.k ** 0.9723
+
+
+class MisraGries:
+    """
+    Misra-Gries高频值草图
+
+    最多保留k个计数器；任意值的计数被低估不超过 (n - 计数器总和) / (k + 1)，
+    出现次数超过 n / (k + 1) 的值一定会被保留
+    """
+
+    def __init__(self, k=64):
+        """
+        初始化Misra-Gries草图
+
+        Args:
+            k (int): 计数器数量
+        """
+        self.k = k
+        self.n = 0
+        self.counters = {}
+
+    def update(self, series):
+        """
+        用一块数据更新草图（块内先精确计数，再合并到计数器）
+
+        Args:
+            series (pandas.Series): 数据列（缺失值会被忽略）
+        """
+        value_counts = series.value_counts(dropna=True, sort=False)
+        value_counts = value_counts[value_counts > 0]
+        self.n += int(value_counts.sum())
+        self._merge_counts(value_counts.items())
+
+    def merge(self, other):
+        """
+        合并另一个草图
+
+        Args:
+            other (MisraGries): 另一个草图
+
+        Returns:
+            MisraGries: 自身
+        """
+        self.n += other.n
+        self._merge_counts(other.counters.items())
+        return self
+
+    def _merge_counts(self, items):
+        counters = self.counters
+        for value, count in items:
+            counters[value] = counters.get(value, 0) + int(count)
+        if len(counters) > self.k:
+            # 所有计数减去第k+1大的计数，只保留仍为正数的计数器
+            threshold = sorted(counters.values(), reverse=True)[self.k]
+            self.counters = {
+                value: count - threshold
+                for value, count in counters.items()
+                if count > threshold
+            }
+
+    def most_common(self, limit=1):
+        """
+        获取估计的最常见值
+
+        Args:
+            limit (int): 返回数量
+
+        Returns:
+            list: [(值, 计数下界), ...]
+        """
+        return sorted(self.counters.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def max_undercount(self):
+        """
+        计数低估的上界
+
+        Returns:
+            int: 任意值计数可能被低估的最大数量
+        """
+        return int((self.n - sum(self.counters.values())) // (self.k + 1))
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+流式提取模块 - 在流式响应中增量检测所需内容是否已经完整
+
+代码生成、代码修复只需要响应中的第一个 ```python 代码块，模型在代码块之后通常还会输出
+几百个token的解释。检测器逐个接收内容片段，所需内容完整后连接器立即关闭HTTP流，
+不再等待（也不再为）后面的内容付费：
+- CodeBlockWatcher: 第一个指定语言的代码块（与 re.search(r'```python\\s*(.*?)\\s*```') 的匹配结果一致）
+- JsonObjectWatcher: 第一个完整的JSON对象或数组（响应以代码块开头时等待 ```json 代码块结束）
+- HtmlDocumentWatcher: 第一个 ```html 代码块，或以 < 开头的HTML文档的 </html> 结束标签
+"""
+
+
+class StreamWatcher:
+    """
+    流式内容检测器基类
+    """
+
+    # 检测器名称（作为响应缓存键的一部分，提前结束的响应不会被不提前结束的调用复用）
+    name = "stream"
+
+    def __init__(self):
+        self.text = ""
+        self.complete = False
+
+    def feed(self, content):
+        """
+        接收一个内容片段
+
+        Args:
+            content (str): 内容片段
+
+        Returns:
+            bool: 所需内容是否已经完整（可以结束流式响应）
+        """
+        if self.complete:
+            return True
+        start = len(self.text)
+        self.text += content
+        self.complete = self._check(start)
+        return self.complete
+
+    def _check(self, start):
+        """
+        检查所需内容是否已经完整（子类重写）
+
+        Args:
+            start (int): 新内容在 self.text 中的起始位置
+
+        Returns:
+            bool: 是否完整
+        """
+        return False
+
+
+class CodeBlockWatcher(StreamWatcher):
+    """
+    检测第一个指定语言的代码块是否已经结束
+    """
+
+    def __init__(self, language="python"):
+        """
+        Args:
+            language (str): 代码块的语言标记
+        """
+        super().__init__()
+        self.name = f"code:{language}"
+        self.opening = f"```{language}"
+        self._body_start = None
+
+    def _check(self, start):
+        # 标记可能被拆分到两个片段中，从新内容之前的几个字符开始查找
+        if self._body_start is None:
+            index = self.text.find(self.opening, max(start - len(self.opening) + 1, 0))
+            if index < 0:
+                return False
+            self._body_start = index + len(self.opening)
+            start = self._body_start
+        return self.text.find("```", max(start - 2, self._body_start)) >= 0
+
+
+class JsonObjectWatcher(StreamWatcher):
+    """
+    检测第一个JSON对象（或数组）是否已经完整
+    """
+
+    name = "json"
+
+    def __init__(self):
+        super().__init__()
+        self._fence = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+
+    def _check(self, start):
+        if self._fence is not None:
+            return self._fence.feed(self.text[start:])
+
+        for index in range(start, len(self.text)):
+            char = self.text[index]
+            if not self._started:
+                if char.isspace():
+                    continue
+                if char not in "{[":
+                    # 响应不是直接以JSON开头（如代码块或说明文字），改为等待 ```json 代码块结束
+                    self._fence = CodeBlockWatcher("json")
+                    return self._fence.feed(self.text[index:])
+                self._started = True
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    return True
+        return False
+
+
+class HtmlDocumentWatcher(StreamWatcher):
+    """
+    检测HTML报告是否已经完整
+    """
+
+    name = "html"
+
+    def __init__(self):
+        super().__init__()
+        self._fence = CodeBlockWatcher("html")
+        self._raw = None
+
+    def _check(self, start):
+        if self._fence.feed(self.text[start:]):
+            return True
+        if self._raw is None:
+            stripped = self.text.lstrip()
+            if not stripped:
+                return False
+            self._raw = stripped.startswith("<")
+        if not self._raw:
+            return False
+        # 结束标签可能被拆分到两个片段中
+        window_start = max(start - len("</html>") + 1, 0)
+        return "</html>" in self.text[window_start:].lower()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+流式输出模块 - 模型流式响应的可插拔输出目标
+
+流式响应只在连接器中解析一次，内容片段交给输出目标处理：
+- ConsoleSink: 实时打印到终端（交互式运行）
+- ProgressSink: 只显示已接收的字符数（交互式运行时减少终端输出）
+- FileSink: 每个流式响应写入单独的文本文件（无界面批处理时便于事后查看）
+- CallbackSink: 调用进度回调函数（供其他程序集成）
+- NullSink: 不输出（安静模式）
+
+输出模式由 api.stream_output 配置，'auto' 表示标准输出是终端时打印到终端，否则使用安静模式
+"""
+
+import os
+import re
+import sys
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StreamSink:
+    """
+    流式输出目标基类（默认不输出）
+    """
+
+    def on_start(self, label=None):
+        """
+        流式响应开始
+
+        Args:
+            label (str, optional): 响应的描述（如 "为 总体数据统计分析单元 生成分析代码"）
+        """
+
+    def on_chunk(self, content):
+        """
+        收到一个内容片段
+
+        Args:
+            content (str): 内容片段
+        """
+
+    def on_end(self, label=None):
+        """
+        流式响应结束
+
+        Args:
+            label (str, optional): 响应的描述
+        """
+
+
+class NullSink(StreamSink):
+    """
+    不输出的流式输出目标（安静模式）
+    """
+
+
+class ConsoleSink(StreamSink):
+    """
+    实时打印内容片段到终端
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def on_start(self, label=None):
+        if label:
+            self.stream.write(f"\n开始{label}...\n\n")
+            self.stream.flush()
+
+    def on_chunk(self, content):
+        self.stream.write(content)
+        self.stream.flush()
+
+    def on_end(self, label=None):
+        self.stream.write(f"\n\n{label}完成\n\n" if label else "\n\n")
+        self.stream.flush()
+
+
+class ProgressSink(StreamSink):
+    """
+    在同一行显示已接收的字符数（最多每0.2秒刷新一次）
+    """
+
+    def __init__(self, stream=None, interval=0.2):
+        self.stream = stream or sys.stdout
+        self.interval = interval
+        self.label = None
+        self.chars = 0
+        self.last_update = 0.0
+
+    def on_start(self, label=None):
+        self.label = label or "接收模型响应"
+        self.chars = 0
+        self.last_update = 0.0
+
+    def on_chunk(self, content):
+        self.chars += len(content)
+        now = time.monotonic()
+        if now - self.last_update >= self.interval:
+            self.last_update = now
+            self.stream.write(f"\r{self.label}: 已接收 {self.chars} 字符")
+            self.stream.flush()
+
+    def on_end(self, label=None):
+        self.stream.write(f"\r{self.label}: 已接收 {self.chars} 字符，完成\n")
+        self.stream.flush()
+
+
+class FileSink(StreamSink):
+    """
+    将每个流式响应写入单独的文本文件
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._file = None
+
+    def on_start(self, label=None):
+        os.makedirs(self.directory, exist_ok=True)
+        name = re.sub(r'[^\w\-]+', '_', label or 'stream').strip('_')[:60]
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%d_%H%M%S')}_{name}.txt")
+        self._file = open(path, 'w', encoding='utf-8')
+        logger.info(f"流式响应写入文件: {path}")
+
+    def on_chunk(self, content):
+        if self._file is not None:
+            self._file.write(content)
+
+    def on_end(self, label=None):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class CallbackSink(StreamSink):
+    """
+    调用进度回调函数
+    """
+
+    def __init__(self, callback):
+        """
+        Args:
+            callback (callable): 回调函数 callback(event, label, content, total_chars)，
+                event 为 'start'、'chunk' 或 'end'
+        """
+        self.callback = callback
+        self.chars = 0
+
+    def on_start(self, label=None):
+        self.chars = 0
+        self.callback('start', label, None, 0)
+
+    def on_chunk(self, content):
+        self.chars += len(content)
+        self.callback('chunk', None, content, self.chars)
+
+    def on_end(self, label=None):
+        self.callback('end', label, None, self.chars)
+
+
+def create_sink(config):
+    """
+    根据配置创建流式输出目标
+
+    Args:
+        config (dict): 配置信息（读取 api.stream_output 和 api.stream_log_dir）
+
+    Returns:
+        StreamSink: 流式输出目标
+    """
+    api_config = config.get('api', {}) or {}
+    mode = api_config.get('stream_output', 'auto')
+    if mode == 'auto':
+        mode = 'console' if sys.stdout.isatty() else 'none'
+
+    if mode == 'console':
+        return ConsoleSink()
+    if mode == 'progress':
+        return ProgressSink()
+    if mode == 'file':
+        return FileSink(api_config.get('stream_log_dir', os.path.join('logs', 'streams')))
+    if mode != 'none':
+        logger.warning(f"未知的流式输出模式: {mode}，使用安静模式")
+    return NullSink()
@@ -0,0 +1,442 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+离线模型服务 - 兼容OpenAI /chat/completions 接口的本地桩服务，支持录制和回放
+
+- record 模式: 将请求转发到真实的模型接口，原样返回（包括流式响应），并将提示词和响应（含流式片段）录制到JSONL文件
+- replay 模式: 按提示词从录制文件中回放响应，按配置的首token延迟（TTFT）和输出速度（tokens/s）模拟真实耗时；
+  没有录制的提示词返回通用的默认响应（分析代码、Markdown/HTML报告或JSON），使整个 main.py 流程可以离线运行
+
+用法:
+    # 录制真实会话
+    python stub_model_server.py --mode record --upstream https://api.example.com/v1 --api-key sk-xxx \\
+        --recording recordings/session.jsonl
+    # 离线回放（config.yaml 中的 api_base 设为 http://127.0.0.1:8765/v1）
+    python stub_model_server.py --recording recordings/session.jsonl --ttft-ms 400 --tokens-per-second 60
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from modules.response_cache import ResponseCache
+from modules.prompt_builder import estimate_tokens
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+# 回放时每个流式片段的目标字符数（没有录制的片段时按此切分响应）
+REPLAY_CHUNK_CHARS = 16
+
+
+def prompt_key(messages, json_mode):
+    """
+    计算请求的回放键（规范化提示词哈希 + JSON模式）
+
+    Args:
+        messages (list): 请求的消息列表
+        json_mode (bool): 是否为JSON模式
+
+    Returns:
+        str: 回放键
+    """
+    prompt = "\n".join(str(message.get("content", "")) for message in messages)
+    normalized = ResponseCache.normalize_prompt(prompt)
+    return hashlib.sha256(f"{int(bool(json_mode))}|{normalized}".encode('utf-8')).hexdigest()
+
+
+class Recording:
+    """
+    录制文件（JSONL，每行一条 提示词 -> 响应 记录，线程安全）
+    """
+
+    def __init__(self, path):
+        """
+        初始化录制文件，已有的记录会被加载用于回放
+
+        Args:
+            path (str): 录制文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry
+            logger.info(f"已加载 {len(self.entries)} 条录制记录: {path}")
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def add(self, entry):
+        """
+        追加一条录制记录
+
+        Args:
+            entry (dict): 录制记录（key、prompt_preview、response、chunks等）
+        """
+        with self._lock:
+            self.entries[entry["key"]] = entry
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def canned_response(prompt, json_mode):
+    """
+    为没有录制的提示词生成通用的默认响应
+
+    Args:
+        prompt (str): 提示词
+        json_mode (bool): 是否为JSON模式
+
+    Returns:
+        str: 响应内容
+    """
+    if json_mode:
+        return json.dumps({"columns": [], "summary": "离线桩服务的默认响应"}, ensure_ascii=False)
+
+    if "Python" in prompt and ("代码" in prompt or "code" in prompt.lower()):
+        # 分析单元要求把结果写到 pngs/xxx_results.txt，默认代码按提示词中的文件名输出
+        match = re.search(r'pngs/([\w\-]+\.txt)', prompt)
+        output_file = match.group(1) if match else "analysis_results.txt"
+        return f'''```python
+import os
+import sys
+
+import pandas as pd
+
+
+def main():
+    file_path = sys.argv[1]
+    if file_path.endswith('.parquet'):
+        df = pd.read_parquet(file_path)
+    else:
+        df = pd.read_csv(file_path)
+
+    os.makedirs("pngs", exist_ok=True)
+    lines = ["数据概览", "=" * 40, f"行数: {{len(df)}}", f"列数: {{len(df.columns)}}", ""]
+    lines.append(df.describe(include="all").transpose().to_string())
+    with open(os.path.join("pngs", "{output_file}"), "w", encoding="utf-8") as f:
+        f.write("\\n".join(lines))
+    print("\\n".join(lines[:4]))
+
+
+if __name__ == "__main__":
+    main()
+```'''
+
+    if "HTML" in prompt:
+        return ("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>分析报告</title></head>"
+                "<body><h1>分析报告</h1><p>离线桩服务生成的默认报告。</p></body></html>")
+
+    return ("# 分析报告\n\n## 数据概览\n\n| 指标 | 值 |\n| --- | --- |\n| 来源 | 离线桩服务 |\n\n"
+            "## 关键发现\n\n- 这是离线桩服务生成的默认报告内容。\n\n## 总结\n\n离线回放完成。\n")
+
+
+def split_chunks(text):
+    """
+    将响应按固定字符数切分为流式片段
+
+    Args:
+        text (str): 响应内容
+
+    Returns:
+        list: 片段列表
+    """
+    return [text[i:i + REPLAY_CHUNK_CHARS] for i in range(0, len(text), REPLAY_CHUNK_CHARS)] or [""]
+
+
+class StubModelServer(ThreadingHTTPServer):
+    """
+    兼容OpenAI接口的桩服务
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, mode='replay', recording=None, upstream=None, api_key=None,
+                 ttft_ms=0, tokens_per_second=0, error_rate=0.0, fallback='canned'):
+        """
+        初始化桩服务
+
+        Args:
+            address (tuple): 监听地址 (host, port)
+            mode (str): 'replay' 或 'record'
+            recording (Recording): 录制文件
+            upstream (str): record模式下转发的真实接口地址（如 https://api.example.com/v1）
+            api_key (str): 真实接口的API密钥（不设置时转发请求中的Authorization头）
+            ttft_ms (float): 回放时的首token延迟（毫秒）
+            tokens_per_second (float): 回放时的输出速度，0表示不限速
+            error_rate (float): 随机返回429错误的概率（用于测试重试和限流）
+            fallback (str): 没有录制的提示词的处理方式: 'canned'（默认响应）或 'error'（返回404）
+        """
+        super().__init__(address, StubRequestHandler)
+        self.mode = mode
+        self.recording = recording or Recording(None)
+        self.upstream = upstream.rstrip('/') if upstream else None
+        self.api_key = api_key
+        self.ttft = ttft_ms / 1000.0
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.fallback = fallback
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "replayed": 0, "canned": 0, "recorded": 0, "errors": 0, "cancelled": 0}
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """
+    /chat/completions 请求处理
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def do_POST(self):
+        server = self.server
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {"error": {"message": f"不支持的接口: {self.path}"}})
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        server.count("requests")
+
+        if server.error_rate and random.random() < server.error_rate:
+            server.count("errors")
+            self._send_json(429, {"error": {"message": "rate limited (stub)"}}, {"Retry-After": "1"})
+            return
+
+        if server.mode == 'record':
+            self._record(body)
+        else:
+            self._replay(body)
+
+    def _replay(self, body):
+        server = self.server
+        messages = body.get("messages", [])
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        entry = server.recording.get(prompt_key(messages, json_mode))
+
+        if entry is not None:
+            server.count("replayed")
+            response, chunks = entry["response"], entry.get("chunks")
+        elif server.fallback == 'canned':
+            server.count("canned")
+            prompt = "\n".join(str(message.get("content", "")) for message in messages)
+            response, chunks = canned_response(prompt, json_mode), None
+        else:
+            self._send_json(404, {"error": {"message": "录制文件中没有该提示词"}})
+            return
+
+        if body.get("stream"):
+            self._send_stream(body, chunks or split_chunks(response))
+        else:
+            self._sleep_for(response)
+            self._send_json(200, self._completion(body, response))
+
+    def _record(self, body):
+        server = self.server
+        headers = {"Content-Type": "application/json"}
+        headers["Authorization"] = f"Bearer {server.api_key}" if server.api_key else self.headers.get("Authorization", "")
+        url = f"{server.upstream}/chat/completions"
+        messages = body.get("messages", [])
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+
+        try:
+            upstream_response = server.session.post(url, headers=headers, json=body, timeout=600, stream=bool(body.get("stream")))
+        except requests.exceptions.RequestException as e:
+            self._send_json(502, {"error": {"message": f"转发请求失败: {str(e)}"}})
+            return
+
+        if upstream_response.status_code != 200:
+            self._send_raw(upstream_response.status_code, upstream_response.content,
+                           upstream_response.headers.get("Content-Type", "application/json"))
+            return
+
+        if body.get("stream"):
+            # 原样转发SSE行，同时收集内容片段
+            chunks = []
+            self._start_stream()
+            for line in upstream_response.iter_lines():
+                if not line:
+                    continue
+                text = line.decode('utf-8')
+                if text.startswith('data: ') and not text.startswith('data: [DONE]'):
+                    try:
+                        delta = json.loads(text[6:])["choices"][0].get("delta", {})
+                        if delta.get("content"):
+                            chunks.append(delta["content"])
+                    except (ValueError, KeyError, IndexError):
+                        pass
+                self._write_chunk(text + "\n\n")
+            self._end_stream()
+            response = "".join(chunks)
+        else:
+            payload = upstream_response.json()
+            chunks = None
+            response = payload["choices"][0]["message"]["content"]
+            self._send_json(200, payload)
+
+        server.recording.add({
+            "key": prompt_key(messages, json_mode),
+            "model": body.get("model"),
+            "json_mode": json_mode,
+            "prompt_preview": str(messages[-1].get("content", ""))[:200] if messages else "",
+            "response": response,
+            "chunks": chunks,
+            "recorded_at": time.strftime('%Y-%m-%d %H:%M:%S')
+        })
+        server.count("recorded")
+
+    def _sleep_for(self, text):
+        """
+        按首token延迟和输出速度等待（非流式响应）
+        """
+        server = self.server
+        delay = server.ttft
+        if server.tokens_per_second:
+            delay += estimate_tokens(text) / server.tokens_per_second
+        if delay > 0:
+            time.sleep(delay)
+
+    def _send_stream(self, body, chunks):
+        server = self.server
+        self._start_stream()
+        if server.ttft > 0:
+            time.sleep(server.ttft)
+        try:
+            for content in chunks:
+                event = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}]
+                }
+                self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+                if server.tokens_per_second:
+                    time.sleep(estimate_tokens(content) / server.tokens_per_second)
+            self._write_chunk("data: [DONE]\n\n")
+            self._end_stream()
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端已经拿到所需内容并提前关闭了连接
+            server.count("cancelled")
+            self.close_connection = True
+
+    def _completion(self, body, response):
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(response)
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": response}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload, headers=None):
+        self._send_raw(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), "application/json", headers)
+
+    def _send_raw(self, status, data, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='兼容OpenAI接口的离线模型桩服务（录制/回放）')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    parser.add_argument('--mode', choices=['replay', 'record'], default='replay', help='运行模式')
+    parser.add_argument('--recording', default=os.path.join('recordings', 'session.jsonl'), help='录制文件路径（JSONL）')
+    parser.add_argument('--upstream', help='record模式下转发的真实接口地址，如 https://api.example.com/v1')
+    parser.add_argument('--api-key', help='真实接口的API密钥（不设置时转发请求中的Authorization头）')
+    parser.add_argument('--ttft-ms', type=float, default=0, help='回放时的首token延迟（毫秒）')
+    parser.add_argument('--tokens-per-second', type=float, default=0, help='回放时的输出速度，0表示不限速')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='随机返回429错误的概率')
+    parser.add_argument('--fallback', choices=['canned', 'error'], default='canned',
+                        help='没有录制的提示词返回默认响应（canned）还是404（error）')
+    parser.add_argument('--seed', type=int, help='随机种子（固定--error-rate注入错误的顺序）')
+    args = parser.parse_args()
+
+    if args.mode == 'record' and not args.upstream:
+        parser.error("record模式需要指定 --upstream")
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    server = StubModelServer(
+        (args.host, args.port),
+        mode=args.mode,
+        recording=Recording(args.recording),
+        upstream=args.upstream,
+        api_key=args.api_key,
+        ttft_ms=args.ttft_ms,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        fallback=args.fallback
+    )
+    logger.info(f"离线模型服务已启动: http://{args.host}:{server.server_port}/v1 (模式: {args.mode})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"服务统计: {server.stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试数据集缓存的流式读取：后续数据块出现更宽的类型时列类型应放宽而不是截断取值
+"""
+
+import os
+import sys
+import shutil
+import logging
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.dataset_cache import DatasetCache, read_dataset
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+# 前两块全部为整数，第三块起出现小数和文本
+VALUES = [1, 2, 3, 4, 1.5, 2.5, 7.25]
+LABELS = ['a', 'b', 'c', 1, 2, 3, 'd']
+
+
+def build_cache(work_dir, optimize):
+    """创建强制流式读取、每块3行的数据集缓存"""
+    config = {
+        'analysis': {
+            'dataset_cache': {'cache_dir': os.path.join(work_dir, f'cache_{optimize}'), 'format': 'parquet'},
+            'ingestion': {'streaming': True, 'streaming_threshold_mb': 0, 'chunk_size': 3},
+            'dtype_optimization': {'enabled': optimize}
+        }
+    }
+    return DatasetCache(config)
+
+
+def check_source(work_dir, source_path):
+    """分别在启用和不启用类型优化时流式缓存数据源，检查取值未被截断"""
+    for optimize in (True, False):
+        cache = build_cache(work_dir, optimize)
+        dataset_path = cache.get_or_create(source_path)
+        meta = cache.load_meta(dataset_path)
+        assert meta['ingestion'] == 'streaming', f"未使用流式读取: {meta}"
+
+        df = read_dataset(dataset_path)
+        assert df['value'].tolist() == VALUES, f"数值列被截断: {df['value'].tolist()}"
+        assert df['label'].astype(str).tolist() == [str(v) for v in LABELS], f"文本列不一致: {df['label'].tolist()}"
+        assert df['empty_head'].tolist()[-1] == 5, f"前几块为空的列丢失取值: {df['empty_head'].tolist()}"
+        logger.info(f"{os.path.basename(source_path)} (类型优化={optimize}) 流式缓存取值正确")
+
+
+def test_streaming_widens_columns():
+    """整数列在后续块出现小数时放宽为浮点数，数字与文本混合时放宽为字符串"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        df = pd.DataFrame({
+            'value': pd.Series(VALUES, dtype=object),
+            'label': pd.Series(LABELS, dtype=object),
+            'empty_head': [None] * 6 + [5]
+        })
+
+        xlsx_path = os.path.join(work_dir, 'mixed.xlsx')
+        df.to_excel(xlsx_path, index=False)
+        check_source(work_dir, xlsx_path)
+
+        jsonl_path = os.path.join(work_dir, 'mixed.jsonl')
+        df.to_json(jsonl_path, orient='records', lines=True, force_ascii=False)
+        check_source(work_dir, jsonl_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    """主函数"""
+    test_streaming_widens_columns()
+    logger.info("流式读取类型放宽测试通过")
+
+
+if __name__ == "__main__":
+    main()